@@ -1,19 +1,260 @@
-import requests
+import asyncio
+import contextvars
 import logging
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
 from datetime import datetime, timedelta
 import os
+import numpy as np
 from dotenv import load_dotenv
+from http_session import get_http_session
+from metrics import count_upstream_error, track_upstream
+from price_history import INTRADAY_INTERVALS, build_history
+from price_store import CLOSE, get_price_store
+from rate_limiter import get_rate_limiter, jittered_backoff, max_wait
+from response_cache import get_response_cache
+from single_flight import get_async_single_flight, get_single_flight
+from symbol_directory import get_symbol_search_index
 
 load_dotenv()
 
 logger = logging.getLogger(__name__)
 
+# time.monotonic() deadline of the get_stock_bundle part running in this context
+_part_deadline = contextvars.ContextVar('alpha_vantage_part_deadline', default=None)
+
+
+def _token_timeout():
+    """Longest a call may queue for a rate limit token: max_wait(), cut short by its bundle part's deadline"""
+    deadline = _part_deadline.get()
+    if deadline is None:
+        return max_wait()
+    return max(0.0, min(max_wait(), deadline - time.monotonic()))
+
+# Response parsers shared by the sync and async clients
+
+def _parse_quote(data, symbol):
+    quote = data['Global Quote']
+    return {
+        'symbol': quote.get('01. symbol', symbol),
+        'current_price': float(quote.get('05. price', 0)),
+        'change': float(quote.get('09. change', 0)),
+        'change_percent': quote.get('10. change percent', '0%'),
+        'volume': int(quote.get('06. volume', 0)),
+        'latest_trading_day': quote.get('07. latest trading day'),
+        'previous_close': float(quote.get('08. previous close', 0)),
+        'open': float(quote.get('02. open', 0)),
+        'high': float(quote.get('03. high', 0)),
+        'low': float(quote.get('04. low', 0))
+    }
+
+def _parse_daily_bars(data, since=None):
+    time_series = data['Time Series (Daily)']
+    dates = np.array(list(time_series.keys()), dtype='datetime64[D]')
+    ohlcv = np.array([
+        (bar['1. open'], bar['2. high'], bar['3. low'], bar['4. close'], bar['5. volume'])
+        for bar in time_series.values()
+    ], dtype=np.float64)
+    
+    order = np.argsort(dates)
+    dates, ohlcv = dates[order], ohlcv[order]
+    if since is not None:
+        keep = dates >= since
+        dates, ohlcv = dates[keep], ohlcv[keep]
+    return dates, ohlcv
+
+def _parse_intraday_closes(data, key):
+    time_series = data[key]
+    timestamps = np.array(list(time_series.keys()), dtype='datetime64[m]')
+    closes = np.array([float(bar['4. close']) for bar in time_series.values()])
+    order = np.argsort(timestamps)
+    return timestamps[order], closes[order]
+
+def _parse_overview(data):
+    return {
+        'company_name': data.get('Name', 'N/A'),
+        'sector': data.get('Sector', 'N/A'),
+        'industry': data.get('Industry', 'N/A'),
+        'market_cap': int(data.get('MarketCapitalization', 0)) if data.get('MarketCapitalization') != 'None' else None,
+        'pe_ratio': float(data.get('PERatio', 0)) if data.get('PERatio') != 'None' else None,
+        'dividend_yield': float(data.get('DividendYield', 0)) if data.get('DividendYield') != 'None' else None,
+        'fifty_two_week_high': float(data.get('52WeekHigh', 0)) if data.get('52WeekHigh') != 'None' else None,
+        'fifty_two_week_low': float(data.get('52WeekLow', 0)) if data.get('52WeekLow') != 'None' else None,
+        'summary': data.get('Description', 'No description available.')
+    }
+
+def _parse_search_results(data):
+    results = []
+    for match in data['bestMatches'][:10]:  # Limit to 10 results
+        results.append({
+            'symbol': match.get('1. symbol'),
+            'name': match.get('2. name'),
+            'type': match.get('3. type'),
+            'region': match.get('4. region'),
+            'market_open': match.get('5. marketOpen'),
+            'market_close': match.get('6. marketClose'),
+            'timezone': match.get('7. timezone'),
+            'currency': match.get('8. currency'),
+            'match_score': match.get('9. matchScore')
+        })
+    return results
+
+def _parse_news(data):
+    news_items = []
+    for item in data['feed'][:5]:  # Limit to 5 news items
+        news_items.append({
+            'title': item.get('title'),
+            'url': item.get('url'),
+            'time_published': item.get('time_published'),
+            'summary': item.get('summary'),
+            'source': item.get('source'),
+            'sentiment_score': item.get('overall_sentiment_score'),
+            'sentiment_label': item.get('overall_sentiment_label')
+        })
+    return news_items
+
+def _is_rate_limited(data):
+    """Alpha Vantage answers over-quota calls with HTTP 200 and a Note/Information message"""
+    message = ' '.join(str(data.get(key, '')) for key in ('Note', 'Information'))
+    return 'call frequency' in message or 'rate limit' in message.lower()
+
+def _is_premium_only(data):
+    """The answer to a parameter (outputsize=full) the key's plan doesn't include"""
+    message = ' '.join(str(data.get(key, '')) for key in ('Note', 'Information'))
+    return 'premium' in message.lower() and not _is_rate_limited(data)
+
+def _cache_key_parts(params):
+    function = params['function']
+    # Alpha Vantage ignores symbol case, so 'aapl' and 'AAPL' share a cache entry
+    symbol = (params.get('symbol') or params.get('tickers') or params.get('keywords') or '').upper() or None
+    key_params = {k: v.upper() if k in ('tickers', 'keywords') else v
+                  for k, v in params.items() if k not in ('function', 'symbol', 'apikey')}
+    return function, symbol, key_params
+
 class AlphaVantageService:
-    def __init__(self):
+    RATE_LIMIT_RETRIES = 2
+    
+    # TIME_SERIES_INTRADAY interval names for the chart intervals
+    INTRADAY_INTERVALS = {'1m': '1min', '5m': '5min', '15m': '15min', '30m': '30min', '60m': '60min'}
+    
+    # Seconds to wait for each part of get_stock_bundle before giving up on it
+    DEFAULT_BUNDLE_TIMEOUTS = {
+        'quote': 10,
+        'overview': 10,
+        'time_series': 15,
+        'news': 10
+    }
+
+    def __init__(self, cache=None, session=None, price_store=None, search_index=None):
         self.api_key = os.getenv('ALPHA_VANTAGE_API_KEY', 'demo')
-        self.base_url = 'https://www.alphavantage.co/query'
+        self.base_url = os.getenv('ALPHA_VANTAGE_BASE_URL', 'https://www.alphavantage.co/query')
+        self.cache = cache if cache is not None else get_response_cache()
+        self.session = session if session is not None else get_http_session()
+        self.limiter = get_rate_limiter('alpha_vantage')
+        self.flight = get_single_flight('alpha_vantage')
+        self.price_store = price_store if price_store is not None else get_price_store()
+        self.search_index = search_index if search_index is not None else get_symbol_search_index()
+        self.executor = ThreadPoolExecutor(
+            max_workers=int(os.getenv('ALPHA_VANTAGE_MAX_WORKERS', 8)),
+            thread_name_prefix='alpha-vantage'
+        )
+    
+    def _query(self, params, expected_key, refresh=False):
+        """Call the query endpoint, serving from the response cache when fresh.
+
+        Only responses containing expected_key are cached, so rate limit notes
+        and error messages are never served back from the cache. refresh=True
+        skips the cached copy and replaces it (used by the prefetch scheduler).
+        """
+        function, symbol, key_params = _cache_key_parts(params)
+        if not refresh:
+            cached = self.cache.get(function, symbol, key_params)
+            if cached is not None:
+                return cached
         
-    def get_stock_quote(self, symbol):
+        # Concurrent misses for the same request share one upstream call
+        key = self.cache.make_key(function, symbol, key_params)
+        return self.flight.do(key, self._fetch, params, expected_key, function, symbol, key_params, refresh)
+    
+    def _fetch(self, params, expected_key, function, symbol, key_params, refresh=False):
+        # A flight that finished just before this one started may have filled the cache
+        cached = None if refresh else self.cache.get(function, symbol, key_params, record_stats=False)
+        if cached is not None:
+            return cached
+        
+        for attempt in range(self.RATE_LIMIT_RETRIES + 1):
+            self.limiter.acquire(timeout=_token_timeout())
+            with track_upstream('alpha_vantage', function):
+                response = self.session.get(self.base_url, params=params)
+                response.raise_for_status()
+                data = response.json()
+            
+            if expected_key in data:
+                self.cache.set(function, symbol, key_params, data)
+                return data
+            if not _is_rate_limited(data):
+                return data
+            count_upstream_error('alpha_vantage', function, 'rate_limited')
+            if attempt == self.RATE_LIMIT_RETRIES:
+                return data
+            
+            # Let the limiter pace the retry so other callers back off too
+            self.limiter.backoff(jittered_backoff(attempt, base_delay=2.0))
+        return data
+    
+    def _submit(self, func, *args, **kwargs):
+        """Run func on the pool in a copy of the caller's context, so its upstream timings land on this request"""
+        return self.executor.submit(contextvars.copy_context().run, func, *args, **kwargs)
+    
+    def get_stock_bundle(self, symbol, timeouts=None):
+        """Fetch quote, overview, daily history and news for a symbol concurrently.
+
+        Each part has its own timeout. Parts that fail or time out fall back to
+        the same empty value the individual method returns on error and are
+        listed under 'errors', so callers can still render a partial result.
+        """
+        timeouts = {**self.DEFAULT_BUNDLE_TIMEOUTS, **(timeouts or {})}
+        calls = {
+            'quote': (self.get_stock_quote, (symbol,), {}, None),
+            'overview': (self.get_company_overview, (symbol,), {}, None),
+            'time_series': (self.get_daily_time_series, (symbol,), {}, {'dates': [], 'prices': []}),
+            'news': (self.get_news_sentiment, (), {'tickers': symbol}, [])
+        }
+        
+        started = time.monotonic()
+        futures = {
+            name: self._submit(self._run_part, started + timeouts[name], func, *args, **kwargs)
+            for name, (func, args, kwargs, _) in calls.items()
+        }
+        
+        bundle = {'errors': []}
+        for name, future in futures.items():
+            default = calls[name][3]
+            remaining = max(0, timeouts[name] - (time.monotonic() - started))
+            try:
+                bundle[name] = future.result(timeout=remaining)
+            except FutureTimeoutError:
+                logger.warning(f"Timed out after {timeouts[name]}s fetching {name} for {symbol}")
+                future.cancel()
+                bundle[name] = default
+                bundle['errors'].append(name)
+            except Exception as e:
+                logger.error(f"Error fetching {name} for {symbol}: {str(e)}")
+                bundle[name] = default
+                bundle['errors'].append(name)
+        
+        return bundle
+    
+    @staticmethod
+    def _run_part(deadline, func, *args, **kwargs):
+        """Run a bundle part unless its deadline passed while queued; rate limit waits stop at the deadline,
+        so a part that timed out doesn't hold a pool thread for up to max_wait()"""
+        if time.monotonic() >= deadline:
+            raise FutureTimeoutError('deadline passed while queued')
+        _part_deadline.set(deadline)
+        return func(*args, **kwargs)
+        
+    def get_stock_quote(self, symbol, refresh=False):
         """Get current stock quote"""
         params = {
             'function': 'GLOBAL_QUOTE',
@@ -22,24 +263,10 @@ class AlphaVantageService:
         }
         
         try:
-            response = requests.get(self.base_url, params=params)
-            response.raise_for_status()
-            data = response.json()
+            data = self._query(params, 'Global Quote', refresh=refresh)
             
             if 'Global Quote' in data:
-                quote = data['Global Quote']
-                return {
-                    'symbol': quote.get('01. symbol', symbol),
-                    'current_price': float(quote.get('05. price', 0)),
-                    'change': float(quote.get('09. change', 0)),
-                    'change_percent': quote.get('10. change percent', '0%'),
-                    'volume': int(quote.get('06. volume', 0)),
-                    'latest_trading_day': quote.get('07. latest trading day'),
-                    'previous_close': float(quote.get('08. previous close', 0)),
-                    'open': float(quote.get('02. open', 0)),
-                    'high': float(quote.get('03. high', 0)),
-                    'low': float(quote.get('04. low', 0))
-                }
+                return _parse_quote(data, symbol)
             else:
                 logger.error(f"No Global Quote data for {symbol}: {data}")
                 return None
@@ -48,46 +275,306 @@ class AlphaVantageService:
             logger.error(f"Error fetching quote for {symbol}: {str(e)}")
             return None
     
-    def get_daily_time_series(self, symbol, outputsize='compact'):
-        """Get daily time series data"""
+    def get_stock_quotes(self, symbols):
+        """Get current quotes for several symbols in parallel.
+
+        Calls go through the shared rate limiter and cache, so repeated symbols
+        and hot tickers cost at most one upstream request each.
+        """
+        symbols = list(dict.fromkeys(symbol.upper() for symbol in symbols))
+        futures = [self._submit(self.get_stock_quote, symbol) for symbol in symbols]
+        return {symbol: future.result() for symbol, future in zip(symbols, futures)}
+    
+    def get_stock_summaries(self, symbols):
+        """Quote, overview and news for each symbol, with every lookup running concurrently"""
+        calls = {}
+        for symbol in symbols:
+            calls[(symbol, 'quote')] = self._submit(self.get_stock_quote, symbol)
+            calls[(symbol, 'overview')] = self._submit(self.get_company_overview, symbol)
+            calls[(symbol, 'news')] = self._submit(self.get_news_sentiment, tickers=symbol)
+        
+        summaries = {symbol: {} for symbol in symbols}
+        for (symbol, part), future in calls.items():
+            # Each method already turns its own errors into an empty result
+            summaries[symbol][part] = future.result()
+        return summaries
+    
+    def get_daily_time_series(self, symbol, days=252):
+        """Get daily closing prices, served from the local price history store"""
+        return self.price_store.get_price_history('av', symbol, self.fetch_daily_bars, days=days)
+    
+    def fetch_daily_bars(self, symbol, since=None):
+        """Fetch daily OHLCV bars on or after `since` as (dates, ohlcv) arrays"""
+        # compact returns the latest 100 trading days, roughly 140 calendar days
+        recent = since is not None and (np.datetime64('today', 'D') - since) < np.timedelta64(140, 'D')
         params = {
             'function': 'TIME_SERIES_DAILY',
             'symbol': symbol,
-            'outputsize': outputsize,
+            'outputsize': 'compact' if recent else 'full',
+            'apikey': self.api_key
+        }
+        
+        data = self._query(params, 'Time Series (Daily)')
+        if params['outputsize'] == 'full' and _is_premium_only(data):
+            # Full history needs a premium key; settle for the latest 100 days
+            params['outputsize'] = 'compact'
+            data = self._query(params, 'Time Series (Daily)')
+        
+        # Raise rather than return no bars, so the price store doesn't record a
+        # throttled or failed refresh as an up-to-date check
+        if _is_rate_limited(data):
+            raise RuntimeError(f"Alpha Vantage rate limited the daily history for {symbol}")
+        if 'Time Series (Daily)' not in data:
+            raise RuntimeError(f"No time series data for {symbol}: {data}")
+        
+        return _parse_daily_bars(data, since)
+    
+    def get_price_history(self, symbol, range_='1y', interval='1d', points=None):
+        """Closes over range_ at interval, LTTB-downsampled to at most `points` bars"""
+        if interval in INTRADAY_INTERVALS:
+            dates, closes = self.fetch_intraday_closes(symbol, interval)
+        else:
+            dates, ohlcv = self.price_store.get_bars('av', symbol, self.fetch_daily_bars)
+            closes = ohlcv[:, CLOSE]
+        return build_history(dates, closes, range_, interval, points)
+    
+    def fetch_intraday_closes(self, symbol, interval):
+        """Regular-hours intraday closes for roughly the last month as (timestamps, closes)"""
+        av_interval = self.INTRADAY_INTERVALS[interval]
+        params = {
+            'function': 'TIME_SERIES_INTRADAY',
+            'symbol': symbol,
+            'interval': av_interval,
+            'outputsize': 'full',
+            'extended_hours': 'false',
+            'apikey': self.api_key
+        }
+        
+        key = f'Time Series ({av_interval})'
+        data = self._query(params, key)
+        if key not in data:
+            logger.error(f"No intraday data for {symbol}: {data}")
+            return np.empty(0, dtype='datetime64[m]'), np.empty(0)
+        return _parse_intraday_closes(data, key)
+    
+    def get_company_overview(self, symbol, refresh=False):
+        """Get company overview/fundamentals"""
+        params = {
+            'function': 'OVERVIEW',
+            'symbol': symbol,
             'apikey': self.api_key
         }
         
         try:
-            response = requests.get(self.base_url, params=params)
-            response.raise_for_status()
-            data = response.json()
+            data = self._query(params, 'Symbol', refresh=refresh)
             
-            if 'Time Series (Daily)' in data:
-                time_series = data['Time Series (Daily)']
-                dates = []
-                prices = []
+            if 'Symbol' in data:
+                return _parse_overview(data)
+            else:
+                logger.error(f"No overview data for {symbol}: {data}")
+                return None
                 
-                # Sort dates and get last year of data
-                sorted_dates = sorted(time_series.keys(), reverse=True)[:252]  # ~1 year
+        except Exception as e:
+            logger.error(f"Error fetching overview for {symbol}: {str(e)}")
+            return None
+    
+    def search_symbol(self, keywords):
+        """Search for symbols by keywords, locally first and upstream only on a miss"""
+        results = self.search_index.search(keywords)
+        if results:
+            return results
+        
+        params = {
+            'function': 'SYMBOL_SEARCH',
+            'keywords': keywords,
+            'apikey': self.api_key
+        }
+        
+        try:
+            data = self._query(params, 'bestMatches')
+            
+            if 'bestMatches' in data:
+                return _parse_search_results(data)
+            else:
+                logger.error(f"No search results for {keywords}: {data}")
+                return []
                 
-                for date in reversed(sorted_dates):
-                    dates.append(date)
-                    prices.append(float(time_series[date]['4. close']))
+        except Exception as e:
+            logger.error(f"Error searching for {keywords}: {str(e)}")
+            return []
+    
+    def fetch_listing_status(self):
+        """Download the LISTING_STATUS CSV of active US listings"""
+        params = {
+            'function': 'LISTING_STATUS',
+            'apikey': self.api_key
+        }
+        
+        self.limiter.acquire(timeout=max_wait())
+        with track_upstream('alpha_vantage', 'LISTING_STATUS'):
+            response = self.session.get(self.base_url, params=params)
+            response.raise_for_status()
+        return response.text
+    
+    def get_news_sentiment(self, tickers=None, topics=None, limit=50, refresh=False):
+        """Get news and sentiment data"""
+        params = {
+            'function': 'NEWS_SENTIMENT',
+            'apikey': self.api_key,
+            'limit': limit
+        }
+        
+        if tickers:
+            params['tickers'] = tickers
+        if topics:
+            params['topics'] = topics
+            
+        try:
+            data = self._query(params, 'feed', refresh=refresh)
+            
+            if 'feed' in data:
+                return _parse_news(data)
+            else:
+                logger.error(f"No news data: {data}")
+                return []
                 
-                return {
-                    'dates': dates,
-                    'prices': prices
-                }
+        except Exception as e:
+            logger.error(f"Error fetching news: {str(e)}")
+            return []
+
+
+class AsyncAlphaVantageService:
+    """Awaitable Alpha Vantage client for the ASGI app.
+
+    Shares the response cache, rate limiter and price store with the sync
+    AlphaVantageService it wraps. Daily history still runs through the sync
+    client on a worker thread, since the price store does blocking file I/O.
+    """
+    RATE_LIMIT_RETRIES = AlphaVantageService.RATE_LIMIT_RETRIES
+    DEFAULT_BUNDLE_TIMEOUTS = AlphaVantageService.DEFAULT_BUNDLE_TIMEOUTS
+    
+    def __init__(self, client, sync_service=None):
+        self.client = client
+        self.sync_service = sync_service if sync_service is not None else AlphaVantageService()
+        self.api_key = self.sync_service.api_key
+        self.base_url = self.sync_service.base_url
+        self.cache = self.sync_service.cache
+        self.limiter = self.sync_service.limiter
+        self.search_index = self.sync_service.search_index
+        self.flight = get_async_single_flight('alpha_vantage')
+    
+    async def _query(self, params, expected_key):
+        function, symbol, key_params = _cache_key_parts(params)
+        cached = self.cache.get(function, symbol, key_params)
+        if cached is not None:
+            return cached
+        
+        key = self.cache.make_key(function, symbol, key_params)
+        return await self.flight.do(key, self._fetch, params, expected_key, function, symbol, key_params)
+    
+    async def _fetch(self, params, expected_key, function, symbol, key_params):
+        cached = self.cache.get(function, symbol, key_params, record_stats=False)
+        if cached is not None:
+            return cached
+        
+        for attempt in range(self.RATE_LIMIT_RETRIES + 1):
+            await self.limiter.acquire_async(timeout=max_wait())
+            with track_upstream('alpha_vantage', function):
+                response = await self.client.get(self.base_url, params=params)
+                response.raise_for_status()
+                data = response.json()
+            
+            if expected_key in data:
+                self.cache.set(function, symbol, key_params, data)
+                return data
+            if not _is_rate_limited(data):
+                return data
+            count_upstream_error('alpha_vantage', function, 'rate_limited')
+            if attempt == self.RATE_LIMIT_RETRIES:
+                return data
+            
+            self.limiter.backoff(jittered_backoff(attempt, base_delay=2.0))
+        return data
+    
+    async def get_stock_bundle(self, symbol, timeouts=None):
+        """Async get_stock_bundle: the four parts run concurrently on the event loop"""
+        timeouts = {**self.DEFAULT_BUNDLE_TIMEOUTS, **(timeouts or {})}
+        calls = {
+            'quote': (self.get_stock_quote(symbol), None),
+            'overview': (self.get_company_overview(symbol), None),
+            'time_series': (self.get_daily_time_series(symbol), {'dates': [], 'prices': []}),
+            'news': (self.get_news_sentiment(tickers=symbol), [])
+        }
+        
+        results = await asyncio.gather(
+            *(asyncio.wait_for(coroutine, timeouts[name]) for name, (coroutine, _) in calls.items()),
+            return_exceptions=True
+        )
+        
+        bundle = {'errors': []}
+        for (name, (_, default)), result in zip(calls.items(), results):
+            if isinstance(result, asyncio.TimeoutError):
+                logger.warning(f"Timed out after {timeouts[name]}s fetching {name} for {symbol}")
+            elif isinstance(result, BaseException):
+                # BaseException so a cancelled part (CancelledError) is reported, not returned
+                logger.error(f"Error fetching {name} for {symbol}: {result!r}")
+            else:
+                bundle[name] = result
+                continue
+            bundle[name] = default
+            bundle['errors'].append(name)
+        
+        return bundle
+    
+    async def get_stock_quote(self, symbol):
+        params = {
+            'function': 'GLOBAL_QUOTE',
+            'symbol': symbol,
+            'apikey': self.api_key
+        }
+        
+        try:
+            data = await self._query(params, 'Global Quote')
+            
+            if 'Global Quote' in data:
+                return _parse_quote(data, symbol)
             else:
-                logger.error(f"No time series data for {symbol}: {data}")
-                return {'dates': [], 'prices': []}
+                logger.error(f"No Global Quote data for {symbol}: {data}")
+                return None
                 
         except Exception as e:
-            logger.error(f"Error fetching time series for {symbol}: {str(e)}")
-            return {'dates': [], 'prices': []}
+            logger.error(f"Error fetching quote for {symbol}: {str(e)}")
+            return None
     
-    def get_company_overview(self, symbol):
-        """Get company overview/fundamentals"""
+    async def get_stock_quotes(self, symbols):
+        symbols = list(dict.fromkeys(symbol.upper() for symbol in symbols))
+        quotes = await asyncio.gather(*(self.get_stock_quote(symbol) for symbol in symbols))
+        return dict(zip(symbols, quotes))
+    
+    async def get_stock_summaries(self, symbols):
+        parts = [
+            (symbol, part, coroutine)
+            for symbol in symbols
+            for part, coroutine in (
+                ('quote', self.get_stock_quote(symbol)),
+                ('overview', self.get_company_overview(symbol)),
+                ('news', self.get_news_sentiment(tickers=symbol))
+            )
+        ]
+        results = await asyncio.gather(*(coroutine for _, _, coroutine in parts))
+        
+        summaries = {symbol: {} for symbol in symbols}
+        for (symbol, part, _), result in zip(parts, results):
+            summaries[symbol][part] = result
+        return summaries
+    
+    async def get_daily_time_series(self, symbol, days=252):
+        return await asyncio.to_thread(self.sync_service.get_daily_time_series, symbol, days)
+    
+    async def get_price_history(self, symbol, range_='1y', interval='1d', points=None):
+        return await asyncio.to_thread(self.sync_service.get_price_history, symbol, range_, interval, points)
+    
+    async def get_company_overview(self, symbol):
         params = {
             'function': 'OVERVIEW',
             'symbol': symbol,
@@ -95,22 +582,10 @@ class AlphaVantageService:
         }
         
         try:
-            response = requests.get(self.base_url, params=params)
-            response.raise_for_status()
-            data = response.json()
+            data = await self._query(params, 'Symbol')
             
             if 'Symbol' in data:
-                return {
-                    'company_name': data.get('Name', 'N/A'),
-                    'sector': data.get('Sector', 'N/A'),
-                    'industry': data.get('Industry', 'N/A'),
-                    'market_cap': int(data.get('MarketCapitalization', 0)) if data.get('MarketCapitalization') != 'None' else None,
-                    'pe_ratio': float(data.get('PERatio', 0)) if data.get('PERatio') != 'None' else None,
-                    'dividend_yield': float(data.get('DividendYield', 0)) if data.get('DividendYield') != 'None' else None,
-                    'fifty_two_week_high': float(data.get('52WeekHigh', 0)) if data.get('52WeekHigh') != 'None' else None,
-                    'fifty_two_week_low': float(data.get('52WeekLow', 0)) if data.get('52WeekLow') != 'None' else None,
-                    'summary': data.get('Description', 'No description available.')
-                }
+                return _parse_overview(data)
             else:
                 logger.error(f"No overview data for {symbol}: {data}")
                 return None
@@ -119,8 +594,11 @@ class AlphaVantageService:
             logger.error(f"Error fetching overview for {symbol}: {str(e)}")
             return None
     
-    def search_symbol(self, keywords):
-        """Search for symbols by keywords"""
+    async def search_symbol(self, keywords):
+        results = self.search_index.search(keywords)
+        if results:
+            return results
+        
         params = {
             'function': 'SYMBOL_SEARCH',
             'keywords': keywords,
@@ -128,25 +606,10 @@ class AlphaVantageService:
         }
         
         try:
-            response = requests.get(self.base_url, params=params)
-            response.raise_for_status()
-            data = response.json()
+            data = await self._query(params, 'bestMatches')
             
             if 'bestMatches' in data:
-                results = []
-                for match in data['bestMatches'][:10]:  # Limit to 10 results
-                    results.append({
-                        'symbol': match.get('1. symbol'),
-                        'name': match.get('2. name'),
-                        'type': match.get('3. type'),
-                        'region': match.get('4. region'),
-                        'market_open': match.get('5. marketOpen'),
-                        'market_close': match.get('6. marketClose'),
-                        'timezone': match.get('7. timezone'),
-                        'currency': match.get('8. currency'),
-                        'match_score': match.get('9. matchScore')
-                    })
-                return results
+                return _parse_search_results(data)
             else:
                 logger.error(f"No search results for {keywords}: {data}")
                 return []
@@ -155,8 +618,7 @@ class AlphaVantageService:
             logger.error(f"Error searching for {keywords}: {str(e)}")
             return []
     
-    def get_news_sentiment(self, tickers=None, topics=None, limit=50):
-        """Get news and sentiment data"""
+    async def get_news_sentiment(self, tickers=None, topics=None, limit=50):
         params = {
             'function': 'NEWS_SENTIMENT',
             'apikey': self.api_key,
@@ -169,27 +631,14 @@ class AlphaVantageService:
             params['topics'] = topics
             
         try:
-            response = requests.get(self.base_url, params=params)
-            response.raise_for_status()
-            data = response.json()
+            data = await self._query(params, 'feed')
             
             if 'feed' in data:
-                news_items = []
-                for item in data['feed'][:5]:  # Limit to 5 news items
-                    news_items.append({
-                        'title': item.get('title'),
-                        'url': item.get('url'),
-                        'time_published': item.get('time_published'),
-                        'summary': item.get('summary'),
-                        'source': item.get('source'),
-                        'sentiment_score': item.get('overall_sentiment_score'),
-                        'sentiment_label': item.get('overall_sentiment_label')
-                    })
-                return news_items
+                return _parse_news(data)
             else:
                 logger.error(f"No news data: {data}")
                 return []
                 
         except Exception as e:
             logger.error(f"Error fetching news: {str(e)}")
-            return []
\ No newline at end of file
+            return []
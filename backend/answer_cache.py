@@ -0,0 +1,158 @@
+import hashlib
+import os
+import re
+import threading
+from collections import Counter, OrderedDict
+
+from response_cache import MemoryCacheBackend, ResponseCache
+
+CONTRACTIONS = {
+    "what's": 'what is', 'whats': 'what is', "how's": 'how is', 'hows': 'how is', "it's": 'it is',
+    "that's": 'that is', "where's": 'where is', "who's": 'who is', "n't": ' not', "'re": ' are',
+    "'ll": ' will', "i'm": 'i am'
+}
+
+# Near-duplicate queries must agree on these exactly: "is X a buy" and "is X not a sell"
+# are textually close but want different answers
+POLARITY_WORDS = {
+    'not', 'no', 'never', 'without', 'buy', 'sell', 'hold', 'short', 'long', 'up', 'down', 'bull',
+    'bullish', 'bear', 'bearish', 'high', 'low', 'higher', 'lower', 'rise', 'fall', 'best', 'worst',
+    'overvalued', 'undervalued'
+}
+
+
+def normalize_query(query):
+    """Lowercase a query, expand contractions and drop punctuation and extra whitespace"""
+    query = query.lower().replace('’', "'")
+    for contraction, expansion in CONTRACTIONS.items():
+        query = query.replace(contraction, expansion)
+    # Possessives: "apple's" and "apple" ask the same thing
+    query = re.sub(r"'s\b", '', query)
+    return ' '.join(re.findall(r"[a-z0-9$%/]+(?:\.[0-9]+)?", query))
+
+
+def _guard_terms(normalized):
+    """Terms a near-duplicate must share exactly: polarity words and numbers (years,
+    prices, periods), so a question about 2024 never reuses an answer about 2025
+    """
+    words = normalized.split()
+    return POLARITY_WORDS.intersection(words), sorted(word for word in words if re.search(r'[0-9]', word))
+
+
+def _trigrams(text):
+    padded = f' {text} '
+    return frozenset(padded[i:i + 3] for i in range(len(padded) - 2))
+
+
+class AnswerCache:
+    """LRU/TTL cache of NLP answers keyed on the normalized query and the exact context.
+
+    The key includes a hash of the stock data text sent to the model, so an
+    answer goes stale as soon as a quote it was based on changes. Optionally
+    a near-duplicate query (character trigram similarity at or above
+    `similarity`) asked against the same context reuses the cached answer.
+    """
+
+    FUNCTION = 'NLP_ANSWER'
+    # Recent queries remembered per context for near-duplicate lookups
+    QUERIES_PER_CONTEXT = 32
+
+    def __init__(self, ttl=None, max_entries=None, similarity=None):
+        ttl = ttl if ttl is not None else float(os.getenv('NLP_CACHE_TTL', 300))
+        max_entries = max_entries or int(os.getenv('NLP_CACHE_MAX_ENTRIES', 500))
+        self.similarity = similarity if similarity is not None else float(os.getenv('NLP_CACHE_SIMILARITY', 0.85))
+        self.max_contexts = max_entries
+        self.cache = ResponseCache(
+            backend=MemoryCacheBackend(max_entries=max_entries),
+            ttls={self.FUNCTION: ttl}
+        )
+        self._lock = threading.Lock()
+        self._recent = OrderedDict()
+        self._counts = Counter()
+
+    @property
+    def enabled(self):
+        return self.cache.ttl_for(self.FUNCTION) > 0
+
+    @staticmethod
+    def context_hash(context_text):
+        return hashlib.sha256((context_text or '').encode('utf-8')).hexdigest()[:32]
+
+    def get(self, query, context_text):
+        """Return the cached answer for query asked against context_text, or None"""
+        if not self.enabled:
+            return None
+        normalized = normalize_query(query)
+        digest = self.context_hash(context_text)
+
+        answer = self.cache.get(self.FUNCTION, normalized, {'context': digest}, record_stats=False)
+        outcome = 'exact'
+        if answer is None and self.similarity < 1:
+            similar = self._similar_query(normalized, digest)
+            if similar is not None:
+                answer = self.cache.get(self.FUNCTION, similar, {'context': digest}, record_stats=False)
+                outcome = 'near'
+        if answer is None:
+            outcome = 'miss'
+
+        with self._lock:
+            self._counts[outcome] += 1
+        return answer
+
+    def set(self, query, context_text, answer):
+        if not self.enabled:
+            return
+        normalized = normalize_query(query)
+        digest = self.context_hash(context_text)
+        self.cache.set(self.FUNCTION, normalized, {'context': digest}, answer)
+
+        with self._lock:
+            queries = self._recent.setdefault(digest, OrderedDict())
+            self._recent.move_to_end(digest)
+            queries[normalized] = _trigrams(normalized)
+            queries.move_to_end(normalized)
+            while len(queries) > self.QUERIES_PER_CONTEXT:
+                queries.popitem(last=False)
+            while len(self._recent) > self.max_contexts:
+                self._recent.popitem(last=False)
+
+    def _similar_query(self, normalized, digest):
+        trigrams = _trigrams(normalized)
+        guard = _guard_terms(normalized)
+        with self._lock:
+            candidates = list(self._recent.get(digest, {}).items())
+
+        best, best_score = None, self.similarity
+        for candidate, candidate_trigrams in candidates:
+            if _guard_terms(candidate) != guard:
+                continue
+            score = len(trigrams & candidate_trigrams) / len(trigrams | candidate_trigrams)
+            if score >= best_score:
+                best, best_score = candidate, score
+        return best
+
+    def stats(self):
+        with self._lock:
+            counts = dict(self._counts)
+        hits = counts.get('exact', 0) + counts.get('near', 0)
+        lookups = hits + counts.get('miss', 0)
+        return {
+            'exact_hits': counts.get('exact', 0),
+            'near_hits': counts.get('near', 0),
+            'misses': counts.get('miss', 0),
+            'hit_ratio': hits / lookups if lookups else 0.0,
+            'entries': len(self.cache.backend)
+        }
+
+
+_shared_answer_cache = None
+_shared_answer_cache_lock = threading.Lock()
+
+
+def get_answer_cache():
+    """Return the process-wide NLP answer cache shared by the sync and async services"""
+    global _shared_answer_cache
+    with _shared_answer_cache_lock:
+        if _shared_answer_cache is None:
+            _shared_answer_cache = AnswerCache()
+        return _shared_answer_cache
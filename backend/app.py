@@ -1,13 +1,25 @@
-from flask import Flask, request, jsonify
+from flask import Flask, Response, g, request, jsonify
 from flask_cors import CORS
-import yfinance as yf
 import logging
-import time
 import os
-from functools import wraps
+import time
 from dotenv import load_dotenv
 from alpha_vantage_service import AlphaVantageService
+from backtest import BacktestError, BacktestService
 from claude_service import ClaudeService
+from indicators import AVAILABLE_INDICATORS, IndicatorService, to_json_values
+from json_response import HISTORY_FORMATS, encode_body, encode_price_history
+import metrics
+from prefetch import PrefetchScheduler
+from price_history import parse_history_params
+from price_store import get_price_store
+from quote_stream import QueueSubscriber, QuoteStreamHub, format_sse
+from screener import ScreenError, get_screener, parse_screen_query
+from stock_providers import (AlphaVantageProvider, ProviderError, StockDataFetcher, YFinanceProvider,
+                             normalize_av_bundle)
+from streaming_indicators import StreamingIndicatorRegistry
+from symbol_directory import DEFAULT_LISTING_CACHE_PATH
+from yfinance_service import YFinanceService
 
 # Load environment variables
 load_dotenv()
@@ -20,81 +32,123 @@ logger = logging.getLogger(__name__)
 
 # Initialize services
 av_service = AlphaVantageService()
-claude_service = ClaudeService()
-
-def retry_on_rate_limit(retries=3, delay=1):
-    def decorator(func):
-        @wraps(func)
-        def wrapper(*args, **kwargs):
-            for attempt in range(retries):
-                try:
-                    return func(*args, **kwargs)
-                except Exception as e:
-                    if "429" in str(e) and attempt < retries - 1:
-                        logger.warning(f"Rate limited, retrying in {delay} seconds...")
-                        time.sleep(delay)
-                        delay *= 2
-                    else:
-                        raise e
-            return func(*args, **kwargs)
-        return wrapper
-    return decorator
+screener = get_screener()
+claude_service = ClaudeService(av_service=av_service, screener=screener)
+yf_service = YFinanceService()
+
+indicator_service = IndicatorService()
+backtest_service = BacktestService(get_price_store())
+streaming_indicators = StreamingIndicatorRegistry(get_price_store())
+# Quote stream polling: Yahoo bulk quotes by default, so watched symbols don't use up the
+# 5 calls/minute Alpha Vantage budget
+QUOTE_STREAM_SOURCES = {
+    'yf': yf_service.get_quotes,
+    'av': av_service.get_stock_quotes
+}
+quote_hub = QuoteStreamHub(QUOTE_STREAM_SOURCES[os.getenv('QUOTE_STREAM_SOURCE', 'yf')])
+
+# /api/stock-data: one normalized answer from whichever provider responds first
+STOCK_PROVIDERS = {
+    'alpha_vantage': AlphaVantageProvider(av_service),
+    'yfinance': YFinanceProvider(yf_service)
+}
+stock_fetcher = StockDataFetcher(
+    STOCK_PROVIDERS[name.strip()] for name in os.getenv('PROVIDER_ORDER', 'alpha_vantage,yfinance').split(',')
+    if name.strip()
+)
+
+# Keep the watchlist and the most requested symbols warm for /api/av-stock
+prefetcher = PrefetchScheduler(av_service)
+
+def start_background_tasks():
+    """Start the background refresh threads; called by the server that runs the app, not on import"""
+    # No-op without PREFETCH_WATCHLIST or PREFETCH_TOP_N
+    prefetcher.start()
+    
+    # Quotes and fundamentals for the screener universe, refreshed with spare Alpha Vantage tokens
+    screener.start_refresh(av_service)
+    
+    # Symbol search is answered from a local listing; re-download it in the background
+    # (SYMBOL_LISTING_REFRESH_HOURS=0 disables)
+    av_service.search_index.start_refresh(
+        av_service.fetch_listing_status,
+        os.getenv('SYMBOL_LISTING_CACHE_PATH', DEFAULT_LISTING_CACHE_PATH),
+        float(os.getenv('SYMBOL_LISTING_REFRESH_HOURS', 24)) * 3600
+    )
+
+# Cache, rate limiter and token counters are read when /api/metrics is scraped
+metrics_registry = metrics.get_metrics()
+metrics_registry.add_collector(lambda: metrics.cache_samples('alpha_vantage', av_service.cache.stats()))
+metrics_registry.add_collector(lambda: metrics.cache_samples('nlp_answer', claude_service.answer_cache.stats()))
+metrics_registry.add_collector(metrics.rate_limiter_samples)
+metrics_registry.add_collector(lambda: metrics.model_usage_samples(claude_service.usage_metrics.stats()))
+
+# Incremental daily bar fetchers for the price history store, by source
+HISTORY_FETCHERS = {
+    'av': av_service.fetch_daily_bars,
+    'yf': yf_service.fetch_daily_bars
+}
+
+# Services that serve /api/history, by source
+HISTORY_SERVICES = {
+    'av': av_service,
+    'yf': yf_service
+}
+
+MAX_BATCH_SYMBOLS = int(os.getenv('MAX_BATCH_SYMBOLS', 50))
+MAX_BACKTEST_SYMBOLS = int(os.getenv('BACKTEST_MAX_SYMBOLS', 1000))
+# Seconds between keep-alive comments on idle event streams
+SSE_HEARTBEAT_SECONDS = float(os.getenv('SSE_HEARTBEAT_SECONDS', 15))
+SSE_HEADERS = {
+    'Cache-Control': 'no-cache',
+    'X-Accel-Buffering': 'no'
+}
+
+@app.before_request
+def start_request_metrics():
+    g.request_started = time.perf_counter()
+    g.request_timing = metrics.start_request_timing()
+
+@app.after_request
+def record_request_metrics(response):
+    """Record route latency and, with SERVER_TIMING on, add the Server-Timing breakdown"""
+    elapsed = time.perf_counter() - g.request_started
+    route = metrics.route_template(request.url_rule.rule) if request.url_rule else 'unmatched'
+    metrics.record_request(route, request.method, response.status_code, elapsed)
+    server_timing = metrics.server_timing_header(elapsed)
+    if server_timing:
+        response.headers['Server-Timing'] = server_timing
+    return response
+
+@app.teardown_request
+def end_request_metrics(error=None):
+    metrics.end_request_timing(g.pop('request_timing', None))
+
+def json_response(payload, status=200):
+    """orjson-encoded response, brotli/gzip compressed when the client accepts it"""
+    body, headers = encode_body(payload, request.headers.get('Accept-Encoding'))
+    return Response(body, status=status, mimetype='application/json', headers=headers)
+
+def parse_history_format(history_format):
+    """Validate a history_format query parameter; returns (format, error message)"""
+    history_format = history_format or 'json'
+    if history_format not in HISTORY_FORMATS:
+        return history_format, f"Unknown history_format {history_format}, expected one of {', '.join(HISTORY_FORMATS)}"
+    return history_format, None
+
+def build_stock_response(stock_data, history_format='json'):
+    """Encode the price history of an already shaped stock data response"""
+    return {**stock_data, 'price_history': encode_price_history(stock_data['price_history'], history_format)}
 
 @app.route('/api/stock/<symbol>', methods=['GET'])
-@retry_on_rate_limit()
 def get_stock_data(symbol):
+    history_format, error = parse_history_format(request.args.get('history_format'))
+    if error:
+        return jsonify({'error': error}), 400
+    
     try:
-        # Add a longer delay to avoid rate limiting
-        time.sleep(2)
-        
-        # Create ticker with custom session
-        import requests
-        session = requests.Session()
-        session.headers.update({
-            'User-Agent': 'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
-        })
-        
-        ticker = yf.Ticker(symbol, session=session)
-        
-        info = ticker.info
-        history = ticker.history(period="1y")
-        
-        try:
-            news = ticker.news
-        except:
-            news = []
-            
-        try:
-            recommendations = ticker.recommendations
-        except:
-            recommendations = None
-        
-        current_price = history['Close'].iloc[-1] if not history.empty else None
-        
-        response_data = {
-            'symbol': symbol.upper(),
-            'current_price': float(current_price) if current_price else None,
-            'company_name': info.get('longName', symbol.upper()),
-            'market_cap': info.get('marketCap'),
-            'pe_ratio': info.get('trailingPE'),
-            'dividend_yield': info.get('dividendYield'),
-            'volume': info.get('volume'),
-            'day_high': info.get('dayHigh'),
-            'day_low': info.get('dayLow'),
-            'fifty_two_week_high': info.get('fiftyTwoWeekHigh'),
-            'fifty_two_week_low': info.get('fiftyTwoWeekLow'),
-            'sector': info.get('sector'),
-            'industry': info.get('industry'),
-            'summary': info.get('longBusinessSummary'),
-            'news': news[:5] if news else [],
-            'recommendations': recommendations.to_dict('records') if recommendations is not None and not recommendations.empty else [],
-            'price_history': {
-                'dates': [str(date.date()) for date in history.index],
-                'prices': history['Close'].tolist()
-            } if not history.empty else {'dates': [], 'prices': []}
-        }
-        
-        return jsonify(response_data)
+        response_data = yf_service.get_stock_data(symbol)
+        return json_response(build_stock_response(response_data, history_format))
         
     except Exception as e:
         logger.error(f"Error fetching data for {symbol}: {str(e)}")
@@ -123,93 +177,308 @@ def search_stocks(query):
         logger.error(f"Error searching for {query}: {str(e)}")
         return jsonify({'error': f'Failed to search for {query}'}), 400
 
+def parse_symbols(symbols, limit=MAX_BATCH_SYMBOLS):
+    """Normalize a requested symbol list; returns (symbols, error message)"""
+    symbols = list(dict.fromkeys(s.strip().upper() for s in symbols if s and s.strip()))
+    if not symbols:
+        return symbols, 'At least one symbol is required'
+    if len(symbols) > limit:
+        return symbols, f'At most {limit} symbols per request'
+    return symbols, None
+
+def build_av_stock_response(symbol, bundle, history_format='json'):
+    """Shape a get_stock_bundle result for /api/av-stock; returns (body, status)"""
+    if bundle['errors']:
+        logger.warning(f"Partial Alpha Vantage data for {symbol}, missing: {', '.join(bundle['errors'])}")
+    
+    response_data = normalize_av_bundle(symbol, bundle)
+    if response_data is None:
+        return {'error': f'No quote data found for {symbol}'}, 404
+    
+    response_data['price_history'] = encode_price_history(response_data['price_history'], history_format)
+    return response_data, 200
+
+def format_av_search_results(results):
+    return [
+        {
+            'symbol': result['symbol'],
+            'name': result['name'],
+            'type': result['type'],
+            # Local listing matches know their exchange; upstream matches only a region
+            'exchange': result.get('exchange') or f"{result['region']} - {result['currency']}"
+        } for result in results
+    ]
+
 @app.route('/api/av-stock/<symbol>', methods=['GET'])
 def get_alpha_vantage_stock_data(symbol):
     """Get stock data using Alpha Vantage API"""
+    history_format, error = parse_history_format(request.args.get('history_format'))
+    if error:
+        return jsonify({'error': error}), 400
+    
     try:
         logger.info(f"Fetching data for {symbol} using Alpha Vantage")
         
-        # Get stock quote
-        quote_data = av_service.get_stock_quote(symbol)
-        if not quote_data:
-            return jsonify({'error': f'No quote data found for {symbol}'}), 404
+        # Fetch quote, overview, history and news concurrently
+        prefetcher.record_request(symbol)
+        bundle = av_service.get_stock_bundle(symbol)
+        response_data, status = build_av_stock_response(symbol, bundle, history_format)
+        return json_response(response_data, status)
         
-        # Get company overview
-        overview_data = av_service.get_company_overview(symbol)
+    except Exception as e:
+        logger.error(f"Error fetching Alpha Vantage data for {symbol}: {str(e)}")
+        return jsonify({'error': f'Failed to fetch data for {symbol}'}), 500
+
+@app.route('/api/stock-data/<symbol>', methods=['GET'])
+def get_stock_data_from_providers(symbol):
+    """Stock data from the fastest healthy provider, failing over between Alpha Vantage and Yahoo Finance"""
+    history_format, error = parse_history_format(request.args.get('history_format'))
+    if error:
+        return jsonify({'error': error}), 400
+    
+    symbol = symbol.upper()
+    try:
+        prefetcher.record_request(symbol)
+        response_data = stock_fetcher.fetch(symbol)
+        return json_response(build_stock_response(response_data, history_format))
         
-        # Get historical data
-        historical_data = av_service.get_daily_time_series(symbol)
+    except ProviderError as e:
+        logger.warning(str(e))
+        return jsonify({'error': f'No quote data found for {symbol}'}), 404
+    except Exception as e:
+        logger.error(f"Error fetching stock data for {symbol}: {str(e)}")
+        return jsonify({'error': f'Failed to fetch data for {symbol}'}), 502
+
+@app.route('/api/quotes', methods=['GET', 'POST'])
+def get_batch_quotes():
+    """Get quotes for many symbols in one request"""
+    try:
+        if request.method == 'POST':
+            data = request.get_json(silent=True) or {}
+            symbols = data.get('symbols') or []
+            source = data.get('source', 'av')
+        else:
+            symbols = request.args.get('symbols', '').split(',')
+            source = request.args.get('source', 'av')
         
-        # Get news
-        news_data = av_service.get_news_sentiment(tickers=symbol)
+        symbols, error = parse_symbols(symbols)
+        if error:
+            return jsonify({'error': error}), 400
         
-        # Combine all data
-        response_data = {
-            'symbol': quote_data['symbol'],
-            'current_price': quote_data['current_price'],
-            'company_name': overview_data['company_name'] if overview_data else f'{symbol} Company',
-            'market_cap': overview_data['market_cap'] if overview_data else None,
-            'pe_ratio': overview_data['pe_ratio'] if overview_data else None,
-            'dividend_yield': overview_data['dividend_yield'] if overview_data else None,
-            'volume': quote_data['volume'],
-            'day_high': quote_data['high'],
-            'day_low': quote_data['low'],
-            'fifty_two_week_high': overview_data['fifty_two_week_high'] if overview_data else None,
-            'fifty_two_week_low': overview_data['fifty_two_week_low'] if overview_data else None,
-            'sector': overview_data['sector'] if overview_data else 'N/A',
-            'industry': overview_data['industry'] if overview_data else 'N/A',
-            'summary': overview_data['summary'] if overview_data else 'No description available.',
-            'news': [
-                {
-                    'title': item['title'],
-                    'link': item['url'],
-                    'publisher': item['source'],
-                    'providerPublishTime': item['time_published'],
-                    'summary': item['summary']
-                } for item in news_data
-            ],
-            'recommendations': [
-                {
-                    'Firm': 'Alpha Vantage Sentiment Analysis',
-                    'To_Grade': news_data[0]['sentiment_label'] if news_data else 'Neutral',
-                    'Action': 'sentiment',
-                    'Period': quote_data['latest_trading_day']
-                }
-            ] if news_data else [],
-            'price_history': historical_data,
-            'change': quote_data['change'],
-            'change_percent': quote_data['change_percent'],
-            'previous_close': quote_data['previous_close'],
-            'open': quote_data['open']
-        }
+        if source == 'yf':
+            quotes = yf_service.get_quotes(symbols)
+        elif source == 'av':
+            quotes = av_service.get_stock_quotes(symbols)
+        else:
+            return jsonify({'error': f'Unknown source {source}'}), 400
         
-        return jsonify(response_data)
+        return jsonify({
+            'source': source,
+            'quotes': {symbol: quote for symbol, quote in quotes.items() if quote},
+            'missing': [symbol for symbol, quote in quotes.items() if not quote]
+        })
         
     except Exception as e:
-        logger.error(f"Error fetching Alpha Vantage data for {symbol}: {str(e)}")
-        return jsonify({'error': f'Failed to fetch data for {symbol}'}), 500
+        logger.error(f"Error fetching batch quotes: {str(e)}")
+        return jsonify({'error': 'Failed to fetch quotes'}), 500
+
+@app.route('/api/stream/quotes', methods=['GET'])
+def stream_quotes():
+    """Stream quote deltas for the requested symbols as Server-Sent Events"""
+    symbols, error = parse_symbols(request.args.get('symbols', '').split(','))
+    if error:
+        return jsonify({'error': error}), 400
+    
+    subscriber = QueueSubscriber()
+    subscription_id = quote_hub.subscribe(symbols, subscriber)
+    
+    def events():
+        try:
+            yield 'retry: 5000\n\n'
+            while True:
+                event = subscriber.get(timeout=SSE_HEARTBEAT_SECONDS)
+                yield format_sse(event) if event else ': keep-alive\n\n'
+        finally:
+            quote_hub.unsubscribe(subscription_id)
+    
+    return Response(events(), mimetype='text/event-stream', headers=SSE_HEADERS)
 
 @app.route('/api/av-search/<query>', methods=['GET'])
 def search_alpha_vantage_stocks(query):
     """Search for stocks using Alpha Vantage"""
     try:
         results = av_service.search_symbol(query)
-        
-        formatted_results = []
-        for result in results:
-            formatted_results.append({
-                'symbol': result['symbol'],
-                'name': result['name'],
-                'type': result['type'],
-                'exchange': f"{result['region']} - {result['currency']}"
-            })
-        
-        return jsonify(formatted_results)
+        return jsonify(format_av_search_results(results))
         
     except Exception as e:
         logger.error(f"Error searching for {query}: {str(e)}")
         return jsonify({'error': f'Failed to search for {query}'}), 500
 
+def parse_history_request(args):
+    """Validate /api/history query parameters; returns ((source, range, interval, points, format), error)"""
+    source = args.get('source', 'av')
+    if source not in HISTORY_SERVICES:
+        return None, f'Unknown source {source}'
+    params, error = parse_history_params(args.get('range'), args.get('interval'), args.get('points'))
+    if error:
+        return None, error
+    history_format, error = parse_history_format(args.get('history_format'))
+    if error:
+        return None, error
+    return (source, *params, history_format), None
+
+def build_history_response(symbol, source, range_, interval, history, history_format):
+    return {
+        'symbol': symbol,
+        'source': source,
+        'range': range_,
+        'interval': interval,
+        'price_history': encode_price_history(history, history_format)
+    }
+
+@app.route('/api/history/<symbol>', methods=['GET'])
+def get_price_history(symbol):
+    """Closing prices over a range at an interval, optionally downsampled for charting"""
+    params, error = parse_history_request(request.args)
+    if error:
+        return jsonify({'error': error}), 400
+    
+    source, range_, interval, points, history_format = params
+    symbol = symbol.upper()
+    try:
+        history = HISTORY_SERVICES[source].get_price_history(symbol, range_, interval, points)
+        if not len(history['dates']):
+            return jsonify({'error': f'No price history found for {symbol}'}), 404
+        
+        return json_response(build_history_response(symbol, source, range_, interval, history, history_format))
+        
+    except Exception as e:
+        logger.error(f"Error fetching price history for {symbol}: {str(e)}")
+        return jsonify({'error': f'Failed to fetch price history for {symbol}'}), 500
+
+@app.route('/api/indicators/<symbol>', methods=['GET'])
+def get_indicators(symbol):
+    """Get technical indicators computed over the stored daily history"""
+    try:
+        source = request.args.get('source', 'av')
+        if source not in HISTORY_FETCHERS:
+            return jsonify({'error': f'Unknown source {source}'}), 400
+        
+        names = request.args.get('indicators')
+        names = [name.strip() for name in names.split(',')] if names else AVAILABLE_INDICATORS
+        unknown = [name for name in names if name not in AVAILABLE_INDICATORS]
+        if unknown:
+            return jsonify({'error': f"Unknown indicators: {', '.join(unknown)}"}), 400
+        
+        if request.args.get('live') in ('1', 'true'):
+            return jsonify(get_live_indicators(source, symbol.upper(), names))
+        
+        days = request.args.get('days', 252, type=int)
+        if days < 1:
+            return jsonify({'error': 'days must be at least 1'}), 400
+        result = indicator_service.get_indicators(source, symbol.upper(), HISTORY_FETCHERS[source],
+                                                  names=names, days=days)
+        if result is None:
+            return jsonify({'error': f'No price history found for {symbol}'}), 404
+        
+        return jsonify(result)
+        
+    except Exception as e:
+        logger.error(f"Error computing indicators for {symbol}: {str(e)}")
+        return jsonify({'error': f'Failed to compute indicators for {symbol}'}), 500
+
+def get_live_indicators(source, symbol, names=AVAILABLE_INDICATORS):
+    """Latest values of the `names` indicators with the current quote folded into today's bar"""
+    fetcher = HISTORY_FETCHERS[source]
+    if source == 'yf':
+        quote = yf_service.get_quotes([symbol]).get(symbol)
+    else:
+        quote = av_service.get_stock_quote(symbol)
+    
+    state = streaming_indicators.get(source, symbol, fetcher)
+    values = streaming_indicators.on_quote(source, symbol, fetcher, quote) or state.values
+    # Keys are the indicator name, with its period when it has one: 'sma_20', 'macd'
+    values = {key: value for key, value in values.items() if key.split('_')[0] in names}
+    return {
+        'symbol': symbol,
+        'source': source,
+        'date': str(state.last_date) if state.last_date is not None else None,
+        'indicators': to_json_values(values)
+    }
+
+@app.route('/api/screen', methods=['GET'])
+def screen_stocks():
+    """Filter and sort the screener snapshot; `q` takes the screen as a plain English question"""
+    try:
+        params = request.args.to_dict()
+        sort = params.pop('sort', None)
+        order = params.pop('order', None)
+        limit = int(params.pop('limit', 50))
+        query = params.pop('q', None)
+        if query:
+            parsed = parse_screen_query(query)
+            if parsed is None:
+                return jsonify({'error': f'Could not find screening conditions in: {query}'}), 400
+            params = {**parsed['filters'], **params}
+            sort, order = sort or parsed['sort'], order or parsed['order']
+        
+        started = time.perf_counter()
+        result = screener.screen(params, sort or 'market_cap', order or 'desc', limit)
+        result['elapsed_ms'] = round((time.perf_counter() - started) * 1000, 2)
+        return json_response(result)
+        
+    except (ScreenError, ValueError) as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        logger.error(f"Error screening stocks: {str(e)}")
+        return jsonify({'error': 'Failed to screen stocks'}), 500
+
+@app.route('/api/backtest', methods=['POST'])
+def run_backtest():
+    """Backtest a strategy over a parameter grid on locally stored daily history"""
+    try:
+        data = request.get_json(silent=True) or {}
+        source = data.get('source', 'av')
+        if source not in HISTORY_FETCHERS:
+            return jsonify({'error': f'Unknown source {source}'}), 400
+        
+        history_format, error = parse_history_format(data.get('history_format'))
+        if error:
+            return jsonify({'error': error}), 400
+        
+        # '*' backtests every symbol with stored history for the source
+        symbols = data.get('symbols') or []
+        if symbols == '*':
+            symbols = backtest_service.symbols(source)
+            if not symbols:
+                return jsonify({'error': f'No stored {source} price history to backtest'}), 400
+        symbols, error = parse_symbols(symbols, limit=MAX_BACKTEST_SYMBOLS)
+        if error:
+            return jsonify({'error': error}), 400
+        
+        result = backtest_service.run(
+            symbols,
+            data.get('strategy', 'ma_crossover'),
+            params=data.get('params'),
+            source=source,
+            start=data.get('start'),
+            end=data.get('end'),
+            cost_bps=float(data.get('cost_bps', 0)),
+            allow_short=bool(data.get('allow_short', False)),
+            limit=int(data.get('limit', 100)),
+            top=int(data.get('top', 5)),
+            points=int(data['points']) if data.get('points') else None
+        )
+        for curve in result['equity_curves']:
+            curve['history'] = encode_price_history(curve['history'], history_format)
+        return json_response(result)
+        
+    except (BacktestError, TypeError, ValueError) as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        logger.error(f"Error running backtest: {str(e)}")
+        return jsonify({'error': 'Failed to run backtest'}), 500
+
 @app.route('/api/test/<symbol>', methods=['GET'])
 def get_test_stock_data(symbol):
     """Test endpoint with mock data"""
@@ -255,17 +524,23 @@ def get_test_stock_data(symbol):
     }
     return jsonify(mock_data)
 
+def parse_nlp_query(data):
+    """Validate an /api/nlp-query body; returns (query, error message)"""
+    if not isinstance(data, dict) or 'query' not in data:
+        return None, 'Query is required'
+    
+    query = str(data['query']).strip()
+    if not query:
+        return None, 'Query cannot be empty'
+    return query, None
+
 @app.route('/api/nlp-query', methods=['POST'])
 def process_natural_language_query():
     """Process natural language queries about stocks and trading"""
     try:
-        data = request.get_json()
-        if not data or 'query' not in data:
-            return jsonify({'error': 'Query is required'}), 400
-        
-        query = data['query'].strip()
-        if not query:
-            return jsonify({'error': 'Query cannot be empty'}), 400
+        query, error = parse_nlp_query(request.get_json(silent=True))
+        if error:
+            return jsonify({'error': error}), 400
         
         logger.info(f"Processing NLP query: {query}")
         
@@ -278,9 +553,39 @@ def process_natural_language_query():
         logger.error(f"Error processing NLP query: {str(e)}")
         return jsonify({'error': f'Failed to process query: {str(e)}'}), 500
 
+@app.route('/api/nlp-query/stream', methods=['POST'])
+def stream_natural_language_query():
+    """Stream the answer as Server-Sent Events: context first, then text deltas"""
+    query, error = parse_nlp_query(request.get_json(silent=True))
+    if error:
+        return jsonify({'error': error}), 400
+    
+    logger.info(f"Streaming NLP query: {query}")
+    events = claude_service.stream_natural_language_query(query)
+    return Response((format_sse(event) for event in events), mimetype='text/event-stream', headers=SSE_HEADERS)
+
+@app.route('/api/metrics', methods=['GET'])
+def get_metrics():
+    """Prometheus text exposition of route, upstream, cache, rate limiter and token metrics"""
+    return Response(metrics_registry.render(), mimetype='text/plain; version=0.0.4')
+
 @app.route('/api/health', methods=['GET'])
 def health_check():
-    return jsonify({'status': 'healthy'})
+    return jsonify({
+        'status': 'healthy',
+        'symbol_extraction': claude_service.symbol_extractor.stats(),
+        'answer_cache': claude_service.answer_cache.stats(),
+        'model_usage': claude_service.usage_metrics.stats(),
+        'prefetch': prefetcher.stats(),
+        'screener': screener.stats(),
+        'providers': stock_fetcher.stats()
+    })
 
 if __name__ == '__main__':
-    app.run(debug=True, port=5001)
\ No newline at end of file
+    # Development server only; use serve.py in production
+    debug = os.getenv('FLASK_DEBUG', '1') == '1'
+    # In debug mode the reloader re-runs this file in a child process that does the serving;
+    # start the threads there only, not in the watching parent too
+    if not debug or os.environ.get('WERKZEUG_RUN_MAIN') == 'true':
+        start_background_tasks()
+    app.run(debug=debug, port=int(os.getenv('PORT', 5001)))
\ No newline at end of file
@@ -0,0 +1,308 @@
+"""ASGI entry point.
+
+The I/O-heavy routes are served natively async: upstream calls go through
+httpx.AsyncClient and anthropic.AsyncAnthropic, so a worker holds hundreds
+of in-flight requests without a thread each. Every other route falls through
+to the Flask app. Run it with serve.py.
+"""
+import asyncio
+import logging
+import time
+from contextlib import asynccontextmanager
+
+from a2wsgi import WSGIMiddleware
+from starlette.applications import Starlette
+from starlette.middleware import Middleware
+from starlette.middleware.cors import CORSMiddleware
+from starlette.responses import JSONResponse, Response, StreamingResponse
+from starlette.routing import Mount, Route
+
+import app as flask_backend
+import metrics
+from alpha_vantage_service import AsyncAlphaVantageService
+from claude_service import AsyncClaudeService
+from http_session import create_async_http_client
+from json_response import encode_body
+from quote_stream import AsyncQueueSubscriber, format_sse
+from stock_providers import ProviderError
+
+logger = logging.getLogger(__name__)
+# httpx logs every upstream request at INFO
+logging.getLogger('httpx').setLevel(logging.WARNING)
+
+
+@asynccontextmanager
+async def lifespan(app):
+    client = create_async_http_client()
+    app.state.av_service = AsyncAlphaVantageService(client, sync_service=flask_backend.av_service)
+    app.state.claude_service = AsyncClaudeService(av_service=app.state.av_service,
+                                                  screener=flask_backend.screener)
+    flask_backend.start_background_tasks()
+    try:
+        yield
+    finally:
+        await app.state.claude_service.client.close()
+        await client.aclose()
+
+
+class MetricsMiddleware:
+    """Records latency for the native async routes and adds their Server-Timing header.
+
+    Requests that fall through to the Flask mount are recorded by Flask's own
+    request hooks, so they are skipped here rather than counted twice.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http':
+            await self.app(scope, receive, send)
+            return
+
+        started = time.perf_counter()
+        token = metrics.start_request_timing()
+        responded = False
+
+        async def send_with_timing(message):
+            nonlocal responded
+            if message['type'] == 'http.response.start' and not self._is_flask(scope):
+                responded = True
+                elapsed = time.perf_counter() - started
+                metrics.record_request(self._route(scope), scope['method'], message['status'], elapsed)
+                server_timing = metrics.server_timing_header(elapsed)
+                if server_timing:
+                    message['headers'] = [*message.get('headers', []),
+                                          (b'server-timing', server_timing.encode('latin-1'))]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        except Exception:
+            if not responded and not self._is_flask(scope):
+                metrics.record_request(self._route(scope), scope['method'], 500, time.perf_counter() - started)
+            raise
+        finally:
+            metrics.end_request_timing(token)
+
+    @staticmethod
+    def _is_flask(scope):
+        return isinstance(scope.get('route'), Mount)
+
+    @staticmethod
+    def _route(scope):
+        route = scope.get('route')
+        return route.path if route is not None else 'unmatched'
+
+
+def json_response(request, payload, status_code=200):
+    """orjson-encoded response, brotli/gzip compressed when the client accepts it"""
+    body, headers = encode_body(payload, request.headers.get('accept-encoding'))
+    return Response(body, status_code=status_code, media_type='application/json', headers=headers)
+
+
+async def get_stock_data(request):
+    symbol = request.path_params['symbol']
+    history_format, error = flask_backend.parse_history_format(request.query_params.get('history_format'))
+    if error:
+        return JSONResponse({'error': error}, status_code=400)
+
+    try:
+        # yfinance has no async API; keep it off the event loop
+        response_data = await asyncio.to_thread(flask_backend.yf_service.get_stock_data, symbol)
+        return json_response(request, flask_backend.build_stock_response(response_data, history_format))
+
+    except Exception as e:
+        logger.error(f"Error fetching data for {symbol}: {str(e)}")
+        return JSONResponse({'error': f'Failed to fetch data for {symbol}'}, status_code=400)
+
+
+async def get_alpha_vantage_stock_data(request):
+    symbol = request.path_params['symbol']
+    history_format, error = flask_backend.parse_history_format(request.query_params.get('history_format'))
+    if error:
+        return JSONResponse({'error': error}, status_code=400)
+
+    try:
+        logger.info(f"Fetching data for {symbol} using Alpha Vantage")
+        flask_backend.prefetcher.record_request(symbol)
+        bundle = await request.app.state.av_service.get_stock_bundle(symbol)
+        response_data, status = flask_backend.build_av_stock_response(symbol, bundle, history_format)
+        return json_response(request, response_data, status)
+
+    except Exception as e:
+        logger.error(f"Error fetching Alpha Vantage data for {symbol}: {str(e)}")
+        return JSONResponse({'error': f'Failed to fetch data for {symbol}'}, status_code=500)
+
+
+async def get_stock_data_from_providers(request):
+    symbol = request.path_params['symbol'].upper()
+    history_format, error = flask_backend.parse_history_format(request.query_params.get('history_format'))
+    if error:
+        return JSONResponse({'error': error}, status_code=400)
+
+    try:
+        flask_backend.prefetcher.record_request(symbol)
+        # Providers race on the fetcher's thread pool; only the wait for the winner happens here
+        response_data = await asyncio.to_thread(flask_backend.stock_fetcher.fetch, symbol)
+        return json_response(request, flask_backend.build_stock_response(response_data, history_format))
+
+    except ProviderError as e:
+        logger.warning(str(e))
+        return JSONResponse({'error': f'No quote data found for {symbol}'}, status_code=404)
+    except Exception as e:
+        logger.error(f"Error fetching stock data for {symbol}: {str(e)}")
+        return JSONResponse({'error': f'Failed to fetch data for {symbol}'}, status_code=502)
+
+
+async def get_price_history(request):
+    params, error = flask_backend.parse_history_request(request.query_params)
+    if error:
+        return JSONResponse({'error': error}, status_code=400)
+
+    source, range_, interval, points, history_format = params
+    symbol = request.path_params['symbol'].upper()
+    try:
+        if source == 'av':
+            history = await request.app.state.av_service.get_price_history(symbol, range_, interval, points)
+        else:
+            history = await asyncio.to_thread(flask_backend.yf_service.get_price_history,
+                                              symbol, range_, interval, points)
+        if not len(history['dates']):
+            return JSONResponse({'error': f'No price history found for {symbol}'}, status_code=404)
+
+        return json_response(request, flask_backend.build_history_response(
+            symbol, source, range_, interval, history, history_format))
+
+    except Exception as e:
+        logger.error(f"Error fetching price history for {symbol}: {str(e)}")
+        return JSONResponse({'error': f'Failed to fetch price history for {symbol}'}, status_code=500)
+
+
+async def get_batch_quotes(request):
+    try:
+        if request.method == 'POST':
+            try:
+                data = await request.json()
+            except ValueError:
+                data = None
+            data = data if isinstance(data, dict) else {}
+            symbols = data.get('symbols') or []
+            source = data.get('source', 'av')
+        else:
+            symbols = request.query_params.get('symbols', '').split(',')
+            source = request.query_params.get('source', 'av')
+
+        symbols, error = flask_backend.parse_symbols(symbols)
+        if error:
+            return JSONResponse({'error': error}, status_code=400)
+
+        if source == 'yf':
+            quotes = await asyncio.to_thread(flask_backend.yf_service.get_quotes, symbols)
+        elif source == 'av':
+            quotes = await request.app.state.av_service.get_stock_quotes(symbols)
+        else:
+            return JSONResponse({'error': f'Unknown source {source}'}, status_code=400)
+
+        return JSONResponse({
+            'source': source,
+            'quotes': {symbol: quote for symbol, quote in quotes.items() if quote},
+            'missing': [symbol for symbol, quote in quotes.items() if not quote]
+        })
+
+    except Exception as e:
+        logger.error(f"Error fetching batch quotes: {str(e)}")
+        return JSONResponse({'error': 'Failed to fetch quotes'}, status_code=500)
+
+
+async def stream_quotes(request):
+    symbols, error = flask_backend.parse_symbols(request.query_params.get('symbols', '').split(','))
+    if error:
+        return JSONResponse({'error': error}, status_code=400)
+
+    quote_hub = flask_backend.quote_hub
+    subscriber = AsyncQueueSubscriber()
+    subscription_id = quote_hub.subscribe(symbols, subscriber)
+
+    async def events():
+        try:
+            yield 'retry: 5000\n\n'
+            while True:
+                event = await subscriber.get(timeout=flask_backend.SSE_HEARTBEAT_SECONDS)
+                yield format_sse(event) if event else ': keep-alive\n\n'
+        finally:
+            quote_hub.unsubscribe(subscription_id)
+
+    return StreamingResponse(events(), media_type='text/event-stream', headers=flask_backend.SSE_HEADERS)
+
+
+async def search_alpha_vantage_stocks(request):
+    query = request.path_params['query']
+    try:
+        results = await request.app.state.av_service.search_symbol(query)
+        return JSONResponse(flask_backend.format_av_search_results(results))
+
+    except Exception as e:
+        logger.error(f"Error searching for {query}: {str(e)}")
+        return JSONResponse({'error': f'Failed to search for {query}'}, status_code=500)
+
+
+async def _read_nlp_query(request):
+    try:
+        data = await request.json()
+    except ValueError:
+        data = None
+    return flask_backend.parse_nlp_query(data)
+
+
+async def process_natural_language_query(request):
+    try:
+        query, error = await _read_nlp_query(request)
+        if error:
+            return JSONResponse({'error': error}, status_code=400)
+
+        logger.info(f"Processing NLP query: {query}")
+        result = await request.app.state.claude_service.process_natural_language_query(query)
+        return JSONResponse(result)
+
+    except Exception as e:
+        logger.error(f"Error processing NLP query: {str(e)}")
+        return JSONResponse({'error': f'Failed to process query: {str(e)}'}, status_code=500)
+
+
+async def stream_natural_language_query(request):
+    query, error = await _read_nlp_query(request)
+    if error:
+        return JSONResponse({'error': error}, status_code=400)
+
+    logger.info(f"Streaming NLP query: {query}")
+
+    async def events():
+        async for event in request.app.state.claude_service.stream_natural_language_query(query):
+            yield format_sse(event)
+
+    return StreamingResponse(events(), media_type='text/event-stream', headers=flask_backend.SSE_HEADERS)
+
+
+routes = [
+    Route('/api/stock/{symbol}', get_stock_data),
+    Route('/api/av-stock/{symbol}', get_alpha_vantage_stock_data),
+    Route('/api/stock-data/{symbol}', get_stock_data_from_providers),
+    Route('/api/history/{symbol}', get_price_history),
+    Route('/api/quotes', get_batch_quotes, methods=['GET', 'POST']),
+    Route('/api/stream/quotes', stream_quotes),
+    Route('/api/av-search/{query}', search_alpha_vantage_stocks),
+    Route('/api/nlp-query', process_natural_language_query, methods=['POST']),
+    Route('/api/nlp-query/stream', stream_natural_language_query, methods=['POST']),
+    # Everything else (indicators, search, health, ...) is served by Flask on a thread pool
+    Mount('/', app=WSGIMiddleware(flask_backend.app))
+]
+
+app = Starlette(
+    routes=routes,
+    middleware=[
+        Middleware(MetricsMiddleware),
+        Middleware(CORSMiddleware, allow_origins=['*'], allow_methods=['*'], allow_headers=['*'])
+    ],
+    lifespan=lifespan
+)
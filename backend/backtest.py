@@ -0,0 +1,366 @@
+"""Vectorized strategy backtests over the locally stored daily history.
+
+Closes for every requested symbol are aligned into one (symbols, bars)
+matrix and a strategy's positions are computed for a chunk of parameter
+combinations at once as a (combinations, symbols, bars) array, so a sweep
+over a whole universe costs a handful of NumPy passes per chunk instead of a
+Python loop per bar. Sweeps above PARALLEL_MIN_CELLS are split across a
+process pool; the workers map the same price store files, so only
+parameters and metrics cross process boundaries.
+
+A position is decided on a bar's close and held from the next bar on, so no
+signal trades on the close it was computed from.
+"""
+import itertools
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from indicators import TRADING_DAYS, drawdown, rsi, sma
+from price_history import downsample
+from price_store import CLOSE, PriceHistoryStore, get_price_store
+
+logger = logging.getLogger(__name__)
+
+# Parameter values swept when a request leaves a parameter out
+STRATEGIES = {
+    'ma_crossover': {'fast': (10, 20, 50), 'slow': (50, 100, 200)},
+    'rsi_reversion': {'period': (14,), 'lower': (30.0,), 'upper': (70.0,)},
+    'momentum': {'lookback': (20, 60, 120, 252)}
+}
+FLOAT_PARAMS = ('lower', 'upper')
+
+METRICS = ('total_return', 'cagr', 'volatility', 'sharpe', 'max_drawdown', 'trades', 'exposure')
+
+MAX_COMBINATIONS = int(os.getenv('BACKTEST_MAX_COMBINATIONS', 500))
+# Most ranked results and equity curves one run returns
+MAX_LIMIT = 500
+MAX_TOP = 20
+# Combinations x symbols x bars evaluated per NumPy pass; memory is about 50 bytes a cell
+CHUNK_CELLS = int(os.getenv('BACKTEST_CHUNK_CELLS', 1_000_000))
+# Sweeps with at least this many cells are spread over the process pool
+PARALLEL_MIN_CELLS = int(os.getenv('BACKTEST_PARALLEL_MIN_CELLS', 20_000_000))
+MAX_WORKERS = int(os.getenv('BACKTEST_MAX_WORKERS', os.cpu_count() or 1))
+
+
+class BacktestError(ValueError):
+    """A backtest request that cannot be run as given"""
+
+
+def _valid_combination(strategy, params):
+    if strategy == 'ma_crossover':
+        return 1 <= params['fast'] < params['slow']
+    if strategy == 'rsi_reversion':
+        return params['period'] >= 2 and 0 <= params['lower'] < params['upper'] <= 100
+    return params['lookback'] >= 1
+
+
+def parameter_grid(strategy, params=None):
+    """Every valid combination of the requested parameter values, as a list of dicts.
+
+    Each parameter takes a single value or a list; missing ones use the
+    strategy's defaults.
+    """
+    if strategy not in STRATEGIES:
+        raise BacktestError(f"Unknown strategy {strategy}, expected one of {', '.join(STRATEGIES)}")
+    defaults = STRATEGIES[strategy]
+    params = params or {}
+    unknown = sorted(set(params) - set(defaults))
+    if unknown:
+        raise BacktestError(f"Unknown parameters for {strategy}: {', '.join(unknown)}")
+
+    values = {}
+    for name, default in defaults.items():
+        value = params.get(name, default)
+        value = value if isinstance(value, (list, tuple)) else [value]
+        cast = float if name in FLOAT_PARAMS else int
+        try:
+            values[name] = sorted(set(cast(v) for v in value))
+        except (TypeError, ValueError):
+            raise BacktestError(f"Parameter {name} must be a number or a list of numbers")
+
+    grid = [dict(zip(values, combination)) for combination in itertools.product(*values.values())]
+    grid = [combination for combination in grid if _valid_combination(strategy, combination)]
+    if not grid:
+        raise BacktestError(f"No valid parameter combinations for {strategy}")
+    if len(grid) > MAX_COMBINATIONS:
+        raise BacktestError(f"{len(grid)} parameter combinations requested, at most {MAX_COMBINATIONS} allowed")
+    return grid
+
+
+def _forward_fill(values):
+    """Carry the last non-NaN value forward along the bar axis; leading NaNs stay NaN"""
+    index = np.where(np.isnan(values), 0, np.arange(values.shape[-1]))
+    np.maximum.accumulate(index, axis=-1, out=index)
+    return np.take_along_axis(values, index, axis=-1)
+
+
+def load_closes(store, source, symbols, end=None, dates=None):
+    """Stored closes as a (symbols, bars) matrix.
+
+    Bars are aligned on `dates` if given, else on the union of the symbols'
+    trading dates up to `end`; a symbol's missing bars carry its previous
+    close. Returns (symbols found, symbols without history, dates, closes).
+    """
+    series = {}
+    missing = []
+    for symbol in symbols:
+        symbol_dates, ohlcv = store.load(source, symbol)
+        if end is not None:
+            count = np.searchsorted(symbol_dates, end, side='right')
+            symbol_dates, ohlcv = symbol_dates[:count], ohlcv[:count]
+        if len(symbol_dates):
+            series[symbol] = (symbol_dates, ohlcv[:, CLOSE])
+        else:
+            missing.append(symbol)
+
+    if dates is None:
+        dates = np.unique(np.concatenate([d for d, _ in series.values()])) if series else np.empty(0, 'datetime64[D]')
+    closes = np.full((len(series), len(dates)), np.nan)
+    for row, (symbol_dates, close) in enumerate(series.values()):
+        index = np.searchsorted(dates, symbol_dates)
+        on_dates = index < len(dates)
+        on_dates[on_dates] = dates[index[on_dates]] == symbol_dates[on_dates]
+        closes[row, index[on_dates]] = close[on_dates]
+    return list(series), missing, dates, _forward_fill(closes)
+
+
+def _momentum(closes, lookback):
+    change = np.full(closes.shape, np.nan)
+    change[:, lookback:] = closes[:, lookback:] / closes[:, :-lookback] - 1
+    return change
+
+
+def strategy_positions(strategy, closes, grid, allow_short=False, cache=None):
+    """Target position per (combination, symbol, bar): 1 long, 0 flat, -1 short.
+
+    `cache` holds indicator matrices across calls on the same closes, so a
+    period shared by many combinations is computed once.
+    """
+    cache = cache if cache is not None else {}
+
+    def indicator(function, period):
+        key = (function.__name__, period)
+        if key not in cache:
+            cache[key] = function(closes, period)
+        return cache[key]
+
+    short = -1.0 if allow_short else 0.0
+    positions = np.zeros((len(grid),) + closes.shape)
+    with np.errstate(invalid='ignore'):
+        for position, params in zip(positions, grid):
+            if strategy == 'ma_crossover':
+                fast, slow = indicator(sma, params['fast']), indicator(sma, params['slow'])
+                position[:] = np.where(fast > slow, 1.0, np.where(fast <= slow, short, 0.0))
+            elif strategy == 'momentum':
+                change = indicator(_momentum, params['lookback'])
+                position[:] = np.where(change > 0, 1.0, np.where(change < 0, short, 0.0))
+            else:
+                # Enter below `lower`, exit (or go short) above `upper`, hold in between
+                values = indicator(rsi, params['period'])
+                signal = np.where(values < params['lower'], 1.0, np.where(values > params['upper'], short, np.nan))
+                position[:] = np.nan_to_num(_forward_fill(signal))
+    return positions
+
+
+def evaluate(positions, closes, cost=0.0, equity=False):
+    """Performance of positions (..., symbols, bars) held on closes (symbols, bars).
+
+    `cost` is charged as a fraction of the position traded on each change.
+    Returns a dict of METRICS arrays shaped positions.shape[:-1], plus the
+    equity curves when `equity` is set.
+    """
+    returns = np.zeros(closes.shape)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        returns[:, 1:] = closes[:, 1:] / closes[:, :-1] - 1
+    returns[~np.isfinite(returns)] = 0.0
+
+    held = np.zeros(positions.shape)
+    held[..., 1:] = positions[..., :-1]
+    traded = np.abs(np.diff(positions, axis=-1, prepend=0.0))
+    daily = held * returns - traded * cost
+    curve = np.cumprod(1 + daily, axis=-1)
+
+    # Annualize over the bars each symbol actually traded in the window
+    active = np.maximum(np.count_nonzero(~np.isnan(closes), axis=-1), 2)
+    final = curve[..., -1]
+    std = daily.std(axis=-1, ddof=1) if closes.shape[-1] > 1 else np.zeros(final.shape)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        sharpe = np.where(std > 0, daily.mean(axis=-1) / std * np.sqrt(TRADING_DAYS), 0.0)
+        cagr = np.where(final > 0, np.maximum(final, 0) ** (TRADING_DAYS / active) - 1, -1.0)
+
+    result = {
+        'total_return': final - 1,
+        'cagr': cagr,
+        'volatility': std * np.sqrt(TRADING_DAYS),
+        'sharpe': sharpe,
+        'max_drawdown': drawdown(curve).min(axis=-1) if closes.shape[-1] else np.zeros(final.shape),
+        'trades': np.count_nonzero(traded, axis=-1),
+        'exposure': np.count_nonzero(positions, axis=-1) / max(1, closes.shape[-1])
+    }
+    if equity:
+        result['equity'] = curve
+    return result
+
+
+def _sweep(closes, first, strategy, grid, cost, allow_short):
+    """METRICS arrays shaped (combinations, symbols) for the bars from `first` on.
+
+    Positions are computed over the full history so indicator warm-up happens
+    before the window; work is split into blocks of at most CHUNK_CELLS.
+    """
+    rows = max(1, CHUNK_CELLS // max(1, closes.shape[1]))
+    blocks = []
+    for row in range(0, len(closes), rows):
+        block = closes[row:row + rows]
+        step = max(1, CHUNK_CELLS // max(1, block.size))
+        cache = {}
+        parts = []
+        for offset in range(0, len(grid), step):
+            positions = strategy_positions(strategy, block, grid[offset:offset + step], allow_short, cache)
+            parts.append(evaluate(positions[..., first:], block[:, first:], cost))
+        blocks.append({name: np.concatenate([part[name] for part in parts]) for name in METRICS})
+    return {name: np.concatenate([block[name] for block in blocks], axis=1) for name in METRICS}
+
+
+def _sweep_stored(store_root, source, symbols, dates, first, strategy, grid, cost, allow_short):
+    """Process pool task: sweep grid over symbols read straight from the price store"""
+    _, _, _, closes = load_closes(PriceHistoryStore(store_root), source, symbols, dates=dates)
+    return _sweep(closes, first, strategy, grid, cost, allow_short)
+
+
+def _split(items, parts):
+    size = -(-len(items) // parts)
+    return [items[i:i + size] for i in range(0, len(items), size)]
+
+
+def _round(value):
+    return int(value) if isinstance(value, np.integer) else round(float(value), 6)
+
+
+class BacktestService:
+    """Runs strategy parameter sweeps over the symbols stored in the price store.
+
+    Nothing is fetched: a backtest only sees the daily bars already stored by
+    the history, indicator and prefetch paths.
+    """
+
+    def __init__(self, price_store=None, max_workers=MAX_WORKERS, parallel_min_cells=PARALLEL_MIN_CELLS):
+        self.price_store = price_store if price_store is not None else get_price_store()
+        self.max_workers = max_workers
+        self.parallel_min_cells = parallel_min_cells
+        self._pool = None
+        self._pool_lock = threading.Lock()
+
+    def _get_pool(self):
+        with self._pool_lock:
+            if self._pool is None:
+                self._pool = ProcessPoolExecutor(max_workers=self.max_workers)
+            return self._pool
+
+    def symbols(self, source):
+        return self.price_store.symbols(source)
+
+    def _run_sweep(self, source, symbols, dates, closes, first, strategy, grid, cost, allow_short):
+        """Sweep in this process or, for large sweeps, across the pool; returns (metrics, parallel)"""
+        cells = len(grid) * closes.size
+        if self.max_workers <= 1 or cells < self.parallel_min_cells:
+            return _sweep(closes, first, strategy, grid, cost, allow_short), False
+
+        pool = self._get_pool()
+        # Split whichever axis has enough entries to keep every worker busy
+        if len(grid) >= self.max_workers:
+            futures = [pool.submit(_sweep_stored, self.price_store.root, source, symbols, dates, first,
+                                   strategy, chunk, cost, allow_short)
+                       for chunk in _split(grid, self.max_workers)]
+            axis = 0
+        else:
+            futures = [pool.submit(_sweep_stored, self.price_store.root, source, chunk, dates, first,
+                                   strategy, grid, cost, allow_short)
+                       for chunk in _split(symbols, self.max_workers)]
+            axis = 1
+        parts = [future.result() for future in futures]
+        return {name: np.concatenate([part[name] for part in parts], axis=axis) for name in METRICS}, True
+
+    def run(self, symbols, strategy, params=None, source='av', start=None, end=None, cost_bps=0.0,
+            allow_short=False, limit=100, top=5, points=None):
+        """Backtest every parameter combination on every symbol.
+
+        Returns metrics per (params, symbol) sorted by Sharpe ratio (the best
+        `limit`), the same averaged over symbols per combination, buy-and-hold
+        metrics per symbol, and equity curves for the `top` results.
+        """
+        started = time.perf_counter()
+        limit = max(0, min(int(limit), MAX_LIMIT))
+        top = max(0, min(int(top), MAX_TOP))
+        grid = parameter_grid(strategy, params)
+        try:
+            start = np.datetime64(start, 'D') if start else None
+            end = np.datetime64(end, 'D') if end else None
+        except ValueError:
+            raise BacktestError('start and end must be dates as YYYY-MM-DD')
+        cost = float(cost_bps) / 10000
+
+        found, missing, dates, closes = load_closes(self.price_store, source, symbols, end)
+        first = int(np.searchsorted(dates, start)) if start is not None else 0
+        # Symbols whose history ends before the window have nothing to trade
+        trading = ~np.isnan(closes[:, first:]).all(axis=1) if first < len(dates) else np.zeros(len(found), bool)
+        if not trading.all():
+            missing += [symbol for symbol, ok in zip(found, trading) if not ok]
+            found = [symbol for symbol, ok in zip(found, trading) if ok]
+            closes = closes[trading]
+        if not found:
+            raise BacktestError('No stored price history for the requested symbols and dates')
+
+        results, parallel = self._run_sweep(source, found, dates, closes, first, strategy, grid, cost, allow_short)
+        window_closes = closes[:, first:]
+        buy_and_hold = evaluate(np.where(np.isnan(window_closes), 0.0, 1.0), window_closes)
+
+        sharpe = results['sharpe']
+        order = np.argsort(-sharpe, axis=None, kind='stable')
+        ranked = [np.unravel_index(index, sharpe.shape) for index in order[:max(limit, top)]]
+        by_params = [
+            {'params': grid[i], **{name: _round(results[name][i].mean()) for name in METRICS}}
+            for i in range(len(grid))
+        ]
+
+        result = {
+            'strategy': strategy,
+            'source': source,
+            'start': str(dates[first]),
+            'end': str(dates[-1]),
+            'bars': len(dates) - first,
+            'symbols': found,
+            'missing': missing,
+            'combinations': len(grid),
+            'cost_bps': float(cost_bps),
+            'allow_short': allow_short,
+            'parallel': parallel,
+            'results': [
+                {'symbol': found[s], 'params': grid[i], **{name: _round(results[name][i, s]) for name in METRICS}}
+                for i, s in ranked[:limit]
+            ],
+            'by_params': sorted(by_params, key=lambda entry: -entry['sharpe']),
+            'buy_and_hold': {
+                symbol: {name: _round(buy_and_hold[name][s]) for name in METRICS} for s, symbol in enumerate(found)
+            },
+            'equity_curves': [self._equity_curve(strategy, closes, first, dates, grid[i], found, s, cost,
+                                                 allow_short, points)
+                              for i, s in ranked[:top]]
+        }
+        result['elapsed_ms'] = round((time.perf_counter() - started) * 1000, 1)
+        logger.info(f"Backtested {strategy} x{len(grid)} on {len(found)} symbols, {result['bars']} bars "
+                    f"in {result['elapsed_ms']} ms{' (process pool)' if parallel else ''}")
+        return result
+
+    def _equity_curve(self, strategy, closes, first, dates, params, symbols, row, cost, allow_short, points):
+        """{'symbol', 'params', 'history'} with the equity curve of one result as {'dates', 'prices'}"""
+        series = closes[row:row + 1]
+        positions = strategy_positions(strategy, series, [params], allow_short)
+        curve = evaluate(positions[..., first:], series[:, first:], cost, equity=True)['equity'][0, 0]
+        curve_dates, curve = downsample(dates[first:], curve, points)
+        return {'symbol': symbols[row], 'params': params, 'history': {'dates': curve_dates, 'prices': curve}}
@@ -0,0 +1,70 @@
+"""Throughput of the vectorized backtest engine on a parameter sweep.
+
+Run from the backend directory:
+    python benchmarks/bench_backtest.py --symbols 500 --bars 2520 --strategy ma_crossover
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from backtest import STRATEGIES, _sweep, parameter_grid  # noqa: E402
+from bench_indicators import synthetic_ohlcv  # noqa: E402
+from price_store import CLOSE  # noqa: E402
+
+# Wider sweeps than the API defaults
+GRIDS = {
+    'ma_crossover': {'fast': [5, 10, 20, 50], 'slow': [50, 100, 150, 200]},
+    'rsi_reversion': {'period': [7, 14, 21], 'lower': [20, 30], 'upper': [70, 80]},
+    'momentum': {'lookback': [20, 60, 120, 180, 252]}
+}
+
+
+def loop_backtest(close, fast, slow):
+    """Reference MA crossover for one symbol, one bar at a time"""
+    equity, position, fast_sum, slow_sum = 1.0, 0.0, 0.0, 0.0
+    for bar in range(len(close)):
+        if bar:
+            equity *= 1 + position * (close[bar] / close[bar - 1] - 1)
+        fast_sum += close[bar] - (close[bar - fast] if bar >= fast else 0.0)
+        slow_sum += close[bar] - (close[bar - slow] if bar >= slow else 0.0)
+        position = 1.0 if bar >= slow - 1 and fast_sum / fast > slow_sum / slow else 0.0
+    return equity
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--symbols', type=int, default=500)
+    parser.add_argument('--bars', type=int, default=2520)
+    parser.add_argument('--strategy', choices=STRATEGIES, default='ma_crossover')
+    parser.add_argument('--loop-sample', type=int, default=20,
+                        help='symbols to backtest bar by bar for comparison (ma_crossover only)')
+    args = parser.parse_args()
+
+    closes = synthetic_ohlcv(args.symbols, args.bars)[..., CLOSE]
+    grid = parameter_grid(args.strategy, GRIDS[args.strategy])
+
+    started = time.perf_counter()
+    results = _sweep(closes, 0, args.strategy, grid, 0.0, False)
+    elapsed = time.perf_counter() - started
+    runs = len(grid) * args.symbols
+    print(f"vectorized: {len(grid)} combinations x {args.symbols} symbols x {args.bars} bars in "
+          f"{elapsed * 1000:.1f} ms ({runs / elapsed:,.0f} backtests/s)")
+
+    if args.strategy == 'ma_crossover' and args.loop_sample:
+        sample = closes[:args.loop_sample]
+        started = time.perf_counter()
+        finals = [[loop_backtest(close, **params) for close in sample] for params in grid]
+        elapsed = time.perf_counter() - started
+        print(f"per-bar:    {len(grid) * len(sample)} backtests in {elapsed * 1000:.1f} ms "
+              f"({len(grid) * len(sample) / elapsed:,.0f} backtests/s)")
+        matches = np.allclose(np.array(finals) - 1, results['total_return'][:, :len(sample)])
+        print(f"total returns match: {matches}")
+
+
+if __name__ == '__main__':
+    main()
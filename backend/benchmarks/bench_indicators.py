@@ -0,0 +1,57 @@
+"""Throughput of the vectorized indicator engine over many symbols.
+
+Run from the backend directory:
+    python benchmarks/bench_indicators.py --symbols 5000 --bars 252
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from indicators import compute_indicators  # noqa: E402
+
+
+def synthetic_ohlcv(symbols, bars, seed=0):
+    """Random-walk OHLCV of shape (symbols, bars, 5)"""
+    rng = np.random.default_rng(seed)
+    close = 100 * np.exp(np.cumsum(rng.normal(0, 0.02, (symbols, bars)), axis=1))
+    spread = np.abs(rng.normal(0, 0.01, (symbols, bars))) * close
+    open_ = close * (1 + rng.normal(0, 0.005, (symbols, bars)))
+    volume = rng.integers(1e5, 1e7, (symbols, bars)).astype(np.float64)
+    return np.stack([open_, close + spread, close - spread, close, volume], axis=-1)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--symbols', type=int, default=5000)
+    parser.add_argument('--bars', type=int, default=252)
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--loop-sample', type=int, default=100,
+                        help='symbols to time one at a time for comparison')
+    args = parser.parse_args()
+
+    ohlcv = synthetic_ohlcv(args.symbols, args.bars)
+
+    best = float('inf')
+    for _ in range(args.repeat):
+        started = time.perf_counter()
+        compute_indicators(ohlcv)
+        best = min(best, time.perf_counter() - started)
+    print(f"batched:    {args.symbols} symbols x {args.bars} bars in {best * 1000:.1f} ms "
+          f"({args.symbols / best:,.0f} symbols/s)")
+
+    sample = ohlcv[:args.loop_sample]
+    started = time.perf_counter()
+    for series in sample:
+        compute_indicators(series)
+    elapsed = time.perf_counter() - started
+    print(f"per-symbol: {len(sample)} symbols in {elapsed * 1000:.1f} ms "
+          f"({len(sample) / elapsed:,.0f} symbols/s)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,79 @@
+"""Check streaming indicator updates against the batch engine and time them.
+
+Run from the backend directory:
+    python benchmarks/check_streaming_indicators.py --bars 252 --symbols 500
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bench_indicators import synthetic_ohlcv  # noqa: E402
+from indicators import compute_indicators  # noqa: E402
+from price_store import COLUMNS  # noqa: E402
+from streaming_indicators import StreamingIndicators  # noqa: E402
+
+
+def flatten(values, prefix=''):
+    for key, value in values.items():
+        if isinstance(value, dict):
+            yield from flatten(value, f'{prefix}{key}.')
+        else:
+            yield f'{prefix}{key}', value
+
+
+def max_difference(batch, streamed):
+    """Largest absolute difference per indicator between the last batch value and the stream"""
+    batch = dict(flatten(batch))
+    differences = {}
+    for name, value in flatten(streamed):
+        expected = batch[name][-1]
+        if np.isnan(expected) != np.isnan(value):
+            differences[name] = float('inf')
+        elif not np.isnan(expected):
+            differences[name] = abs(expected - value)
+    return differences
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--bars', type=int, default=252)
+    parser.add_argument('--symbols', type=int, default=200)
+    parser.add_argument('--tolerance', type=float, default=1e-8)
+    args = parser.parse_args()
+
+    dates = np.datetime64('2020-01-01') + np.arange(args.bars + 1)
+    ohlcv = synthetic_ohlcv(args.symbols, args.bars + 1, seed=1)
+    high, low, close = (COLUMNS.index(column) for column in ('high', 'low', 'close'))
+
+    worst = {}
+    update_seconds = 0.0
+    for series in ohlcv:
+        state = StreamingIndicators().seed(dates[:-1], series[:-1])
+
+        # Revise today's bar a few times, as intraday quotes would, then settle on the final bar
+        last = series[-1]
+        for revision in (0.98, 1.01):
+            state.update(dates[-1], last[high] * revision, last[low] * revision, last[close] * revision)
+        started = time.perf_counter()
+        streamed = state.update(dates[-1], last[high], last[low], last[close])
+        update_seconds += time.perf_counter() - started
+
+        for name, difference in max_difference(compute_indicators(series), streamed).items():
+            worst[name] = max(worst.get(name, 0.0), difference)
+
+    failed = False
+    for name, difference in sorted(worst.items()):
+        status = 'ok' if difference <= args.tolerance else 'MISMATCH'
+        failed |= status != 'ok'
+        print(f"{name:22s} max |batch - stream| = {difference:.3e}  {status}")
+    print(f"streaming update: {update_seconds / args.symbols * 1e6:.1f} us per symbol per bar")
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,290 @@
+"""Offline load test of the backend against stub upstreams.
+
+Starts the Alpha Vantage and Anthropic stubs (stub_upstreams.py), runs the
+backend under serve.py pointed at them, then drives /api/av-stock,
+/api/av-search and /api/nlp-query with a fixed number of concurrent clients
+and reports requests/s and p50/p95/p99 latency per scenario.
+
+Run from the backend directory:
+    python benchmarks/load_test.py --duration 20 --concurrency 32
+    python benchmarks/load_test.py --cold --save baseline.json
+    python benchmarks/load_test.py --compare baseline.json
+--cold turns the response and answer caches off so every request reaches the
+stubs; --compare exits non-zero if p95 latency or throughput regressed by more
+than --tolerance against a saved run.
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+
+import httpx
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from stub_upstreams import (AlphaVantageHandler, AnthropicHandler, add_stub_arguments,  # noqa: E402
+                            config_from_args, load_listing, start_stub)
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SCENARIOS = ('av-stock', 'av-search', 'nlp-query')
+
+NLP_QUERIES = (
+    "How is {symbol} doing today?",
+    "What's the P/E ratio of {symbol}?",
+    "Compare {symbol} and {other}",
+    "Is {symbol} overvalued compared to {other}?",
+    "What does the latest news say about {symbol}?"
+)
+
+# Cache TTLs zeroed by --cold (daily bars live in the price store either way)
+COLD_CACHE_ENV = {
+    'AV_CACHE_TTL_GLOBAL_QUOTE': '0',
+    'AV_CACHE_TTL_OVERVIEW': '0',
+    'AV_CACHE_TTL_NEWS_SENTIMENT': '0',
+    'AV_CACHE_TTL_SYMBOL_SEARCH': '0',
+    'NLP_CACHE_TTL': '0'
+}
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+class RequestFactory:
+    """Random requests for a scenario, drawn from the first `symbols` listed tickers"""
+
+    def __init__(self, symbols, seed=0):
+        listing = load_listing()
+        self.rng = random.Random(seed)
+        self.symbols = [row['symbol'] for row in listing][:symbols]
+        self.names = [row['name'] for row in listing][:symbols]
+
+    def __call__(self, scenario):
+        """(method, path, json body) for one request"""
+        symbol = self.rng.choice(self.symbols)
+        if scenario == 'av-stock':
+            return 'GET', f'/api/av-stock/{symbol}', None
+        if scenario == 'av-search':
+            return 'GET', f'/api/av-search/{self._search_query()}', None
+        query = self.rng.choice(NLP_QUERIES).format(symbol=symbol, other=self.rng.choice(self.symbols))
+        return 'POST', '/api/nlp-query', {'query': query}
+
+    def _search_query(self):
+        """A ticker prefix, a company name prefix, or a misspelt name, as a user would type them"""
+        kind = self.rng.random()
+        if kind < 0.4:
+            symbol = self.rng.choice(self.symbols)
+            return symbol[:self.rng.randint(1, len(symbol))]
+        name = self.rng.choice(self.names).split()[0].lower()
+        if kind < 0.8 or len(name) < 4:
+            return name[:self.rng.randint(2, len(name))]
+        position = self.rng.randrange(1, len(name) - 1)
+        return name[:position] + name[position + 1] + name[position] + name[position + 2:]
+
+
+async def run_scenario(base_url, scenario, make_request, concurrency, duration, warmup):
+    """Drive one scenario with `concurrency` clients; latencies of successful requests after warm-up"""
+    latencies = []
+    errors = {}
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=60) as client:
+        measure_from = time.perf_counter() + warmup
+        deadline = measure_from + duration
+
+        async def worker():
+            while True:
+                started = time.perf_counter()
+                if started >= deadline:
+                    return
+                method, path, body = make_request(scenario)
+                try:
+                    response = await client.request(method, path, json=body)
+                    failed = f'http_{response.status_code}' if response.status_code >= 400 else None
+                    if not failed and scenario == 'nlp-query' and not response.json().get('success'):
+                        failed = 'unsuccessful'
+                except httpx.HTTPError as e:
+                    failed = type(e).__name__
+                if started < measure_from:
+                    continue
+                if failed:
+                    errors[failed] = errors.get(failed, 0) + 1
+                else:
+                    latencies.append(time.perf_counter() - started)
+
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+
+    return summarize(scenario, np.array(latencies), errors, duration)
+
+
+def summarize(scenario, latencies, errors, duration):
+    p50, p95, p99 = np.percentile(latencies, [50, 95, 99]) * 1000 if len(latencies) else (float('nan'),) * 3
+    return {
+        'scenario': scenario,
+        'requests': int(len(latencies)),
+        'errors': errors,
+        'rps': len(latencies) / duration,
+        'p50_ms': float(p50),
+        'p95_ms': float(p95),
+        'p99_ms': float(p99),
+        'max_ms': float(latencies.max() * 1000) if len(latencies) else float('nan')
+    }
+
+
+def print_results(results):
+    print(f"{'scenario':<12}{'requests':>10}{'errors':>8}{'req/s':>10}{'p50 ms':>10}{'p95 ms':>10}"
+          f"{'p99 ms':>10}{'max ms':>10}")
+    for result in results:
+        print(f"{result['scenario']:<12}{result['requests']:>10}{sum(result['errors'].values()):>8}"
+              f"{result['rps']:>10.1f}{result['p50_ms']:>10.1f}{result['p95_ms']:>10.1f}"
+              f"{result['p99_ms']:>10.1f}{result['max_ms']:>10.1f}")
+        if result['errors']:
+            print(f"{'':<12}errors: {', '.join(f'{reason} x{count}' for reason, count in result['errors'].items())}")
+
+
+def compare(results, baseline, tolerance):
+    """Regressions against a saved run: p95 slower or throughput lower by more than tolerance"""
+    baseline = {result['scenario']: result for result in baseline['results']}
+    regressions = []
+    for result in results:
+        before = baseline.get(result['scenario'])
+        if before is None:
+            continue
+        if result['p95_ms'] > before['p95_ms'] * (1 + tolerance):
+            regressions.append(f"{result['scenario']}: p95 {before['p95_ms']:.1f} -> {result['p95_ms']:.1f} ms")
+        if result['rps'] < before['rps'] * (1 - tolerance):
+            regressions.append(f"{result['scenario']}: {before['rps']:.1f} -> {result['rps']:.1f} req/s")
+    return regressions
+
+
+def backend_env(args, av_port, anthropic_port, port, workdir):
+    env = {
+        **os.environ,
+        'ALPHA_VANTAGE_BASE_URL': f'http://127.0.0.1:{av_port}/query',
+        'ALPHA_VANTAGE_API_KEY': 'benchmark',
+        'ANTHROPIC_BASE_URL': f'http://127.0.0.1:{anthropic_port}',
+        'ANTHROPIC_API_KEY': 'benchmark',
+        # The limiters stay in the path but should not be what is measured
+        'RATE_LIMIT_ALPHA_VANTAGE_PER_MINUTE': str(args.upstream_rate),
+        'RATE_LIMIT_ALPHA_VANTAGE_BURST': str(args.upstream_rate),
+        'RATE_LIMIT_ANTHROPIC_PER_MINUTE': str(args.upstream_rate),
+        'RATE_LIMIT_ANTHROPIC_BURST': str(args.upstream_rate),
+        'RATE_LIMIT_DIR': os.path.join(workdir, 'ratelimits'),
+        'PRICE_STORE_DIR': os.path.join(workdir, 'price_store'),
+        'SYMBOL_LISTING_CACHE_PATH': os.path.join(workdir, 'listing_status.csv'),
+        'AV_CACHE_PATH': os.path.join(workdir, 'av_cache.sqlite3'),
+        'PREFETCH_WATCHLIST': '',
+        'PREFETCH_TOP_N': '0',
+        'HOST': '127.0.0.1',
+        'PORT': str(port),
+        'WEB_CONCURRENCY': str(args.workers),
+        'LOG_LEVEL': 'warning'
+    }
+    if args.cold:
+        env.update(COLD_CACHE_ENV)
+    return env
+
+
+def wait_until_ready(base_url, process, timeout=30):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"Backend exited with code {process.returncode}")
+        try:
+            if httpx.get(f'{base_url}/api/health', timeout=1).status_code == 200:
+                return
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.2)
+    raise RuntimeError(f"Backend did not become ready within {timeout}s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--scenarios', default=','.join(SCENARIOS), help=f"comma-separated: {', '.join(SCENARIOS)}")
+    parser.add_argument('--duration', type=float, default=15, help='measured seconds per scenario')
+    parser.add_argument('--warmup', type=float, default=3, help='unmeasured seconds before each scenario')
+    parser.add_argument('--concurrency', type=int, default=32)
+    parser.add_argument('--symbols', type=int, default=50, help='distinct tickers requests are drawn from')
+    parser.add_argument('--workers', type=int, default=1, help='backend worker processes (WEB_CONCURRENCY)')
+    parser.add_argument('--cold', action='store_true', help='disable the response and NLP answer caches')
+    parser.add_argument('--upstream-rate', type=int, default=100000,
+                        help='backend rate limit for each upstream, per minute')
+    parser.add_argument('--target', help='benchmark an already running backend at this URL instead')
+    parser.add_argument('--save', help='write results to this JSON file')
+    parser.add_argument('--compare', help='JSON file of an earlier run to check for regressions')
+    parser.add_argument('--tolerance', type=float, default=0.15, help='allowed relative regression')
+    add_stub_arguments(parser)
+    args = parser.parse_args()
+
+    scenarios = [scenario.strip() for scenario in args.scenarios.split(',') if scenario.strip()]
+    unknown = set(scenarios) - set(SCENARIOS)
+    if unknown:
+        parser.error(f"unknown scenarios: {', '.join(sorted(unknown))}")
+
+    process = None
+    with tempfile.TemporaryDirectory(prefix='tradebot-bench-') as workdir:
+        base_url = args.target
+        if base_url is None:
+            config = config_from_args(args)
+            av = start_stub(AlphaVantageHandler, config)
+            anthropic = start_stub(AnthropicHandler, config)
+            port = free_port()
+            base_url = f'http://127.0.0.1:{port}'
+            log_path = os.path.join(workdir, 'backend.log')
+            with open(log_path, 'w') as log:
+                process = subprocess.Popen(
+                    [sys.executable, 'serve.py'], cwd=BACKEND_DIR, stdout=log, stderr=subprocess.STDOUT,
+                    env=backend_env(args, av.server_port, anthropic.server_port, port, workdir)
+                )
+            try:
+                wait_until_ready(base_url, process)
+            except RuntimeError:
+                process.kill()
+                with open(log_path) as log:
+                    print(log.read()[-4000:], file=sys.stderr)
+                raise
+
+        try:
+            print(f"{args.concurrency} clients, {args.duration:g}s per scenario, {args.symbols} symbols, "
+                  f"upstream latency {args.latency * 1000:g}+{args.jitter * 1000:g} ms"
+                  f"{', caches off' if args.cold else ''}\n")
+            make_request = RequestFactory(args.symbols)
+            results = [
+                asyncio.run(run_scenario(base_url, scenario, make_request, args.concurrency, args.duration,
+                                         args.warmup))
+                for scenario in scenarios
+            ]
+        finally:
+            if process is not None:
+                process.terminate()
+                process.wait(timeout=10)
+
+    print_results(results)
+
+    if args.save:
+        with open(args.save, 'w') as f:
+            json.dump({'args': vars(args), 'results': results}, f, indent=2)
+
+    if args.compare:
+        with open(args.compare) as f:
+            regressions = compare(results, json.load(f), args.tolerance)
+        if regressions:
+            print(f"\nRegressions beyond {args.tolerance:.0%}:")
+            for regression in regressions:
+                print(f"  {regression}")
+            sys.exit(1)
+        print(f"\nNo regressions beyond {args.tolerance:.0%} against {args.compare}")
+
+
+if __name__ == '__main__':
+    main()
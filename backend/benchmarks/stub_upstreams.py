@@ -0,0 +1,384 @@
+"""Local stand-ins for the Alpha Vantage query API and the Anthropic messages API.
+
+Responses have the same shape as the real services, with deterministic data
+per symbol. Every request waits `latency` seconds plus up to `jitter` more,
+and a share of requests can be failed with a 500 (`error_rate`) or rate
+limited (`rate_limit_rate`). Rate limiting works the way each upstream does
+it: Alpha Vantage answers HTTP 200 with a call-frequency Note, and Anthropic
+answers HTTP 429.
+
+Run from the backend directory to serve both for a manually started backend:
+    python benchmarks/stub_upstreams.py --av-port 8765 --anthropic-port 8766 --latency 0.05
+then point it at them with
+    ALPHA_VANTAGE_BASE_URL=http://127.0.0.1:8765/query ANTHROPIC_BASE_URL=http://127.0.0.1:8766
+"""
+import argparse
+import csv
+import datetime
+import hashlib
+import json
+import os
+import random
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+LISTING_PATH = os.path.join(BACKEND_DIR, 'symbols.csv')
+
+ANALYSIS_TEXT = (
+    "Based on the data provided, the stock has traded in a fairly narrow range recently, with volume close "
+    "to its average. Its valuation sits near the sector median and recent news sentiment is mostly neutral. "
+    "Keep in mind that past performance doesn't guarantee future results, so do your own research and "
+    "consider speaking with a financial advisor before making investment decisions."
+)
+
+
+class StubConfig:
+    """Latency and failure injection shared by the stub servers"""
+
+    def __init__(self, latency=0.05, jitter=0.0, error_rate=0.0, rate_limit_rate=0.0, token_delay=0.005):
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.rate_limit_rate = rate_limit_rate
+        # Anthropic streaming: pause between text deltas
+        self.token_delay = token_delay
+
+    def wait(self):
+        time.sleep(self.latency + random.uniform(0, self.jitter))
+
+    def outcome(self):
+        """'error', 'rate_limited' or 'ok' for the next request"""
+        draw = random.random()
+        if draw < self.error_rate:
+            return 'error'
+        if draw < self.error_rate + self.rate_limit_rate:
+            return 'rate_limited'
+        return 'ok'
+
+
+def load_listing(path=LISTING_PATH):
+    with open(path, newline='') as f:
+        return [row for row in csv.DictReader(f) if row.get('status', 'Active') == 'Active']
+
+
+def _seed(symbol):
+    return int(hashlib.md5(symbol.upper().encode('utf-8')).hexdigest()[:8], 16)
+
+
+def _base_price(symbol):
+    return 20 + _seed(symbol) % 480
+
+
+def daily_series(symbol, days=100, end=None):
+    """Deterministic random-walk daily bars, newest first, in TIME_SERIES_DAILY form"""
+    rng = random.Random(_seed(symbol))
+    end = end or datetime.date.today()
+    price = _base_price(symbol)
+    bars = {}
+    day = end
+    while len(bars) < days:
+        if day.weekday() < 5:
+            close = price
+            price = max(1.0, price * (1 - rng.gauss(0, 0.015)))
+            bars[day.isoformat()] = {
+                '1. open': f'{price:.4f}',
+                '2. high': f'{max(price, close) * 1.01:.4f}',
+                '3. low': f'{min(price, close) * 0.99:.4f}',
+                '4. close': f'{close:.4f}',
+                '5. volume': str(rng.randint(100000, 50000000))
+            }
+        day -= datetime.timedelta(days=1)
+    return bars
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    config = StubConfig()
+    listing = []
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send_json(self, payload, status=200):
+        self._send(status, json.dumps(payload).encode('utf-8'), 'application/json')
+
+    def _send(self, status, body, content_type, headers=None):
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+
+class AlphaVantageHandler(StubHandler):
+    """GET /query?function=... for the functions the backend calls"""
+
+    FUNCTIONS = ('GLOBAL_QUOTE', 'OVERVIEW', 'TIME_SERIES_DAILY', 'TIME_SERIES_INTRADAY', 'NEWS_SENTIMENT',
+                 'SYMBOL_SEARCH')
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        params = {key: values[0] for key, values in parse_qs(url.query).items()}
+        self.config.wait()
+
+        outcome = self.config.outcome()
+        if outcome == 'error':
+            return self._send(500, b'Internal Server Error', 'text/plain')
+        if outcome == 'rate_limited':
+            return self._send_json({
+                'Note': 'Thank you for using Alpha Vantage! Our standard API call frequency is 5 calls per minute '
+                        'and 500 calls per day.'
+            })
+
+        function = params.get('function')
+        if function == 'LISTING_STATUS':
+            return self._send(200, self._listing_csv().encode('utf-8'), 'text/csv')
+
+        if url.path != '/query' or function not in self.FUNCTIONS:
+            return self._send_json({'Error Message': f'Invalid API call: {function}'})
+        self._send_json(getattr(self, f'_{function.lower()}')(params))
+
+    def _global_quote(self, params):
+        symbol = params.get('symbol', '').upper()
+        bars = list(daily_series(symbol, days=2).items())
+        (day, latest), (_, previous) = bars
+        close, previous_close = float(latest['4. close']), float(previous['4. close'])
+        change = close - previous_close
+        return {'Global Quote': {
+            '01. symbol': symbol,
+            '02. open': latest['1. open'],
+            '03. high': latest['2. high'],
+            '04. low': latest['3. low'],
+            '05. price': latest['4. close'],
+            '06. volume': latest['5. volume'],
+            '07. latest trading day': day,
+            '08. previous close': previous['4. close'],
+            '09. change': f'{change:.4f}',
+            '10. change percent': f'{change / previous_close * 100:.4f}%'
+        }}
+
+    def _overview(self, params):
+        symbol = params.get('symbol', '').upper()
+        seed = _seed(symbol)
+        price = _base_price(symbol)
+        return {
+            'Symbol': symbol,
+            'Name': next((row['name'] for row in self.listing if row['symbol'] == symbol), f'{symbol} Corp'),
+            'Description': f'{symbol} is a company used for benchmarking.',
+            'Sector': ('TECHNOLOGY', 'HEALTHCARE', 'FINANCIAL SERVICES', 'ENERGY', 'CONSUMER CYCLICAL')[seed % 5],
+            'Industry': 'SERVICES-PREPACKAGED SOFTWARE',
+            'MarketCapitalization': str(price * (seed % 5000 + 100) * 1000000),
+            'PERatio': f'{5 + seed % 40}.{seed % 100:02d}',
+            'DividendYield': f'0.0{seed % 5}',
+            '52WeekHigh': f'{price * 1.3:.2f}',
+            '52WeekLow': f'{price * 0.7:.2f}'
+        }
+
+    def _time_series_daily(self, params):
+        days = 100 if params.get('outputsize', 'compact') == 'compact' else 2520
+        return {
+            'Meta Data': {'2. Symbol': params.get('symbol', '').upper()},
+            'Time Series (Daily)': daily_series(params.get('symbol', ''), days=days)
+        }
+
+    def _time_series_intraday(self, params):
+        interval = params.get('interval', '5min')
+        step = int(interval.replace('min', ''))
+        rng = random.Random(_seed(params.get('symbol', '')))
+        price = _base_price(params.get('symbol', ''))
+        bars = {}
+        day = datetime.date.today()
+        while len(bars) < 1000:
+            day -= datetime.timedelta(days=1)
+            if day.weekday() >= 5:
+                continue
+            opened = datetime.datetime.combine(day, datetime.time(9, 30))
+            for minute in range(0, 390, step):
+                price = max(1.0, price * (1 + rng.gauss(0, 0.002)))
+                bars[(opened + datetime.timedelta(minutes=minute)).strftime('%Y-%m-%d %H:%M:%S')] = {
+                    '1. open': f'{price:.4f}', '2. high': f'{price:.4f}', '3. low': f'{price:.4f}',
+                    '4. close': f'{price:.4f}', '5. volume': '1000'
+                }
+        return {f'Time Series ({interval})': dict(sorted(bars.items(), reverse=True))}
+
+    def _news_sentiment(self, params):
+        tickers = params.get('tickers', '')
+        now = datetime.datetime.now()
+        return {'feed': [
+            {
+                'title': f'{tickers or "Markets"} headline {index}',
+                'url': f'https://example.com/news/{tickers}/{index}',
+                'time_published': (now - datetime.timedelta(hours=index)).strftime('%Y%m%dT%H%M%S'),
+                'summary': 'A short summary of the article.',
+                'source': 'Benchmark Wire',
+                'overall_sentiment_score': round(0.3 - 0.1 * (index % 6), 3),
+                'overall_sentiment_label': ('Bullish', 'Somewhat-Bullish', 'Neutral')[index % 3]
+            }
+            for index in range(min(int(params.get('limit', 50)), 50))
+        ]}
+
+    def _symbol_search(self, params):
+        keywords = params.get('keywords', '').lower()
+        matches = [
+            row for row in self.listing
+            if row['symbol'].lower().startswith(keywords) or keywords in row['name'].lower()
+        ][:10]
+        return {'bestMatches': [
+            {
+                '1. symbol': row['symbol'],
+                '2. name': row['name'],
+                '3. type': 'Equity',
+                '4. region': 'United States',
+                '8. currency': 'USD',
+                '9. matchScore': '1.0000' if row['symbol'].lower() == keywords else '0.5000'
+            }
+            for row in matches
+        ]}
+
+    def _listing_csv(self):
+        columns = ['symbol', 'name', 'exchange', 'assetType', 'ipoDate', 'delistingDate', 'status']
+        lines = [','.join(columns)]
+        lines.extend(','.join(row.get(column) or '' for column in columns) for row in self.listing)
+        return '\n'.join(lines) + '\n'
+
+
+class AnthropicHandler(StubHandler):
+    """POST /v1/messages, plain or streamed; symbol extraction requests get the tickers in the query back"""
+
+    def do_GET(self):
+        self._send_json({'type': 'error', 'error': {'type': 'not_found_error', 'message': 'Not found'}}, 404)
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers.get('Content-Length') or 0)) or b'{}')
+        self.config.wait()
+
+        outcome = self.config.outcome()
+        if outcome == 'error':
+            return self._send_json({'type': 'error', 'error': {'type': 'api_error', 'message': 'Internal error'}}, 500)
+        if outcome == 'rate_limited':
+            return self._send(429, json.dumps({
+                'type': 'error', 'error': {'type': 'rate_limit_error', 'message': 'Rate limited'}
+            }).encode('utf-8'), 'application/json', {'retry-after': '1'})
+        if urlparse(self.path).path != '/v1/messages':
+            return self.do_GET()
+
+        text = self._answer(body)
+        usage = self._usage(body, text)
+        if body.get('stream'):
+            return self._stream(body, text, usage)
+        self._send_json({
+            'id': f'msg_{random.getrandbits(48):012x}',
+            'type': 'message',
+            'role': 'assistant',
+            'model': body.get('model'),
+            'content': [{'type': 'text', 'text': text}],
+            'stop_reason': 'end_turn',
+            'stop_sequence': None,
+            'usage': usage
+        })
+
+    @staticmethod
+    def _answer(body):
+        content = body['messages'][-1]['content']
+        content = content if isinstance(content, str) else ' '.join(block.get('text', '') for block in content)
+        if content.startswith('Query: ') and content.endswith('Stock symbols:'):
+            symbols = re.findall(r'\b[A-Z]{1,5}\b', content[len('Query: '):-len('Stock symbols:')])
+            symbols = [symbol for symbol in dict.fromkeys(symbols) if symbol not in ('I', 'A')]
+            return ', '.join(symbols) or 'NONE'
+        return ANALYSIS_TEXT
+
+    @staticmethod
+    def _usage(body, text):
+        system = body.get('system') or ''
+        system_text = system if isinstance(system, str) else ' '.join(block.get('text', '') for block in system)
+        cached = isinstance(system, list) and any(block.get('cache_control') for block in system)
+        system_tokens = len(system_text) // 4
+        prompt_tokens = len(json.dumps(body.get('messages'))) // 4
+        return {
+            'input_tokens': prompt_tokens + (0 if cached else system_tokens),
+            'output_tokens': max(1, len(text) // 4),
+            'cache_read_input_tokens': system_tokens if cached else 0,
+            'cache_creation_input_tokens': 0
+        }
+
+    def _stream(self, body, text, usage):
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/event-stream')
+        self.send_header('Cache-Control', 'no-cache')
+        self.send_header('Connection', 'close')
+        self.end_headers()
+        self.close_connection = True
+
+        def event(name, data):
+            self.wfile.write(f'event: {name}\ndata: {json.dumps(data)}\n\n'.encode('utf-8'))
+            self.wfile.flush()
+
+        event('message_start', {'type': 'message_start', 'message': {
+            'id': f'msg_{random.getrandbits(48):012x}', 'type': 'message', 'role': 'assistant',
+            'model': body.get('model'), 'content': [], 'stop_reason': None, 'stop_sequence': None,
+            'usage': {**usage, 'output_tokens': 1}
+        }})
+        event('content_block_start', {'type': 'content_block_start', 'index': 0,
+                                      'content_block': {'type': 'text', 'text': ''}})
+        for chunk in re.findall(r'\S+\s*', text):
+            time.sleep(self.config.token_delay)
+            event('content_block_delta', {'type': 'content_block_delta', 'index': 0,
+                                          'delta': {'type': 'text_delta', 'text': chunk}})
+        event('content_block_stop', {'type': 'content_block_stop', 'index': 0})
+        event('message_delta', {'type': 'message_delta', 'delta': {'stop_reason': 'end_turn', 'stop_sequence': None},
+                                'usage': {'output_tokens': usage['output_tokens']}})
+        event('message_stop', {'type': 'message_stop'})
+
+
+class StubServer(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 1024
+
+
+def start_stub(handler, config, port=0, host='127.0.0.1'):
+    """Serve handler with config on a daemon thread; returns the server (port 0 picks a free port)"""
+    handler = type(handler.__name__, (handler,), {'config': config, 'listing': load_listing()})
+    server = StubServer((host, port), handler)
+    threading.Thread(target=server.serve_forever, name=f'stub-{handler.__name__}', daemon=True).start()
+    return server
+
+
+def add_stub_arguments(parser):
+    parser.add_argument('--latency', type=float, default=0.05, help='seconds every upstream request takes')
+    parser.add_argument('--jitter', type=float, default=0.02, help='up to this many extra seconds, uniformly')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='share of requests failed with a 500')
+    parser.add_argument('--rate-limit-rate', type=float, default=0.0, help='share of requests rate limited')
+    parser.add_argument('--token-delay', type=float, default=0.005,
+                        help='seconds between streamed Anthropic text deltas')
+
+
+def config_from_args(args):
+    return StubConfig(args.latency, args.jitter, args.error_rate, args.rate_limit_rate, args.token_delay)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--av-port', type=int, default=8765)
+    parser.add_argument('--anthropic-port', type=int, default=8766)
+    add_stub_arguments(parser)
+    args = parser.parse_args()
+
+    config = config_from_args(args)
+    av = start_stub(AlphaVantageHandler, config, args.av_port)
+    anthropic = start_stub(AnthropicHandler, config, args.anthropic_port)
+    print(f"ALPHA_VANTAGE_BASE_URL=http://127.0.0.1:{av.server_port}/query")
+    print(f"ANTHROPIC_BASE_URL=http://127.0.0.1:{anthropic.server_port}")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
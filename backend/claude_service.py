@@ -2,17 +2,96 @@ import os
 import anthropic
 import json
 import logging
-from typing import Dict, Any, Optional
+import time
+from typing import Any, AsyncIterator, Dict, Iterator, List, Optional
 from alpha_vantage_service import AlphaVantageService
+from answer_cache import AnswerCache, get_answer_cache
+from http_session import create_async_anthropic_http_client, get_anthropic_http_client
+from metrics import track_upstream
+from model_usage import ModelUsageMetrics, get_model_usage_metrics
+from rate_limiter import get_rate_limiter, jittered_backoff, max_wait
+from screener import Screener, get_screener, parse_screen_query
+from symbol_directory import SymbolExtractor, get_symbol_extractor
 
 logger = logging.getLogger(__name__)
 
+MODEL = "claude-3-haiku-20240307"
+
+# Most symbols a single query gathers data for, and the rough token budget for that data
+MAX_CONTEXT_SYMBOLS = int(os.getenv('NLP_MAX_SYMBOLS', 5))
+CONTEXT_TOKEN_BUDGET = int(os.getenv('NLP_CONTEXT_TOKEN_BUDGET', 600))
+NEWS_PER_SYMBOL = 3
+# Screener rows put in the prompt for screening-style questions
+SCREEN_CONTEXT_ROWS = int(os.getenv('NLP_SCREEN_ROWS', 10))
+
+FINANCIAL_ANALYSIS_PROMPT = """You are a knowledgeable financial advisor and stock market analyst. You provide helpful, accurate, and responsible financial information and analysis.
+
+Key guidelines:
+- Provide factual market analysis based on available data
+- Never give specific buy/sell recommendations as financial advice
+- Always remind users to do their own research and consult financial advisors
+- Focus on educational content about market trends, company fundamentals, and general investment principles
+- Use clear, accessible language while maintaining professional accuracy
+- When discussing stocks, reference current data when available
+
+If stock data is provided in the user's message, incorporate it into your analysis. Always emphasize that past performance doesn't guarantee future results."""
+
+SYMBOL_EXTRACTION_PROMPT = """Extract any stock symbols (ticker symbols) mentioned in the user's query.
+Return only the symbol(s) in uppercase, separated by commas if multiple.
+If no stock symbols are found, return "NONE"."""
+
+def cached_system_prompt(text: str) -> List[Dict[str, Any]]:
+    """System prompt as a content block marked for Anthropic prompt caching.
+
+    The static prefix is then billed at the cache-read rate on later calls (once
+    it reaches the model's minimum cacheable length).
+    """
+    return [{'type': 'text', 'text': text, 'cache_control': {'type': 'ephemeral'}}]
+
+# Built once; every request sends the identical prefix so it can be served from the prompt cache
+ANALYSIS_SYSTEM = cached_system_prompt(FINANCIAL_ANALYSIS_PROMPT)
+SYMBOL_EXTRACTION_SYSTEM = cached_system_prompt(SYMBOL_EXTRACTION_PROMPT)
+
+def estimate_tokens(text: str) -> int:
+    """Cheap token estimate (~4 characters per token for English text)"""
+    return (len(text) + 3) // 4
+
 class ClaudeService:
-    def __init__(self):
-        self.client = anthropic.Anthropic(
-            api_key=os.getenv('ANTHROPIC_API_KEY')
+    RATE_LIMIT_RETRIES = 2
+    
+    def __init__(self, av_service: Optional[AlphaVantageService] = None, client: Optional[anthropic.Anthropic] = None,
+                 symbol_extractor: Optional[SymbolExtractor] = None, answer_cache: Optional[AnswerCache] = None,
+                 usage_metrics: Optional[ModelUsageMetrics] = None, screener: Optional[Screener] = None):
+        self.client = client if client is not None else anthropic.Anthropic(
+            api_key=os.getenv('ANTHROPIC_API_KEY'),
+            http_client=get_anthropic_http_client()
         )
-        self.av_service = AlphaVantageService()
+        self.av_service = av_service if av_service is not None else AlphaVantageService()
+        self.limiter = get_rate_limiter('anthropic')
+        self.symbol_extractor = symbol_extractor if symbol_extractor is not None else get_symbol_extractor()
+        self.answer_cache = answer_cache if answer_cache is not None else get_answer_cache()
+        self.usage_metrics = usage_metrics if usage_metrics is not None else get_model_usage_metrics()
+        self.screener = screener if screener is not None else get_screener()
+    
+    def _create_message(self, call: str, **kwargs):
+        """Call messages.create through the shared Anthropic rate limiter, recording usage under `call`"""
+        for attempt in range(self.RATE_LIMIT_RETRIES + 1):
+            self.limiter.acquire(timeout=max_wait())
+            started_at = time.perf_counter()
+            try:
+                with track_upstream('anthropic', call):
+                    response = self.client.messages.create(**kwargs)
+            except anthropic.RateLimitError:
+                self.usage_metrics.record_error(call)
+                if attempt == self.RATE_LIMIT_RETRIES:
+                    raise
+                self.limiter.backoff(jittered_backoff(attempt))
+                continue
+            except Exception:
+                self.usage_metrics.record_error(call)
+                raise
+            self.usage_metrics.record(call, getattr(response, 'usage', None), time.perf_counter() - started_at)
+            return response
     
     def process_natural_language_query(self, query: str) -> Dict[str, Any]:
         """Process a natural language query about stocks and trading"""
@@ -20,145 +99,426 @@ class ClaudeService:
             # First, determine if the query is asking for specific stock data
             stock_context = self._get_stock_context_from_query(query)
             
-            # Create the system prompt for financial analysis
-            system_prompt = self._create_financial_analysis_prompt()
-            
-            # Format the user message with stock data if available
-            user_message = self._format_user_message(query, stock_context)
+            # Same question against the same data: reuse the earlier answer
+            context_text = self._format_stock_context(stock_context)
+            cached_answer = self.answer_cache.get(query, context_text)
+            if cached_answer is not None:
+                return self._cached_result(query, cached_answer, stock_context)
             
             # Call Claude API
-            response = self.client.messages.create(
-                model="claude-3-haiku-20240307",
-                max_tokens=1000,
-                temperature=0.7,
-                system=system_prompt,
-                messages=[
-                    {
-                        "role": "user",
-                        "content": user_message
-                    }
-                ]
-            )
+            response = self._create_message('analysis', **self._analysis_request(query, stock_context))
             
-            return {
-                'response': response.content[0].text,
-                'stock_data': stock_context,
-                'query': query,
-                'success': True
-            }
+            result = self._success_result(query, response, stock_context)
+            self.answer_cache.set(query, context_text, result['response'])
+            return result
             
         except Exception as e:
             logger.error(f"Error processing natural language query: {str(e)}")
-            return {
-                'response': f"I'm sorry, I encountered an error processing your query: {str(e)}",
-                'stock_data': None,
-                'query': query,
-                'success': False
-            }
+            return self._error_result(query, e)
+    
+    def stream_natural_language_query(self, query: str) -> Iterator[Dict[str, Any]]:
+        """Yield a 'context' event with the stock data, then answer text as 'delta' events.
+
+        Ends with a 'done' event, or an 'error' event if the model call fails.
+        """
+        stock_context = self._get_stock_context_from_query(query)
+        yield {'type': 'context', 'query': query, 'stock_data': stock_context}
+        
+        context_text = self._format_stock_context(stock_context)
+        cached_answer = self.answer_cache.get(query, context_text)
+        if cached_answer is not None:
+            yield {'type': 'delta', 'text': cached_answer}
+            yield {'type': 'done', 'success': True, 'cached': True}
+            return
+        
+        chunks = []
+        try:
+            for text in self._stream_message(**self._analysis_request(query, stock_context)):
+                chunks.append(text)
+                yield {'type': 'delta', 'text': text}
+        except Exception as e:
+            logger.error(f"Error streaming natural language query: {str(e)}")
+            yield self._error_event(e)
+            return
+        self.answer_cache.set(query, context_text, ''.join(chunks))
+        yield {'type': 'done', 'success': True}
+    
+    def _stream_message(self, **kwargs) -> Iterator[str]:
+        """messages.stream through the shared rate limiter, yielding text as it arrives"""
+        for attempt in range(self.RATE_LIMIT_RETRIES + 1):
+            self.limiter.acquire(timeout=max_wait())
+            started_at = time.perf_counter()
+            first_token_at = None
+            try:
+                with track_upstream('anthropic', 'analysis_stream'):
+                    with self.client.messages.stream(**kwargs) as stream:
+                        for text in stream.text_stream:
+                            if first_token_at is None:
+                                first_token_at = time.perf_counter()
+                            yield text
+                        final_message = stream.get_final_message()
+            except anthropic.RateLimitError:
+                self.usage_metrics.record_error('analysis_stream')
+                # Retrying after text went out would repeat it
+                if first_token_at is not None or attempt == self.RATE_LIMIT_RETRIES:
+                    raise
+                self.limiter.backoff(jittered_backoff(attempt))
+                continue
+            except Exception:
+                self.usage_metrics.record_error('analysis_stream')
+                raise
+            self._record_stream_usage(final_message, started_at, first_token_at)
+            return
+    
+    def _record_stream_usage(self, final_message, started_at: float, first_token_at: Optional[float]):
+        self.usage_metrics.record(
+            'analysis_stream',
+            getattr(final_message, 'usage', None),
+            time.perf_counter() - started_at,
+            first_token_latency=first_token_at - started_at if first_token_at is not None else None
+        )
+    
+    def _error_event(self, error: Exception) -> Dict[str, Any]:
+        return {
+            'type': 'error',
+            'error': f"I'm sorry, I encountered an error processing your query: {str(error)}",
+            'success': False
+        }
+    
+    def _analysis_request(self, query: str, stock_context: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+        """Arguments for the main analysis messages.create call"""
+        # Format the user message with stock data if available
+        user_message = self._format_user_message(query, stock_context)
+        
+        return {
+            'model': MODEL,
+            'max_tokens': 1000,
+            'temperature': 0.7,
+            'system': ANALYSIS_SYSTEM,
+            'messages': [
+                {
+                    "role": "user",
+                    "content": user_message
+                }
+            ]
+        }
+    
+    def _success_result(self, query: str, response, stock_context: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+        return {
+            'response': response.content[0].text,
+            'stock_data': stock_context,
+            'query': query,
+            'success': True
+        }
+    
+    def _cached_result(self, query: str, answer: str, stock_context: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+        return {
+            'response': answer,
+            'stock_data': stock_context,
+            'query': query,
+            'success': True,
+            'cached': True
+        }
+    
+    def _error_result(self, query: str, error: Exception) -> Dict[str, Any]:
+        return {
+            'response': f"I'm sorry, I encountered an error processing your query: {str(error)}",
+            'stock_data': None,
+            'query': query,
+            'success': False
+        }
+    
+    def _symbol_extraction_request(self, query: str) -> Dict[str, Any]:
+        """Arguments for the messages.create call that pulls ticker symbols out of a query"""
+        return {
+            'model': MODEL,
+            'max_tokens': 50,
+            'temperature': 0.1,
+            # Instructions are static and cacheable; only the query varies
+            'system': SYMBOL_EXTRACTION_SYSTEM,
+            'messages': [
+                {
+                    "role": "user",
+                    "content": f"Query: {query}\n\nStock symbols:"
+                }
+            ]
+        }
+    
+    def _parse_symbols(self, response) -> List[str]:
+        symbols_text = response.content[0].text.strip()
+        
+        if symbols_text == "NONE" or not symbols_text:
+            return []
+        
+        return [s.strip() for s in symbols_text.split(',') if s.strip()]
+    
+    def _build_stock_context(self, symbols: List[str], summaries: Dict[str, Dict[str, Any]]) -> Dict[str, Any]:
+        stocks = []
+        for symbol in symbols:
+            summary = summaries.get(symbol) or {}
+            stocks.append({
+                'symbol': symbol,
+                'quote': summary.get('quote'),
+                'overview': summary.get('overview'),
+                'news': (summary.get('news') or [])[:NEWS_PER_SYMBOL]
+            })
+        return {
+            'symbol': symbols[0],
+            'symbols': symbols,
+            'stocks': stocks
+        }
+    
+    def _context_symbols(self, symbols: List[str]) -> List[str]:
+        symbols = list(dict.fromkeys(symbol.upper() for symbol in symbols))
+        if len(symbols) > MAX_CONTEXT_SYMBOLS:
+            logger.info(f"Query mentions {len(symbols)} symbols, using the first {MAX_CONTEXT_SYMBOLS}")
+        return symbols[:MAX_CONTEXT_SYMBOLS]
+    
+    def _screen_context(self, query: str) -> Optional[Dict[str, Any]]:
+        """Stock context from the screener snapshot for a screening-style query, else None"""
+        params = parse_screen_query(query)
+        if params is None or not len(self.screener.snapshot):
+            return None
+        
+        screen = self.screener.screen(params['filters'], params['sort'], params['order'], limit=SCREEN_CONTEXT_ROWS)
+        symbols = [row['symbol'] for row in screen['results']]
+        return {
+            'symbol': symbols[0] if symbols else None,
+            'symbols': symbols,
+            'stocks': [],
+            'screen': screen
+        }
     
     def _get_stock_context_from_query(self, query: str) -> Optional[Dict[str, Any]]:
         """Extract stock symbols from query and fetch relevant data"""
         try:
-            # Use Claude to extract stock symbols from the query
-            symbol_extraction_prompt = """
-            Extract any stock symbols (ticker symbols) mentioned in this query. 
-            Return only the symbol(s) in uppercase, separated by commas if multiple.
-            If no stock symbols are found, return "NONE".
-            
-            Query: {query}
-            
-            Stock symbols:""".format(query=query)
-            
-            response = self.client.messages.create(
-                model="claude-3-haiku-20240307",
-                max_tokens=50,
-                temperature=0.1,
-                messages=[
-                    {
-                        "role": "user",
-                        "content": symbol_extraction_prompt
-                    }
-                ]
-            )
-            
-            symbols_text = response.content[0].text.strip()
-            
-            if symbols_text == "NONE" or not symbols_text:
+            # Resolve tickers locally; only ambiguous queries cost an extra model call
+            symbols = self.symbol_extractor.extract(query)
+            if not symbols:
+                # No tickers named: "tech stocks with P/E under 20" is answered from the
+                # snapshot, no per-symbol calls
+                screen_context = self._screen_context(query)
+                if screen_context is not None:
+                    return screen_context
+            if symbols is None:
+                response = self._create_message('symbol_extraction', **self._symbol_extraction_request(query))
+                symbols = self._parse_symbols(response)
+            if not symbols:
                 return None
             
-            # Get data for the first symbol found
-            symbols = [s.strip() for s in symbols_text.split(',')]
-            if symbols and symbols[0]:
-                symbol = symbols[0]
-                
-                # Get stock data from Alpha Vantage
-                quote_data = self.av_service.get_stock_quote(symbol)
-                overview_data = self.av_service.get_company_overview(symbol)
-                news_data = self.av_service.get_news_sentiment(tickers=symbol)
-                
-                return {
-                    'symbol': symbol,
-                    'quote': quote_data,
-                    'overview': overview_data,
-                    'news': news_data[:3] if news_data else []  # Limit to 3 recent news items
-                }
+            # Quote, overview and news for every symbol, all fetched concurrently
+            symbols = self._context_symbols(symbols)
+            summaries = self.av_service.get_stock_summaries(symbols)
             
-            return None
+            return self._build_stock_context(symbols, summaries)
             
         except Exception as e:
             logger.error(f"Error extracting stock context: {str(e)}")
             return None
     
-    def _create_financial_analysis_prompt(self) -> str:
-        """Create the system prompt for financial analysis"""
-        return """You are a knowledgeable financial advisor and stock market analyst. You provide helpful, accurate, and responsible financial information and analysis.
-
-Key guidelines:
-- Provide factual market analysis based on available data
-- Never give specific buy/sell recommendations as financial advice
-- Always remind users to do their own research and consult financial advisors
-- Focus on educational content about market trends, company fundamentals, and general investment principles
-- Use clear, accessible language while maintaining professional accuracy
-- When discussing stocks, reference current data when available
-
-If stock data is provided in the user's message, incorporate it into your analysis. Always emphasize that past performance doesn't guarantee future results."""
-    
     def _format_user_message(self, query: str, stock_context: Optional[Dict[str, Any]]) -> str:
         """Format the user message with stock context if available"""
-        if not stock_context:
+        context_text = self._format_stock_context(stock_context)
+        if not context_text:
             return f"User query: {query}"
+        return f"User query: {query}\n\nCurrent stock data:\n{context_text}"
+    
+    def _format_stock_context(self, stock_context: Optional[Dict[str, Any]]) -> str:
+        """The stock data lines injected into the prompt ('' without context)"""
+        if not stock_context:
+            return ''
         
-        context_text = f"""User query: {query}
-
-Current stock data for {stock_context['symbol']}:
-"""
+        # Lines are admitted tier by tier (prices for every symbol, then company facts,
+        # then headlines) until the token budget runs out, so many symbols still fit
+        entries = [
+            (position, tier, line)
+            for position, stock in enumerate(stock_context['stocks'])
+            for tier, line in self._stock_context_lines(stock)
+        ]
+        if stock_context.get('screen'):
+            entries += self._screen_context_lines(stock_context['screen'])
         
-        if stock_context.get('quote'):
-            quote = stock_context['quote']
-            context_text += f"""
-Price Information:
-- Current Price: ${quote.get('current_price', 'N/A')}
-- Change: {quote.get('change', 'N/A')} ({quote.get('change_percent', 'N/A')})
-- Previous Close: ${quote.get('previous_close', 'N/A')}
-- Volume: {quote.get('volume', 'N/A'):,} shares
-"""
+        budget = CONTEXT_TOKEN_BUDGET
+        included = []
+        for entry in sorted(entries, key=lambda entry: (entry[1], entry[0])):
+            cost = estimate_tokens(entry[2]) + 1
+            if cost > budget:
+                break
+            budget -= cost
+            included.append(entry)
         
-        if stock_context.get('overview'):
-            overview = stock_context['overview']
-            context_text += f"""
-Company Information:
-- Company: {overview.get('company_name', 'N/A')}
-- Sector: {overview.get('sector', 'N/A')}
-- Industry: {overview.get('industry', 'N/A')}
-- Market Cap: ${overview.get('market_cap', 'N/A'):,} if overview.get('market_cap') else 'N/A'
-- P/E Ratio: {overview.get('pe_ratio', 'N/A')}
-"""
+        # Back in per-symbol order for the prompt
+        lines = [line for _, _, line in sorted(included)]
+        return "\n".join(lines)
+    
+    def _stock_context_lines(self, stock: Dict[str, Any]):
+        """(tier, line) pairs describing one symbol, most important first"""
+        symbol = stock['symbol']
+        quote = stock.get('quote')
+        if quote:
+            yield 0, (f"{symbol}: ${quote.get('current_price', 'N/A')}, "
+                      f"change {quote.get('change', 'N/A')} ({quote.get('change_percent', 'N/A')}), "
+                      f"prev close ${quote.get('previous_close', 'N/A')}, "
+                      f"volume {_format_number(quote.get('volume'))}")
+        else:
+            yield 0, f"{symbol}: no quote available"
+        
+        overview = stock.get('overview')
+        if overview:
+            yield 1, (f"{symbol} company: {overview.get('company_name', 'N/A')}; "
+                      f"{overview.get('sector', 'N/A')} / {overview.get('industry', 'N/A')}; "
+                      f"market cap {_format_number(overview.get('market_cap'), '$')}; "
+                      f"P/E {overview.get('pe_ratio') or 'N/A'}")
+        
+        for index, news_item in enumerate(stock.get('news') or []):
+            yield 2 + index, f"{symbol} news: {news_item.get('title', 'N/A')}"
+    
+    def _screen_context_lines(self, screen: Dict[str, Any]):
+        """(position, tier, line) entries for a screen: a summary, then one line per row in rank order"""
+        filters = ', '.join(f"{key}={value}" for key, value in screen['filters'].items())
+        as_of = time.strftime('%Y-%m-%d %H:%M UTC', time.gmtime(screen['as_of']))
+        yield -1, 0, (f"Screen of {screen['total']} stocks ({filters}) as of {as_of}: {screen['count']} match; "
+                      f"top {len(screen['results'])} by {screen['sort']} ({screen['order']})")
+        for rank, row in enumerate(screen['results']):
+            dividend_yield = f"{row['dividend_yield'] * 100:.2f}%" if row['dividend_yield'] is not None else 'N/A'
+            yield rank, 1, (f"{row['symbol']} ({row['name'] or 'N/A'}; {row['sector'] or 'N/A'} / "
+                            f"{row['industry'] or 'N/A'}): ${row['price'] or 'N/A'}, "
+                            f"P/E {row['pe_ratio'] or 'N/A'}, market cap {_format_number(row['market_cap'], '$')}, "
+                            f"dividend yield {dividend_yield}, "
+                            f"52-week range ${row['fifty_two_week_low'] or 'N/A'}-${row['fifty_two_week_high'] or 'N/A'}")
+
+
+def _format_number(value, prefix=''):
+    if not isinstance(value, (int, float)):
+        return 'N/A'
+    if isinstance(value, float) and value.is_integer():
+        value = int(value)
+    return f"{prefix}{value:,}"
+
+
+class AsyncClaudeService(ClaudeService):
+    """ClaudeService on anthropic.AsyncAnthropic for the ASGI app.
+
+    av_service must be an AsyncAlphaVantageService. Prompts and response
+    handling are shared with ClaudeService; only the I/O is awaitable.
+    """
+    
+    def __init__(self, av_service, client: Optional[anthropic.AsyncAnthropic] = None,
+                 symbol_extractor: Optional[SymbolExtractor] = None, answer_cache: Optional[AnswerCache] = None,
+                 usage_metrics: Optional[ModelUsageMetrics] = None, screener: Optional[Screener] = None):
+        self.client = client if client is not None else anthropic.AsyncAnthropic(
+            api_key=os.getenv('ANTHROPIC_API_KEY'),
+            http_client=create_async_anthropic_http_client()
+        )
+        self.av_service = av_service
+        self.limiter = get_rate_limiter('anthropic')
+        self.symbol_extractor = symbol_extractor if symbol_extractor is not None else get_symbol_extractor()
+        self.answer_cache = answer_cache if answer_cache is not None else get_answer_cache()
+        self.usage_metrics = usage_metrics if usage_metrics is not None else get_model_usage_metrics()
+        self.screener = screener if screener is not None else get_screener()
+    
+    async def _create_message(self, call: str, **kwargs):
+        for attempt in range(self.RATE_LIMIT_RETRIES + 1):
+            await self.limiter.acquire_async(timeout=max_wait())
+            started_at = time.perf_counter()
+            try:
+                with track_upstream('anthropic', call):
+                    response = await self.client.messages.create(**kwargs)
+            except anthropic.RateLimitError:
+                self.usage_metrics.record_error(call)
+                if attempt == self.RATE_LIMIT_RETRIES:
+                    raise
+                self.limiter.backoff(jittered_backoff(attempt))
+                continue
+            except Exception:
+                self.usage_metrics.record_error(call)
+                raise
+            self.usage_metrics.record(call, getattr(response, 'usage', None), time.perf_counter() - started_at)
+            return response
+    
+    async def process_natural_language_query(self, query: str) -> Dict[str, Any]:
+        try:
+            stock_context = await self._get_stock_context_from_query(query)
+            context_text = self._format_stock_context(stock_context)
+            cached_answer = self.answer_cache.get(query, context_text)
+            if cached_answer is not None:
+                return self._cached_result(query, cached_answer, stock_context)
+            
+            response = await self._create_message('analysis', **self._analysis_request(query, stock_context))
+            result = self._success_result(query, response, stock_context)
+            self.answer_cache.set(query, context_text, result['response'])
+            return result
+            
+        except Exception as e:
+            logger.error(f"Error processing natural language query: {str(e)}")
+            return self._error_result(query, e)
+    
+    async def stream_natural_language_query(self, query: str) -> AsyncIterator[Dict[str, Any]]:
+        stock_context = await self._get_stock_context_from_query(query)
+        yield {'type': 'context', 'query': query, 'stock_data': stock_context}
         
-        if stock_context.get('news'):
-            context_text += f"""
-Recent News Headlines:
-"""
-            for news_item in stock_context['news']:
-                context_text += f"- {news_item.get('title', 'N/A')}\n"
+        context_text = self._format_stock_context(stock_context)
+        cached_answer = self.answer_cache.get(query, context_text)
+        if cached_answer is not None:
+            yield {'type': 'delta', 'text': cached_answer}
+            yield {'type': 'done', 'success': True, 'cached': True}
+            return
         
-        return context_text
\ No newline at end of file
+        chunks = []
+        try:
+            async for text in self._stream_message(**self._analysis_request(query, stock_context)):
+                chunks.append(text)
+                yield {'type': 'delta', 'text': text}
+        except Exception as e:
+            logger.error(f"Error streaming natural language query: {str(e)}")
+            yield self._error_event(e)
+            return
+        self.answer_cache.set(query, context_text, ''.join(chunks))
+        yield {'type': 'done', 'success': True}
+    
+    async def _stream_message(self, **kwargs) -> AsyncIterator[str]:
+        for attempt in range(self.RATE_LIMIT_RETRIES + 1):
+            await self.limiter.acquire_async(timeout=max_wait())
+            started_at = time.perf_counter()
+            first_token_at = None
+            try:
+                with track_upstream('anthropic', 'analysis_stream'):
+                    async with self.client.messages.stream(**kwargs) as stream:
+                        async for text in stream.text_stream:
+                            if first_token_at is None:
+                                first_token_at = time.perf_counter()
+                            yield text
+                        final_message = await stream.get_final_message()
+            except anthropic.RateLimitError:
+                self.usage_metrics.record_error('analysis_stream')
+                if first_token_at is not None or attempt == self.RATE_LIMIT_RETRIES:
+                    raise
+                self.limiter.backoff(jittered_backoff(attempt))
+                continue
+            except Exception:
+                self.usage_metrics.record_error('analysis_stream')
+                raise
+            self._record_stream_usage(final_message, started_at, first_token_at)
+            return
+    
+    async def _get_stock_context_from_query(self, query: str) -> Optional[Dict[str, Any]]:
+        try:
+            symbols = self.symbol_extractor.extract(query)
+            if not symbols:
+                screen_context = self._screen_context(query)
+                if screen_context is not None:
+                    return screen_context
+            if symbols is None:
+                response = await self._create_message('symbol_extraction', **self._symbol_extraction_request(query))
+                symbols = self._parse_symbols(response)
+            if not symbols:
+                return None
+            
+            symbols = self._context_symbols(symbols)
+            summaries = await self.av_service.get_stock_summaries(symbols)
+            
+            return self._build_stock_context(symbols, summaries)
+            
+        except Exception as e:
+            logger.error(f"Error extracting stock context: {str(e)}")
+            return None
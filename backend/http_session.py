@@ -0,0 +1,140 @@
+import logging
+import os
+import threading
+
+import anthropic
+import httpx
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_USER_AGENT = 'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
+
+
+def _env_float(name, default):
+    return float(os.getenv(name, default))
+
+
+def _env_int(name, default):
+    return int(os.getenv(name, default))
+
+
+class TimeoutSession(requests.Session):
+    """requests.Session that applies a default (connect, read) timeout to every call"""
+
+    def __init__(self, timeout):
+        super().__init__()
+        self.timeout = timeout
+
+    def request(self, method, url, **kwargs):
+        kwargs.setdefault('timeout', self.timeout)
+        return super().request(method, url, **kwargs)
+
+
+def create_http_session(pool_size=None, connect_timeout=None, read_timeout=None,
+                        max_retries=None, backoff_factor=None):
+    """Build a keep-alive session with a bounded connection pool and retry/backoff"""
+    pool_size = pool_size or _env_int('HTTP_POOL_SIZE', 20)
+    connect_timeout = connect_timeout or _env_float('HTTP_CONNECT_TIMEOUT', 3.05)
+    read_timeout = read_timeout or _env_float('HTTP_READ_TIMEOUT', 15)
+    max_retries = max_retries if max_retries is not None else _env_int('HTTP_MAX_RETRIES', 2)
+    backoff_factor = backoff_factor if backoff_factor is not None else _env_float('HTTP_BACKOFF_FACTOR', 0.5)
+
+    retry = Retry(
+        total=max_retries,
+        connect=max_retries,
+        read=max_retries,
+        status=max_retries,
+        backoff_factor=backoff_factor,
+        status_forcelist=(500, 502, 503, 504),
+        allowed_methods=frozenset(['GET', 'HEAD']),
+        raise_on_status=False
+    )
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size,
+                          max_retries=retry)
+
+    session = TimeoutSession(timeout=(connect_timeout, read_timeout))
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    session.headers.update({
+        'User-Agent': DEFAULT_USER_AGENT,
+        'Connection': 'keep-alive'
+    })
+    return session
+
+
+def create_anthropic_http_client():
+    """Build the pooled httpx client used by the Anthropic SDK"""
+    pool_size = _env_int('HTTP_POOL_SIZE', 20)
+    return anthropic.DefaultHttpxClient(
+        limits=httpx.Limits(
+            max_connections=pool_size,
+            max_keepalive_connections=pool_size,
+            keepalive_expiry=_env_float('HTTP_KEEPALIVE_EXPIRY', 60)
+        ),
+        timeout=httpx.Timeout(
+            _env_float('ANTHROPIC_READ_TIMEOUT', 60),
+            connect=_env_float('HTTP_CONNECT_TIMEOUT', 3.05)
+        )
+    )
+
+
+def create_async_http_client(pool_size=None, connect_timeout=None, read_timeout=None, max_retries=None):
+    """Build the pooled httpx.AsyncClient used by the ASGI app's upstream clients"""
+    pool_size = pool_size or _env_int('HTTP_POOL_SIZE', 20)
+    connect_timeout = connect_timeout or _env_float('HTTP_CONNECT_TIMEOUT', 3.05)
+    read_timeout = read_timeout or _env_float('HTTP_READ_TIMEOUT', 15)
+    max_retries = max_retries if max_retries is not None else _env_int('HTTP_MAX_RETRIES', 2)
+
+    limits = httpx.Limits(
+        max_connections=pool_size,
+        max_keepalive_connections=pool_size,
+        keepalive_expiry=_env_float('HTTP_KEEPALIVE_EXPIRY', 60)
+    )
+    # httpx only retries failed connects; 5xx answers are handled by the callers
+    return httpx.AsyncClient(
+        transport=httpx.AsyncHTTPTransport(limits=limits, retries=max_retries),
+        timeout=httpx.Timeout(read_timeout, connect=connect_timeout),
+        headers={'User-Agent': DEFAULT_USER_AGENT}
+    )
+
+
+def create_async_anthropic_http_client():
+    """Async counterpart of create_anthropic_http_client for anthropic.AsyncAnthropic"""
+    pool_size = _env_int('HTTP_POOL_SIZE', 20)
+    return anthropic.DefaultAsyncHttpxClient(
+        limits=httpx.Limits(
+            max_connections=pool_size,
+            max_keepalive_connections=pool_size,
+            keepalive_expiry=_env_float('HTTP_KEEPALIVE_EXPIRY', 60)
+        ),
+        timeout=httpx.Timeout(
+            _env_float('ANTHROPIC_READ_TIMEOUT', 60),
+            connect=_env_float('HTTP_CONNECT_TIMEOUT', 3.05)
+        )
+    )
+
+
+_shared_session = None
+_shared_anthropic_client = None
+_shared_lock = threading.Lock()
+
+
+def get_http_session():
+    """Return the process-wide requests session shared by all upstream clients"""
+    global _shared_session
+    with _shared_lock:
+        if _shared_session is None:
+            _shared_session = create_http_session()
+        return _shared_session
+
+
+def get_anthropic_http_client():
+    """Return the process-wide httpx client shared by all Anthropic clients"""
+    global _shared_anthropic_client
+    with _shared_lock:
+        if _shared_anthropic_client is None:
+            _shared_anthropic_client = create_anthropic_http_client()
+        return _shared_anthropic_client
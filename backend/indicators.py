@@ -0,0 +1,270 @@
+import logging
+
+import numpy as np
+import pandas as pd
+
+from price_store import COLUMNS, get_price_store
+from response_cache import MemoryCacheBackend, ResponseCache
+
+logger = logging.getLogger(__name__)
+
+TRADING_DAYS = 252
+
+DEFAULT_PARAMS = {
+    'sma': 20,
+    'ema': 20,
+    'rsi': 14,
+    'macd': (12, 26, 9),
+    'bollinger': (20, 2.0),
+    'atr': 14,
+    'volatility': 20
+}
+
+AVAILABLE_INDICATORS = ('sma', 'ema', 'rsi', 'macd', 'bollinger', 'atr', 'volatility', 'drawdown')
+
+
+# All functions take a series of shape (bars,) or a matrix of shape (symbols, bars)
+# and compute along the bar axis. Values before an indicator's warm-up are NaN.
+# Work is vectorized across symbols, so a whole universe costs about as many
+# NumPy calls as a single ticker.
+
+def _matrix(values):
+    values = np.asarray(values, dtype=np.float64)
+    return np.atleast_2d(values), values.ndim == 1
+
+
+def _result(matrix, one_dimensional):
+    return matrix[0] if one_dimensional else matrix
+
+
+def _window_diff(cumulative, period):
+    """Per-window totals from a cumulative sum along the bar axis"""
+    padded = np.concatenate([np.zeros((cumulative.shape[0], 1)), cumulative], axis=1)
+    totals = np.full(cumulative.shape, np.nan)
+    if period <= cumulative.shape[1]:
+        totals[:, period - 1:] = padded[:, period:] - padded[:, :-period]
+    return totals
+
+
+def _rolling_sum(matrix, period):
+    """Sum over trailing windows; NaN unless all `period` values are present"""
+    valid = ~np.isnan(matrix)
+    if valid.all():
+        return _window_diff(np.cumsum(matrix, axis=1), period)
+    sums = _window_diff(np.cumsum(np.where(valid, matrix, 0.0), axis=1), period)
+    counts = _window_diff(np.cumsum(valid, axis=1, dtype=np.float64), period)
+    sums[~(counts >= period)] = np.nan
+    return sums
+
+
+def _rolling_std(matrix, period, ddof=0):
+    # Center each row first so the sum-of-squares form doesn't lose precision
+    with np.errstate(invalid='ignore'):
+        centered = matrix - np.nanmean(matrix, axis=1, keepdims=True)
+    mean = _rolling_sum(centered, period) / period
+    variance = _rolling_sum(centered ** 2, period) / period - mean ** 2
+    variance = np.maximum(variance, 0.0) * period / (period - ddof)
+    return np.sqrt(variance)
+
+
+def _ewm_across_symbols(values, alpha):
+    """Recursive EMA over a (bars, symbols) array, vectorized across symbols.
+
+    Starts at each column's first value and holds through missing bars.
+    """
+    result = np.empty_like(values)
+    state = np.full(values.shape[1], np.nan)
+    missing = np.isnan(values)
+    for bar in range(len(values)):
+        current = values[bar]
+        updated = current * alpha
+        updated += state * (1 - alpha)
+        np.copyto(updated, current, where=np.isnan(state))
+        np.copyto(updated, state, where=missing[bar])
+        result[bar] = updated
+        state = updated
+    return result
+
+
+def _seeded_ewm(matrix, alpha, period):
+    """EMA seeded with the simple average of each row's first `period` values"""
+    symbols, bars = matrix.shape
+    valid = ~np.isnan(matrix)
+    first = np.where(valid.any(axis=1), valid.argmax(axis=1), bars)
+    seed_at = first + period - 1
+    warming_up = np.arange(bars) < seed_at[:, None]
+
+    seeded = np.where(warming_up, np.nan, matrix)
+    rows = np.nonzero(seed_at < bars)[0]
+    seeded[rows, seed_at[rows]] = (_rolling_sum(matrix, period) / period)[rows, seed_at[rows]]
+
+    if symbols <= 32:
+        # pandas' compiled EWM is cheapest for a handful of long series
+        frame = pd.DataFrame(seeded.T)
+        result = frame.ewm(alpha=alpha, adjust=False, ignore_na=True).mean().to_numpy().T
+    else:
+        # Looping over bars beats pandas' per-column loop across a large universe
+        result = _ewm_across_symbols(np.ascontiguousarray(seeded.T), alpha).T
+    result[warming_up] = np.nan
+    return result
+
+
+def _diff(matrix):
+    delta = np.full(matrix.shape, np.nan)
+    delta[:, 1:] = np.diff(matrix, axis=1)
+    return delta
+
+
+def sma(close, period=20):
+    close, one_dimensional = _matrix(close)
+    return _result(_rolling_sum(close, period) / period, one_dimensional)
+
+
+def ema(close, period=20):
+    close, one_dimensional = _matrix(close)
+    return _result(_seeded_ewm(close, 2.0 / (period + 1), period), one_dimensional)
+
+
+def rsi(close, period=14):
+    """Wilder's relative strength index"""
+    close, one_dimensional = _matrix(close)
+    delta = _diff(close)
+    gains = _seeded_ewm(np.where(delta > 0, delta, np.where(np.isnan(delta), np.nan, 0.0)), 1.0 / period, period)
+    losses = _seeded_ewm(np.where(delta < 0, -delta, np.where(np.isnan(delta), np.nan, 0.0)), 1.0 / period, period)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        result = np.where(losses == 0, 100.0, 100 - 100 / (1 + gains / losses))
+    result[np.isnan(gains)] = np.nan
+    return _result(result, one_dimensional)
+
+
+def macd(close, fast=12, slow=26, signal=9):
+    """Return (macd line, signal line, histogram)"""
+    close, one_dimensional = _matrix(close)
+    line = _seeded_ewm(close, 2.0 / (fast + 1), fast) - _seeded_ewm(close, 2.0 / (slow + 1), slow)
+    signal_line = _seeded_ewm(line, 2.0 / (signal + 1), signal)
+    return (_result(line, one_dimensional), _result(signal_line, one_dimensional),
+            _result(line - signal_line, one_dimensional))
+
+
+def bollinger(close, period=20, width=2.0):
+    """Return (upper, middle, lower) bands using the population standard deviation"""
+    close, one_dimensional = _matrix(close)
+    middle = _rolling_sum(close, period) / period
+    deviation = _rolling_std(close, period) * width
+    return (_result(middle + deviation, one_dimensional), _result(middle, one_dimensional),
+            _result(middle - deviation, one_dimensional))
+
+
+def true_range(high, low, close):
+    high, one_dimensional = _matrix(high)
+    low, _ = _matrix(low)
+    close, _ = _matrix(close)
+    previous_close = np.roll(close, 1, axis=1)
+    ranges = np.maximum(high - low, np.maximum(np.abs(high - previous_close), np.abs(low - previous_close)))
+    # The first bar has no previous close, so its range is just high - low
+    ranges[:, 0] = high[:, 0] - low[:, 0]
+    return _result(ranges, one_dimensional)
+
+
+def atr(high, low, close, period=14):
+    """Wilder's average true range"""
+    ranges, one_dimensional = _matrix(true_range(high, low, close))
+    return _result(_seeded_ewm(ranges, 1.0 / period, period), one_dimensional)
+
+
+def rolling_volatility(close, period=20, periods_per_year=TRADING_DAYS):
+    """Annualized sample standard deviation of daily log returns"""
+    close, one_dimensional = _matrix(close)
+    log_returns = _diff(np.log(close))
+    return _result(_rolling_std(log_returns, period, ddof=1) * np.sqrt(periods_per_year), one_dimensional)
+
+
+def drawdown(close):
+    """Fractional distance below the running peak (0 at a new high)"""
+    close = np.asarray(close, dtype=np.float64)
+    return close / np.fmax.accumulate(close, axis=-1) - 1
+
+
+def compute_indicators(ohlcv, names=AVAILABLE_INDICATORS, params=None):
+    """Compute indicators for an OHLCV array of shape (bars, 5) or (symbols, bars, 5)"""
+    params = {**DEFAULT_PARAMS, **(params or {})}
+    ohlcv = np.asarray(ohlcv, dtype=np.float64)
+    high = ohlcv[..., COLUMNS.index('high')]
+    low = ohlcv[..., COLUMNS.index('low')]
+    close = ohlcv[..., COLUMNS.index('close')]
+
+    results = {}
+    if 'sma' in names:
+        results[f"sma_{params['sma']}"] = sma(close, params['sma'])
+    if 'ema' in names:
+        results[f"ema_{params['ema']}"] = ema(close, params['ema'])
+    if 'rsi' in names:
+        results[f"rsi_{params['rsi']}"] = rsi(close, params['rsi'])
+    if 'macd' in names:
+        line, signal_line, histogram = macd(close, *params['macd'])
+        results['macd'] = {'macd': line, 'signal': signal_line, 'histogram': histogram}
+    if 'bollinger' in names:
+        upper, middle, lower = bollinger(close, *params['bollinger'])
+        results['bollinger'] = {'upper': upper, 'middle': middle, 'lower': lower}
+    if 'atr' in names:
+        results[f"atr_{params['atr']}"] = atr(high, low, close, params['atr'])
+    if 'volatility' in names:
+        results[f"volatility_{params['volatility']}"] = rolling_volatility(close, params['volatility'])
+    if 'drawdown' in names:
+        results['drawdown'] = drawdown(close)
+    return results
+
+
+def to_json_values(values):
+    """Replace NaN scalars with None so indicator values serialize as JSON null"""
+    if isinstance(values, dict):
+        return {key: to_json_values(value) for key, value in values.items()}
+    return None if np.isnan(values) else round(float(values), 6)
+
+
+def _to_json(values, days):
+    if isinstance(values, dict):
+        return {key: _to_json(value, days) for key, value in values.items()}
+    values = values[-days:]
+    return np.where(np.isnan(values), None, np.round(values, 6)).tolist()
+
+
+class IndicatorService:
+    """Indicators over stored daily history, cached per (source, symbol, last bar)"""
+
+    def __init__(self, price_store=None, cache=None):
+        self.price_store = price_store if price_store is not None else get_price_store()
+        self.cache = cache if cache is not None else ResponseCache(
+            backend=MemoryCacheBackend(max_entries=500),
+            ttls={'INDICATORS': 24 * 60 * 60}
+        )
+
+    def get_indicators(self, source, symbol, fetcher, names=AVAILABLE_INDICATORS, days=TRADING_DAYS):
+        # Whatever is stored still answers when the upstream refresh fails
+        dates, ohlcv = self.price_store.get_bars(source, symbol, fetcher)
+        if not len(dates):
+            return None
+        # values[-0:] would be the whole series; more days than bars is all of them
+        days = max(1, min(int(days), len(dates)))
+
+        names = tuple(sorted(set(names)))
+        key_params = {'source': source, 'last_bar': str(dates[-1]), 'bars': len(dates),
+                      'names': ','.join(names), 'days': days}
+        cached = self.cache.get('INDICATORS', symbol.upper(), key_params)
+        if cached is not None:
+            return cached
+
+        # Compute over the full history so warm-up periods don't eat into the window
+        indicators = compute_indicators(ohlcv, names)
+        drawdowns = indicators.get('drawdown')
+        result = {
+            'symbol': symbol.upper(),
+            'source': source,
+            'dates': np.datetime_as_string(dates[-days:], unit='D').tolist(),
+            'indicators': _to_json(indicators, days)
+        }
+        if drawdowns is not None:
+            result['max_drawdown'] = float(np.min(drawdowns[-days:]))
+
+        self.cache.set('INDICATORS', symbol.upper(), key_params, result)
+        return result
@@ -0,0 +1,124 @@
+"""Fast JSON encoding for large responses.
+
+Payloads are serialized with orjson, which writes NumPy arrays directly
+instead of going through per-element Python lists. Price history can be
+sent in compact wire formats, and bodies are compressed with brotli or
+gzip when the client accepts it.
+"""
+import base64
+import gzip
+import os
+
+import numpy as np
+import orjson
+
+try:
+    import brotli
+except ImportError:  # optional; gzip only
+    brotli = None
+
+HISTORY_FORMATS = ('json', 'delta', 'binary')
+
+# Prices are sent as integer multiples of 1/PRICE_SCALE in the delta format
+PRICE_SCALE = 10000
+
+# Smaller bodies go out uncompressed; the saving would not cover the CPU cost
+MIN_COMPRESS_BYTES = int(os.getenv('RESPONSE_COMPRESS_MIN_BYTES', 1024))
+GZIP_LEVEL = 6
+BROTLI_QUALITY = 5
+
+
+def _default(value):
+    """Encode the NumPy and pandas values orjson does not handle itself"""
+    if isinstance(value, np.generic):
+        return value.item()
+    if hasattr(value, 'isoformat'):
+        return value.isoformat()
+    if hasattr(value, 'tolist'):
+        return value.tolist()
+    raise TypeError(f"Type is not JSON serializable: {type(value).__name__}")
+
+
+def dumps(payload):
+    """Serialize payload to UTF-8 JSON bytes; NaN becomes null"""
+    return orjson.dumps(payload, default=_default,
+                        option=orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS)
+
+
+def _time_unit(dates):
+    """'m' for intraday timestamps, 'D' for daily dates"""
+    unit, _ = np.datetime_data(dates.dtype)
+    return 'm' if unit in ('h', 'm', 's', 'ms', 'us', 'ns') else 'D'
+
+
+def encode_price_history(history, history_format='json'):
+    """Encode a {'dates', 'prices'} price history in one of HISTORY_FORMATS.
+
+    json:   {'dates': ['2024-01-02', ...], 'prices': [187.15, ...]}
+    delta:  first date plus gaps in `unit` (days, or minutes for intraday),
+            and prices as scaled integer deltas; small integers that compress
+            far better than floats
+    binary: base64 little-endian int32 day (or minute) numbers and float64 prices
+    """
+    dates = np.asarray(history['dates'])
+    if dates.dtype.kind != 'M':
+        dates = dates.astype('datetime64[D]')
+    unit = _time_unit(dates)
+    dates = dates.astype(f'datetime64[{unit}]')
+    prices = np.asarray(history['prices'], dtype=np.float64)
+
+    if history_format == 'delta':
+        steps = dates.astype(np.int64)
+        scaled = np.rint(np.nan_to_num(prices) * PRICE_SCALE).astype(np.int64)
+        return {
+            'format': 'delta',
+            'unit': unit,
+            'start': str(dates[0]) if len(dates) else None,
+            'date_deltas': np.diff(steps, prepend=steps[:1]),
+            'scale': PRICE_SCALE,
+            'prices': np.diff(scaled, prepend=0)
+        }
+
+    if history_format == 'binary':
+        return {
+            'format': 'binary',
+            'unit': unit,
+            'dates': base64.b64encode(dates.astype(np.int64).astype('<i4').tobytes()).decode('ascii'),
+            'prices': base64.b64encode(prices.astype('<f8').tobytes()).decode('ascii')
+        }
+
+    return {
+        'dates': np.datetime_as_string(dates, unit=unit).tolist(),
+        'prices': prices
+    }
+
+
+def negotiate_encoding(accept_encoding):
+    """Pick 'br' or 'gzip' from an Accept-Encoding header, or None"""
+    accepted = set()
+    for part in (accept_encoding or '').split(','):
+        coding, _, params = part.strip().partition(';')
+        if params.strip().replace(' ', '') in ('q=0', 'q=0.0'):
+            continue
+        accepted.add(coding.strip().lower())
+
+    if brotli is not None and 'br' in accepted:
+        return 'br'
+    if 'gzip' in accepted:
+        return 'gzip'
+    return None
+
+
+def encode_body(payload, accept_encoding=None):
+    """JSON body bytes and headers for payload, compressed if the client accepts it"""
+    body = dumps(payload)
+    headers = {'Vary': 'Accept-Encoding'}
+
+    encoding = negotiate_encoding(accept_encoding) if len(body) >= MIN_COMPRESS_BYTES else None
+    if encoding == 'br':
+        body = brotli.compress(body, quality=BROTLI_QUALITY)
+    elif encoding == 'gzip':
+        body = gzip.compress(body, compresslevel=GZIP_LEVEL)
+    if encoding:
+        headers['Content-Encoding'] = encoding
+    return body, headers
@@ -0,0 +1,259 @@
+"""Request and upstream call metrics in the Prometheus text format.
+
+Route latency is recorded by the Flask and ASGI request hooks, upstream latency
+and failures by `track_upstream` around each Alpha Vantage, Yahoo and Anthropic
+call. Cache, rate limiter and token counters already kept by the services are
+read at scrape time by collectors. With SERVER_TIMING enabled, each response
+also carries a Server-Timing header breaking its time down by upstream call.
+"""
+import os
+import re
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from rate_limiter import get_rate_limiters, is_rate_limit_error
+
+PREFIX = 'tradebot_'
+
+# Seconds; upper bounds of the latency histogram buckets
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+METRICS = {
+    'http_request_duration_seconds': ('histogram', 'Time to the response headers, by route'),
+    'upstream_request_duration_seconds': ('histogram', 'Upstream call latency, excluding time queued on the rate limiter'),
+    'upstream_errors_total': ('counter', 'Failed upstream calls, by reason (rate_limited for 429s and quota notes)'),
+    'cache_hits_total': ('counter', 'Cache lookups answered from the cache'),
+    'cache_misses_total': ('counter', 'Cache lookups that went upstream'),
+    'cache_hit_ratio': ('gauge', 'Share of cache lookups answered from the cache'),
+    'cache_entries': ('gauge', 'Entries currently held by the cache'),
+    'rate_limiter_waiting': ('gauge', 'Callers queued for a rate limiter token in this process'),
+    'rate_limiter_tokens': ('gauge', 'Tokens currently available in the rate limiter bucket'),
+    'model_tokens_total': ('counter', 'Anthropic tokens, by call type and token type'),
+    'model_calls_total': ('counter', 'Completed Anthropic calls, by call type'),
+    'provider_requests_total': ('counter', 'Stock data provider requests by outcome: won, lost to a hedge, or failed'),
+    'provider_hedges_total': ('counter', 'Stock data requests also sent to the next provider after a slow answer')
+}
+
+SERVER_TIMING_ENABLED = os.getenv('SERVER_TIMING', 'false').lower() in ('1', 'true', 'yes')
+
+# Upstream call durations for the request being served, when Server-Timing is on
+_request_timings = ContextVar('request_timings', default=None)
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_labels(labels):
+    if not labels:
+        return ''
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in labels) + '}'
+
+
+def _format_value(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class MetricsRegistry:
+    """Thread-safe counters and fixed-bucket histograms keyed on (name, labels).
+
+    Recording a value takes one lock and a bisect, cheap enough for every
+    request and upstream call. Collectors are callables returning
+    (name, labels, value) samples that are computed only when scraped.
+    """
+
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = tuple(buckets)
+        self._lock = threading.Lock()
+        self._counters = {}
+        self._histograms = {}
+        self._collectors = []
+
+    def inc(self, name, amount=1, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + amount
+
+    def observe(self, name, value, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                # Per-bucket counts plus +Inf, then sum and count
+                histogram = self._histograms[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            histogram[0][index] += 1
+            histogram[1] += value
+            histogram[2] += 1
+
+    def add_collector(self, collector):
+        self._collectors.append(collector)
+
+    def samples(self):
+        """All current samples as {name: [(suffix, labels, value)]}; histograms expand to _bucket/_sum/_count"""
+        with self._lock:
+            counters = dict(self._counters)
+            histograms = {key: (list(counts), total, count) for key, (counts, total, count) in self._histograms.items()}
+
+        samples = {}
+        for (name, labels), value in counters.items():
+            samples.setdefault(name, []).append(('', labels, value))
+        for (name, labels), (counts, total, count) in histograms.items():
+            series = samples.setdefault(name, [])
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (None,), counts):
+                cumulative += bucket_count
+                le = '+Inf' if bound is None else repr(float(bound))
+                series.append(('_bucket', labels + (('le', le),), cumulative))
+            series.append(('_sum', labels, total))
+            series.append(('_count', labels, count))
+
+        for collector in self._collectors:
+            for name, labels, value in collector():
+                samples.setdefault(name, []).append(('', tuple(sorted(labels.items())), value))
+        return samples
+
+    def render(self):
+        """Prometheus text exposition of every metric"""
+        lines = []
+        for name, series in sorted(self.samples().items()):
+            kind, help_text = METRICS.get(name, ('untyped', name))
+            lines.append(f'# HELP {PREFIX}{name} {help_text}')
+            lines.append(f'# TYPE {PREFIX}{name} {kind}')
+            for suffix, labels, value in series:
+                lines.append(f'{PREFIX}{name}{suffix}{_format_labels(labels)} {_format_value(value)}')
+        return '\n'.join(lines) + '\n'
+
+
+def error_reason(error):
+    """Short label for why an upstream call failed: rate_limited, timeout, http_<status> or the error type"""
+    status = getattr(error, 'status_code', None) or getattr(getattr(error, 'response', None), 'status_code', None)
+    if status == 429 or is_rate_limit_error(error):
+        return 'rate_limited'
+    if 'timeout' in type(error).__name__.lower():
+        return 'timeout'
+    if isinstance(status, int):
+        return f'http_{status}'
+    return type(error).__name__
+
+
+def record_upstream(upstream, call, elapsed, error=None):
+    """Record one finished upstream call (and its failure reason, if any)"""
+    metrics = get_metrics()
+    metrics.observe('upstream_request_duration_seconds', elapsed, upstream=upstream, call=call)
+    if error is not None:
+        metrics.inc('upstream_errors_total', upstream=upstream, call=call, reason=error_reason(error))
+    add_server_timing(f'{upstream}.{call}', elapsed)
+
+
+def count_upstream_error(upstream, call, reason):
+    """Count a failure the upstream reported in a successful response, e.g. an Alpha Vantage quota note"""
+    get_metrics().inc('upstream_errors_total', upstream=upstream, call=call, reason=reason)
+
+
+@contextmanager
+def track_upstream(upstream, call):
+    """Time the block as one call to upstream; exceptions are counted and re-raised"""
+    started = time.perf_counter()
+    try:
+        yield
+    except Exception as e:
+        record_upstream(upstream, call, time.perf_counter() - started, e)
+        raise
+    record_upstream(upstream, call, time.perf_counter() - started)
+
+
+def route_template(rule):
+    """Flask '/api/stock/<symbol>' as '/api/stock/{symbol}', the form Starlette routes use"""
+    return re.sub(r'<(?:[^:<>]+:)?([^<>]+)>', r'{\1}', rule)
+
+
+def record_request(route, method, status, elapsed):
+    get_metrics().observe('http_request_duration_seconds', elapsed, route=route, method=method, status=str(status))
+
+
+def start_request_timing():
+    """Begin collecting Server-Timing entries for the current request; returns a token for end_request_timing"""
+    return _request_timings.set([]) if SERVER_TIMING_ENABLED else None
+
+
+def end_request_timing(token):
+    if token is not None:
+        _request_timings.reset(token)
+
+
+def add_server_timing(name, elapsed):
+    timings = _request_timings.get()
+    if timings is not None:
+        timings.append((name, elapsed))
+
+
+def server_timing_header(total):
+    """Server-Timing value: time per upstream call (summed over repeats) and the request total, in ms"""
+    timings = _request_timings.get()
+    if timings is None:
+        return None
+
+    durations = {}
+    counts = {}
+    for name, elapsed in list(timings):
+        durations[name] = durations.get(name, 0.0) + elapsed
+        counts[name] = counts.get(name, 0) + 1
+
+    entries = [
+        f'{re.sub(r"[^A-Za-z0-9_.-]", "_", name)};dur={elapsed * 1000:.1f}'
+        + (f';desc="{counts[name]} calls"' if counts[name] > 1 else '')
+        for name, elapsed in durations.items()
+    ]
+    entries.append(f'total;dur={total * 1000:.1f}')
+    return ', '.join(entries)
+
+
+def cache_samples(cache_name, stats):
+    """Collector samples for a ResponseCache- or AnswerCache-style stats() dict"""
+    samples = [('cache_entries', {'cache': cache_name}, stats.get('entries', 0))]
+    by_function = stats.get('by_function')
+    if by_function is None:
+        hits = stats.get('hits', stats.get('exact_hits', 0) + stats.get('near_hits', 0))
+        by_function = {cache_name.upper(): {'hits': hits, 'misses': stats['misses'], 'hit_ratio': stats['hit_ratio']}}
+    for function, function_stats in by_function.items():
+        labels = {'cache': cache_name, 'function': function}
+        samples.append(('cache_hits_total', labels, function_stats['hits']))
+        samples.append(('cache_misses_total', labels, function_stats['misses']))
+        samples.append(('cache_hit_ratio', labels, function_stats['hit_ratio']))
+    return samples
+
+
+def rate_limiter_samples():
+    samples = []
+    for name, limiter in get_rate_limiters().items():
+        samples.append(('rate_limiter_waiting', {'limiter': name}, limiter.waiting))
+        samples.append(('rate_limiter_tokens', {'limiter': name}, limiter.available()))
+    return samples
+
+
+def model_usage_samples(stats):
+    """Collector samples for ModelUsageMetrics.stats()"""
+    samples = []
+    for call, call_stats in stats['by_call'].items():
+        samples.append(('model_calls_total', {'call': call}, call_stats['calls']))
+        for field in ('input_tokens', 'output_tokens', 'cache_read_input_tokens', 'cache_creation_input_tokens'):
+            token_type = field[:-len('_tokens')].replace('_input', '')
+            samples.append(('model_tokens_total', {'call': call, 'type': token_type}, call_stats[field]))
+    return samples
+
+
+_shared_metrics = None
+_shared_metrics_lock = threading.Lock()
+
+
+def get_metrics():
+    """Return the process-wide metrics registry"""
+    global _shared_metrics
+    with _shared_metrics_lock:
+        if _shared_metrics is None:
+            _shared_metrics = MetricsRegistry()
+        return _shared_metrics
@@ -0,0 +1,84 @@
+import threading
+
+USAGE_FIELDS = ('input_tokens', 'output_tokens', 'cache_read_input_tokens', 'cache_creation_input_tokens')
+
+
+class ModelUsageMetrics:
+    """Thread-safe token usage and latency counters for Anthropic calls, per call type.
+
+    Token counts come from the `usage` block of each response; cache reads and
+    writes show whether prompt caching is taking effect.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}
+
+    def _entry(self, call):
+        entry = self._calls.get(call)
+        if entry is None:
+            entry = self._calls[call] = {
+                'calls': 0,
+                'errors': 0,
+                **{field: 0 for field in USAGE_FIELDS},
+                'latency_total': 0.0,
+                'latency_max': 0.0,
+                'first_token_total': 0.0,
+                'first_token_count': 0
+            }
+        return entry
+
+    def record(self, call, usage, latency, first_token_latency=None):
+        """Count one completed call; usage may be None (e.g. from a stubbed client)"""
+        with self._lock:
+            entry = self._entry(call)
+            entry['calls'] += 1
+            for field in USAGE_FIELDS:
+                entry[field] += getattr(usage, field, None) or 0
+            entry['latency_total'] += latency
+            entry['latency_max'] = max(entry['latency_max'], latency)
+            if first_token_latency is not None:
+                entry['first_token_total'] += first_token_latency
+                entry['first_token_count'] += 1
+
+    def record_error(self, call):
+        with self._lock:
+            self._entry(call)['errors'] += 1
+
+    def stats(self):
+        with self._lock:
+            calls = {call: dict(entry) for call, entry in self._calls.items()}
+
+        by_call = {}
+        for call, entry in calls.items():
+            cached_prompt = entry['cache_read_input_tokens']
+            prompt_tokens = entry['input_tokens'] + cached_prompt + entry['cache_creation_input_tokens']
+            stats = {
+                'calls': entry['calls'],
+                'errors': entry['errors'],
+                **{field: entry[field] for field in USAGE_FIELDS},
+                'cache_read_ratio': cached_prompt / prompt_tokens if prompt_tokens else 0.0,
+                'latency_avg': entry['latency_total'] / entry['calls'] if entry['calls'] else 0.0,
+                'latency_max': entry['latency_max']
+            }
+            if entry['first_token_count']:
+                stats['first_token_latency_avg'] = entry['first_token_total'] / entry['first_token_count']
+            by_call[call] = stats
+
+        return {
+            **{field: sum(stats[field] for stats in by_call.values()) for field in USAGE_FIELDS},
+            'by_call': by_call
+        }
+
+
+_shared_metrics = None
+_shared_metrics_lock = threading.Lock()
+
+
+def get_model_usage_metrics():
+    """Return the process-wide Anthropic usage metrics shared by the sync and async services"""
+    global _shared_metrics
+    with _shared_metrics_lock:
+        if _shared_metrics is None:
+            _shared_metrics = ModelUsageMetrics()
+        return _shared_metrics
@@ -0,0 +1,190 @@
+import logging
+import os
+import threading
+import time
+from collections import Counter
+from datetime import datetime, time as clock_time
+from zoneinfo import ZoneInfo
+
+logger = logging.getLogger(__name__)
+
+MARKET_TIMEZONE = ZoneInfo('America/New_York')
+MARKET_OPEN = clock_time(9, 30)
+MARKET_CLOSE = clock_time(16, 0)
+
+# Response cache function behind each prefetched part of /api/av-stock
+PART_FUNCTIONS = {
+    'quote': 'GLOBAL_QUOTE',
+    'overview': 'OVERVIEW',
+    'news': 'NEWS_SENTIMENT'
+}
+PARTS = ('quote', 'overview', 'news', 'history')
+
+
+def market_is_open(now=None):
+    """Whether US equity markets are in regular trading hours (holidays are not accounted for)"""
+    now = datetime.fromtimestamp(now if now is not None else time.time(), MARKET_TIMEZONE)
+    return now.weekday() < 5 and MARKET_OPEN <= now.time() < MARKET_CLOSE
+
+
+def _parse_watchlist(value):
+    return list(dict.fromkeys(s.strip().upper() for s in (value or '').split(',') if s.strip()))
+
+
+class PrefetchScheduler:
+    """Keeps a watchlist and the most requested symbols warm in the cache.
+
+    A daemon thread refreshes each symbol's quote (during market hours),
+    overview and news shortly before the cached copy expires, and its daily
+    history whenever the price store would next look for new bars. Refreshes
+    only run while the Alpha Vantage bucket holds more than `reserve` tokens
+    and nobody is queued on it, so user requests always come first, and stop
+    for the day after `daily_calls` refreshes. Prefetch is opt-in
+    (PREFETCH_ENABLED=1).
+    """
+
+    TICK_SECONDS = 1.0
+    # Refresh cached parts this far into their TTL
+    REFRESH_AT = 0.8
+    MIN_INTERVAL = 5.0
+    # Request counts halve this often, so popularity follows recent traffic
+    DECAY_SECONDS = 60 * 60
+
+    def __init__(self, av_service, watchlist=None, top_n=None, reserve=None, enabled=None, daily_calls=None,
+                 quote_interval=None):
+        self.av_service = av_service
+        # Quotes expire every 15 seconds; refreshing them that often would spend the whole
+        # default 5 calls/minute budget on one symbol, so they are refreshed far less often
+        self.quote_interval = quote_interval if quote_interval is not None else float(
+            os.getenv('PREFETCH_QUOTE_INTERVAL', 300))
+        self.opted_in = enabled if enabled is not None else os.getenv('PREFETCH_ENABLED', '0') == '1'
+        self.daily_calls = daily_calls if daily_calls is not None else int(os.getenv('PREFETCH_DAILY_CALLS', 200))
+        self.watchlist = watchlist if watchlist is not None else _parse_watchlist(os.getenv('PREFETCH_WATCHLIST'))
+        self.top_n = top_n if top_n is not None else int(os.getenv('PREFETCH_TOP_N', 5))
+        limiter = av_service.limiter
+        self.reserve = reserve if reserve is not None else float(
+            os.getenv('PREFETCH_RESERVE_TOKENS', limiter.capacity / 2))
+        self._lock = threading.Lock()
+        self._requests = Counter()
+        self._due = {}
+        self._counts = Counter()
+        self._decayed_at = time.monotonic()
+        self._thread = None
+        self._day = None
+        self._calls_today = 0
+
+    @property
+    def enabled(self):
+        return self.opted_in and (bool(self.watchlist) or self.top_n > 0)
+
+    def record_request(self, symbol):
+        """Count a user request for symbol towards the top-N most requested"""
+        if self.top_n > 0:
+            with self._lock:
+                self._requests[symbol.upper()] += 1
+
+    def targets(self):
+        """Watchlist symbols followed by the most requested others"""
+        with self._lock:
+            popular = [symbol for symbol, _ in self._requests.most_common(self.top_n + len(self.watchlist))]
+        popular = [symbol for symbol in popular if symbol not in self.watchlist][:self.top_n]
+        return self.watchlist + popular
+
+    def start(self):
+        with self._lock:
+            if not self.enabled or (self._thread is not None and self._thread.is_alive()):
+                return
+            self._thread = threading.Thread(target=self._run, name='prefetch', daemon=True)
+            self._thread.start()
+        logger.info(f"Prefetching watchlist {self.watchlist} and the top {self.top_n} requested symbols, "
+                    f"at most {self.daily_calls} refreshes a day")
+
+    def _run(self):
+        while True:
+            try:
+                self.run_pending()
+                self._decay()
+            except Exception as e:
+                logger.error(f"Error in prefetch scheduler: {str(e)}")
+            time.sleep(self.TICK_SECONDS)
+
+    def _decay(self):
+        now = time.monotonic()
+        if now - self._decayed_at < self.DECAY_SECONDS:
+            return
+        with self._lock:
+            self._requests = Counter({s: c // 2 for s, c in self._requests.items() if c // 2})
+            self._decayed_at = now
+
+    def run_pending(self, now=None):
+        """Refresh every due (part, symbol) that the rate budget allows; returns how many ran"""
+        now = now if now is not None else time.time()
+        market_open = market_is_open(now)
+        pending = [
+            (self._due.get((part, symbol), 0.0), part, symbol)
+            for symbol in self.targets()
+            for part in PARTS
+            if (part != 'quote' or market_open) and self._interval(part) > 0
+        ]
+        # Most overdue first; among new symbols, quotes before the slower-moving parts
+        pending = sorted((entry for entry in pending if entry[0] <= now),
+                         key=lambda entry: (entry[0], PARTS.index(entry[1])))
+
+        limiter = self.av_service.limiter
+        day = time.strftime('%Y-%m-%d', time.gmtime(now))
+        if day != self._day:
+            self._day, self._calls_today = day, 0
+        refreshed = 0
+        for index, (_, part, symbol) in enumerate(pending):
+            if (self._calls_today >= self.daily_calls or limiter.waiting
+                    or limiter.available() < self.reserve + 1):
+                self._count('deferred', len(pending) - index)
+                break
+            self._calls_today += 1
+            try:
+                self._refresh(part, symbol)
+                self._count(part)
+                refreshed += 1
+            except Exception as e:
+                logger.warning(f"Prefetch of {part} for {symbol} failed: {str(e)}")
+                self._count('errors')
+            self._due[(part, symbol)] = now + self._interval(part)
+        return refreshed
+
+    def _refresh(self, part, symbol):
+        av_service = self.av_service
+        if part == 'quote':
+            av_service.get_stock_quote(symbol, refresh=True)
+        elif part == 'overview':
+            av_service.get_company_overview(symbol, refresh=True)
+        elif part == 'news':
+            av_service.get_news_sentiment(tickers=symbol, refresh=True)
+        else:
+            # Only goes upstream once the store's own refresh interval has passed
+            av_service.price_store.update('av', symbol, av_service.fetch_daily_bars)
+
+    def _interval(self, part):
+        """Seconds between refreshes of a part; 0 when it is not cached at all"""
+        if part == 'history':
+            return max(self.MIN_INTERVAL, self.av_service.price_store.refresh_interval)
+        ttl = self.av_service.cache.ttl_for(PART_FUNCTIONS[part])
+        if ttl <= 0:
+            return 0
+        floor = self.quote_interval if part == 'quote' else self.MIN_INTERVAL
+        return max(floor, ttl * self.REFRESH_AT)
+
+    def _count(self, name, amount=1):
+        with self._lock:
+            self._counts[name] += amount
+
+    def stats(self):
+        with self._lock:
+            counts = dict(self._counts)
+        return {
+            'enabled': self.enabled,
+            'targets': self.targets(),
+            'calls_today': self._calls_today,
+            'refreshed': {part: counts.get(part, 0) for part in PARTS},
+            'deferred': counts.get('deferred', 0),
+            'errors': counts.get('errors', 0)
+        }
@@ -0,0 +1,139 @@
+"""Range selection, resampling and downsampling of price history for charts."""
+import numpy as np
+
+# Calendar days covered by each range, counted back from the latest bar
+RANGE_DAYS = {
+    '1d': 1,
+    '5d': 5,
+    '1mo': 31,
+    '3mo': 92,
+    '6mo': 183,
+    '1y': 366,
+    '2y': 731,
+    '5y': 1827,
+    '10y': 3653,
+    'ytd': None,
+    'max': None
+}
+RANGES = tuple(RANGE_DAYS)
+
+# Intraday bars are fetched live for the short ranges; everything else comes from daily bars
+INTRADAY_INTERVALS = ('1m', '5m', '15m', '30m', '60m')
+DAILY_INTERVALS = ('1d', '1wk', '1mo')
+INTRADAY_RANGES = ('1d', '5d')
+DEFAULT_INTERVALS = {'1d': '5m', '5d': '15m'}
+
+MIN_POINTS = 10
+MAX_POINTS = 10000
+
+
+def parse_history_params(range_=None, interval=None, points=None):
+    """Validate range/interval/points query values; returns ((range, interval, points), error message)"""
+    range_ = range_ or '1y'
+    if range_ not in RANGE_DAYS:
+        return None, f"Unknown range {range_}, expected one of {', '.join(RANGES)}"
+
+    interval = interval or DEFAULT_INTERVALS.get(range_, '1d')
+    if interval in INTRADAY_INTERVALS:
+        if range_ not in INTRADAY_RANGES:
+            return None, f"Interval {interval} is only available for the {' and '.join(INTRADAY_RANGES)} ranges"
+    elif interval not in DAILY_INTERVALS:
+        return None, f"Unknown interval {interval}, expected one of {', '.join(INTRADAY_INTERVALS + DAILY_INTERVALS)}"
+
+    if points is not None:
+        try:
+            points = int(points)
+        except (TypeError, ValueError):
+            return None, 'points must be an integer'
+        if not MIN_POINTS <= points <= MAX_POINTS:
+            return None, f'points must be between {MIN_POINTS} and {MAX_POINTS}'
+
+    return (range_, interval, points), None
+
+
+def select_range(dates, values, range_):
+    """Bars within range_ of the latest bar; for intraday ranges, the last N trading days"""
+    if not len(dates) or range_ == 'max':
+        return dates, values
+
+    last = dates[-1]
+    if range_ in INTRADAY_RANGES:
+        days = dates.astype('datetime64[D]')
+        trading_days = np.unique(days)
+        start = trading_days[-min(RANGE_DAYS[range_], len(trading_days))]
+        mask = days >= start
+    elif range_ == 'ytd':
+        mask = dates >= last.astype('datetime64[Y]').astype(dates.dtype)
+    else:
+        mask = dates > last - np.timedelta64(RANGE_DAYS[range_], 'D')
+    return dates[mask], values[mask]
+
+
+def resample(dates, values, interval):
+    """Last bar of each week or month for the 1wk/1mo intervals; daily bars pass through"""
+    if interval not in ('1wk', '1mo') or not len(dates):
+        return dates, values
+
+    if interval == '1wk':
+        # datetime64[W] weeks start on Thursday; shift so they start on Monday
+        periods = (dates.astype('datetime64[D]').astype(np.int64) + 3) // 7
+    else:
+        periods = dates.astype('datetime64[M]').astype(np.int64)
+    last_in_period = np.flatnonzero(np.diff(periods, append=periods[-1] + 1))
+    return dates[last_in_period], values[last_in_period]
+
+
+def lttb(x, y, threshold):
+    """Indices of the points kept by largest-triangle-three-buckets downsampling.
+
+    Keeps the first and last points and, from each of threshold - 2 equal
+    buckets in between, the point forming the largest triangle with the
+    previously kept point and the average of the next bucket. Peaks and
+    troughs survive, so the line looks the same at a fraction of the points.
+    """
+    n = len(x)
+    if threshold >= n or threshold < 3:
+        return np.arange(n)
+
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    edges = (np.arange(threshold - 1) * ((n - 2) / (threshold - 2))).astype(np.int64) + 1
+    edges[-1] = n - 1
+
+    # The average of each following bucket doesn't depend on earlier picks, so compute them all at once
+    next_starts = edges[1:]
+    counts = np.diff(np.append(next_starts, n))
+    average_x = np.add.reduceat(x, next_starts) / counts
+    average_y = np.add.reduceat(y, next_starts) / counts
+
+    indices = np.empty(threshold, dtype=np.int64)
+    indices[0], indices[-1] = 0, n - 1
+    previous = 0
+    for bucket in range(threshold - 2):
+        start, end = edges[bucket], edges[bucket + 1]
+        x_previous, y_previous = x[previous], y[previous]
+        areas = np.abs(
+            (x_previous - average_x[bucket]) * (y[start:end] - y_previous)
+            - (x_previous - x[start:end]) * (average_y[bucket] - y_previous)
+        )
+        previous = start + int(areas.argmax())
+        indices[bucket + 1] = previous
+    return indices
+
+
+def downsample(dates, values, points):
+    """At most `points` bars chosen by LTTB over time; None keeps every bar"""
+    if points is None or len(dates) <= points:
+        return dates, values
+    finite = np.isfinite(values)
+    dates, values = dates[finite], values[finite]
+    keep = lttb(dates.astype(np.int64), values, points)
+    return dates[keep], values[keep]
+
+
+def build_history(dates, values, range_='1y', interval='1d', points=None):
+    """Chart-ready {'dates', 'prices'} arrays for bars already at `interval` resolution or daily"""
+    dates, values = select_range(dates, values, range_)
+    dates, values = resample(dates, values, interval)
+    dates, values = downsample(dates, values, points)
+    return {'dates': dates, 'prices': values}
@@ -0,0 +1,156 @@
+import json
+import logging
+import os
+import threading
+import time
+from collections import defaultdict
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Column order of the ohlcv matrix
+COLUMNS = ('open', 'high', 'low', 'close', 'volume')
+CLOSE = COLUMNS.index('close')
+
+
+def empty_bars():
+    return np.empty(0, dtype='datetime64[D]'), np.empty((0, len(COLUMNS)), dtype=np.float64)
+
+
+def merge_bars(dates, ohlcv, new_dates, new_ohlcv):
+    """Union two bar sets sorted by date; bars in the new set replace same-day old bars"""
+    all_dates = np.concatenate([dates, new_dates])
+    all_ohlcv = np.concatenate([ohlcv, new_ohlcv])
+    # np.unique keeps the first occurrence, so search the reversed arrays to keep the newest
+    _, reversed_index = np.unique(all_dates[::-1], return_index=True)
+    index = len(all_dates) - 1 - reversed_index
+    return all_dates[index], all_ohlcv[index]
+
+
+class PriceHistoryStore:
+    """Daily OHLCV history per symbol, kept on disk as memory-mapped NumPy arrays.
+
+    Each (source, symbol) has a dates.npy (datetime64[D]) and an ohlcv.npy
+    (float64, one row per bar in COLUMNS order). Updates only ask the upstream
+    for bars after the last stored one and merge them in.
+    """
+
+    def __init__(self, root=None, refresh_interval=None):
+        self.root = root or os.getenv('PRICE_STORE_DIR', 'price_store')
+        self.refresh_interval = refresh_interval if refresh_interval is not None else float(
+            os.getenv('PRICE_STORE_REFRESH_SECONDS', 60 * 60))
+        self._locks = defaultdict(threading.Lock)
+        self._locks_lock = threading.Lock()
+        self._checked_at = {}
+
+    def _dir(self, source, symbol):
+        return os.path.join(self.root, source, symbol.upper())
+
+    def _lock(self, source, symbol):
+        with self._locks_lock:
+            return self._locks[(source, symbol.upper())]
+
+    def load(self, source, symbol):
+        """Return (dates, ohlcv) for a symbol, memory-mapped read-only, or empty arrays"""
+        directory = self._dir(source, symbol)
+        try:
+            dates = np.load(os.path.join(directory, 'dates.npy'), mmap_mode='r')
+            ohlcv = np.load(os.path.join(directory, 'ohlcv.npy'), mmap_mode='r')
+        except FileNotFoundError:
+            return empty_bars()
+        return dates, ohlcv
+
+    def symbols(self, source):
+        """Symbols with stored history for a source, sorted"""
+        try:
+            entries = os.listdir(os.path.join(self.root, source))
+        except FileNotFoundError:
+            return []
+        return sorted(entry for entry in entries
+                      if os.path.exists(os.path.join(self.root, source, entry, 'ohlcv.npy')))
+
+    def save(self, source, symbol, dates, ohlcv):
+        directory = self._dir(source, symbol)
+        os.makedirs(directory, exist_ok=True)
+        # Write-then-rename so concurrent readers never map a half-written file
+        for name, array in (('dates', dates), ('ohlcv', ohlcv)):
+            tmp_path = os.path.join(directory, f'{name}.{os.getpid()}.tmp.npy')
+            np.save(tmp_path, np.ascontiguousarray(array))
+            os.replace(tmp_path, os.path.join(directory, f'{name}.npy'))
+        self._write_checked_at(source, symbol, time.time())
+
+    def _read_checked_at(self, source, symbol):
+        key = (source, symbol.upper())
+        if key not in self._checked_at:
+            try:
+                with open(os.path.join(self._dir(source, symbol), 'meta.json')) as f:
+                    self._checked_at[key] = json.load(f)['checked_at']
+            except (FileNotFoundError, ValueError, KeyError):
+                self._checked_at[key] = 0.0
+        return self._checked_at[key]
+
+    def _write_checked_at(self, source, symbol, checked_at):
+        self._checked_at[(source, symbol.upper())] = checked_at
+        directory = self._dir(source, symbol)
+        os.makedirs(directory, exist_ok=True)
+        with open(os.path.join(directory, 'meta.json'), 'w') as f:
+            json.dump({'checked_at': checked_at}, f)
+
+    def update(self, source, symbol, fetcher, force=False):
+        """Bring a symbol up to date and return its (dates, ohlcv).
+
+        fetcher(symbol, since) must return (dates, ohlcv) arrays for bars on or
+        after since (a numpy datetime64[D], or None for a full download), and
+        raise when the upstream fails or throttles it: empty arrays mean "no new
+        bars" and count as a successful check. Symbols checked within
+        refresh_interval are served as stored.
+        """
+        with self._lock(source, symbol):
+            dates, ohlcv = self.load(source, symbol)
+            if not force and len(dates) and time.time() - self._read_checked_at(source, symbol) < self.refresh_interval:
+                return dates, ohlcv
+
+            since = dates[-1] if len(dates) else None
+            new_dates, new_ohlcv = fetcher(symbol, since)
+            if not len(new_dates):
+                if len(dates):
+                    self._write_checked_at(source, symbol, time.time())
+                return dates, ohlcv
+
+            dates, ohlcv = merge_bars(np.asarray(dates), np.asarray(ohlcv), new_dates, new_ohlcv)
+            self.save(source, symbol, dates, ohlcv)
+            logger.info(f"Stored {len(new_dates)} new {source} bars for {symbol}, {len(dates)} total")
+            return self.load(source, symbol)
+
+    def get_bars(self, source, symbol, fetcher):
+        """Updated (dates, ohlcv), or whatever is stored if the update fails"""
+        try:
+            return self.update(source, symbol, fetcher)
+        except Exception as e:
+            logger.error(f"Error updating {source} price history for {symbol}: {str(e)}")
+            return self.load(source, symbol)
+
+    def get_price_history(self, source, symbol, fetcher, days=252):
+        """Return the last `days` closes as {'dates': datetime64[D] array, 'prices': float64 array}"""
+        dates, ohlcv = self.get_bars(source, symbol, fetcher)
+        dates, closes = dates[-days:], ohlcv[-days:, CLOSE]
+        # Plain in-memory arrays (not views of the memmap); json_response encodes
+        # them without building Python lists
+        return {
+            'dates': np.array(dates),
+            'prices': np.array(closes)
+        }
+
+
+_shared_store = None
+_shared_store_lock = threading.Lock()
+
+
+def get_price_store():
+    """Return the process-wide price history store"""
+    global _shared_store
+    with _shared_store_lock:
+        if _shared_store is None:
+            _shared_store = PriceHistoryStore()
+        return _shared_store
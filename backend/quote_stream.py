@@ -0,0 +1,209 @@
+import asyncio
+import itertools
+import json
+import logging
+import os
+import queue
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+
+def format_sse(event):
+    """Encode an event dict as a Server-Sent Events message"""
+    return f"event: {event['type']}\ndata: {json.dumps(event)}\n\n"
+
+
+def quote_delta(previous, current):
+    """Fields of current that differ from previous (all of them if there is no previous)"""
+    if not previous:
+        return dict(current)
+    return {key: value for key, value in current.items() if previous.get(key) != value}
+
+
+class _OverflowBuffer:
+    """Holds quote events that didn't fit a subscriber's queue until it has room again.
+
+    Events only carry the fields that changed, so dropping one would leave the
+    client with stale fields for good. Instead the deltas for a symbol are
+    merged while the queue is full and sent as one event once it drains; later
+    deltas for that symbol are merged too, so fields never arrive out of order.
+    """
+
+    def __init__(self):
+        self._overflow = {}
+
+    def _offer(self, event):
+        symbol = event['symbol']
+        if symbol in self._overflow:
+            self._overflow[symbol]['quote'].update(event['quote'])
+        elif not self._put_nowait(event):
+            self._overflow[symbol] = {**event, 'quote': dict(event['quote'])}
+
+    def _flush(self):
+        while self._overflow:
+            symbol = next(iter(self._overflow))
+            if not self._put_nowait(self._overflow[symbol]):
+                return
+            del self._overflow[symbol]
+
+
+class QueueSubscriber(_OverflowBuffer):
+    """Delivers events to a thread-safe queue, for WSGI streaming generators"""
+
+    def __init__(self, maxsize=100):
+        super().__init__()
+        self.queue = queue.Queue(maxsize=maxsize)
+        self._lock = threading.Lock()
+
+    def _put_nowait(self, event):
+        try:
+            self.queue.put_nowait(event)
+            return True
+        except queue.Full:
+            return False
+
+    def __call__(self, event):
+        with self._lock:
+            self._offer(event)
+
+    def get(self, timeout):
+        try:
+            event = self.queue.get(timeout=timeout)
+        except queue.Empty:
+            return None
+        with self._lock:
+            self._flush()
+        return event
+
+
+class AsyncQueueSubscriber(_OverflowBuffer):
+    """Delivers events to an asyncio.Queue owned by an event loop, for ASGI handlers"""
+
+    def __init__(self, loop=None, maxsize=100):
+        super().__init__()
+        self.loop = loop or asyncio.get_running_loop()
+        self.queue = asyncio.Queue(maxsize=maxsize)
+
+    def _put_nowait(self, event):
+        try:
+            self.queue.put_nowait(event)
+            return True
+        except asyncio.QueueFull:
+            return False
+
+    def __call__(self, event):
+        # Queue and overflow are only touched on the loop's thread
+        self.loop.call_soon_threadsafe(self._offer, event)
+
+    async def get(self, timeout):
+        try:
+            event = await asyncio.wait_for(self.queue.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+        self._flush()
+        return event
+
+
+class QuoteStreamHub:
+    """Polls each subscribed symbol once per interval and fans quote deltas out.
+
+    However many clients watch a symbol, the upstream sees one quote lookup
+    per interval for it. `fetch_quotes(symbols)` returns {symbol: quote or
+    None}. Subscribers are plain callables, so the same hub can feed
+    thread-based and asyncio-based connections.
+    """
+
+    def __init__(self, fetch_quotes, interval=None):
+        self.fetch_quotes = fetch_quotes
+        self.interval = interval if interval is not None else float(os.getenv('QUOTE_STREAM_INTERVAL', 15))
+        self._lock = threading.Lock()
+        self._subscribers = {}
+        self._by_symbol = {}
+        self._last_quotes = {}
+        self._ids = itertools.count(1)
+        self._wakeup = threading.Event()
+        self._thread = None
+
+    def subscribe(self, symbols, sink):
+        """Register sink for quote events on symbols and return a subscription id"""
+        symbols = [symbol.upper() for symbol in symbols]
+        with self._lock:
+            subscription_id = next(self._ids)
+            self._subscribers[subscription_id] = (symbols, sink)
+            new_symbols = False
+            for symbol in symbols:
+                new_symbols |= symbol not in self._by_symbol
+                self._by_symbol.setdefault(symbol, set()).add(subscription_id)
+            snapshots = [self._last_quotes[symbol] for symbol in symbols if symbol in self._last_quotes]
+
+        # Send what we already know straight away instead of waiting for the next poll
+        for quote in snapshots:
+            sink({'type': 'quote', 'symbol': quote['symbol'], 'quote': quote})
+
+        self._ensure_running()
+        if new_symbols:
+            self._wakeup.set()
+        return subscription_id
+
+    def unsubscribe(self, subscription_id):
+        with self._lock:
+            symbols, _ = self._subscribers.pop(subscription_id, ([], None))
+            for symbol in symbols:
+                watchers = self._by_symbol.get(symbol)
+                if watchers is not None:
+                    watchers.discard(subscription_id)
+                    if not watchers:
+                        del self._by_symbol[symbol]
+                        self._last_quotes.pop(symbol, None)
+
+    def subscriber_count(self):
+        with self._lock:
+            return len(self._subscribers)
+
+    def symbols(self):
+        with self._lock:
+            return list(self._by_symbol)
+
+    def _ensure_running(self):
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name='quote-stream', daemon=True)
+                self._thread.start()
+
+    def _run(self):
+        while True:
+            started = time.monotonic()
+            try:
+                self.poll_once()
+            except Exception as e:
+                logger.error(f"Error polling streamed quotes: {str(e)}")
+            self._wakeup.wait(max(0.0, self.interval - (time.monotonic() - started)))
+            self._wakeup.clear()
+
+    def poll_once(self):
+        """Fetch every watched symbol once and publish what changed"""
+        symbols = self.symbols()
+        if not symbols:
+            return
+
+        quotes = self.fetch_quotes(symbols)
+        for symbol, quote in quotes.items():
+            if not quote:
+                continue
+            with self._lock:
+                if symbol not in self._by_symbol:
+                    continue
+                changes = quote_delta(self._last_quotes.get(symbol), quote)
+                self._last_quotes[symbol] = quote
+                sinks = [self._subscribers[sid][1] for sid in self._by_symbol[symbol]]
+            if not changes:
+                continue
+
+            event = {'type': 'quote', 'symbol': symbol, 'quote': changes}
+            for sink in sinks:
+                try:
+                    sink(event)
+                except Exception as e:
+                    logger.warning(f"Dropping quote event for {symbol}: {str(e)}")
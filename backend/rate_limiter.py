@@ -0,0 +1,233 @@
+import asyncio
+import json
+import logging
+import os
+import random
+import threading
+import time
+from contextlib import contextmanager
+from functools import wraps
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+# Requests per minute and burst size for each upstream, sized to the default plans
+DEFAULT_LIMITS = {
+    'alpha_vantage': (5, 5),
+    'yahoo': (60, 10),
+    'anthropic': (50, 10)
+}
+
+
+class RateLimitExceeded(Exception):
+    """Raised when a caller would have to wait longer than allowed for a token"""
+
+
+def jittered_backoff(attempt, base_delay=1.0, max_delay=60.0):
+    """Full-jitter exponential backoff delay for the given retry attempt"""
+    return random.uniform(0, min(max_delay, base_delay * (2 ** attempt)))
+
+
+class TokenBucket:
+    """Thread-safe token bucket shared by every caller of one upstream.
+
+    Callers only wait when the bucket is empty. reserve() hands out tokens in
+    arrival order by letting the balance go negative, so the returned delay is
+    the caller's place in the queue rather than a polling interval.
+    """
+
+    def __init__(self, name, rate_per_minute, capacity=None):
+        self.name = name
+        self.rate = rate_per_minute / 60.0
+        self.capacity = capacity if capacity is not None else max(1, rate_per_minute)
+        self._lock = threading.Lock()
+        self._state = {
+            'tokens': float(self.capacity),
+            'updated_at': time.time(),
+            'blocked_until': 0.0
+        }
+        self._waiting = 0
+        self._waiting_lock = threading.Lock()
+
+    @contextmanager
+    def _locked_state(self):
+        with self._lock:
+            yield self._state
+
+    def _refill(self, state, now):
+        elapsed = max(0.0, now - state['updated_at'])
+        state['tokens'] = min(self.capacity, state['tokens'] + elapsed * self.rate)
+        state['updated_at'] = now
+
+    def reserve(self, tokens=1):
+        """Take tokens now and return how many seconds the caller must wait to use them"""
+        with self._locked_state() as state:
+            now = time.time()
+            self._refill(state, now)
+            state['tokens'] -= tokens
+            wait = -state['tokens'] / self.rate if state['tokens'] < 0 else 0.0
+            return max(wait, state['blocked_until'] - now)
+
+    def refund(self, tokens=1):
+        with self._locked_state() as state:
+            state['tokens'] = min(self.capacity, state['tokens'] + tokens)
+
+    def try_acquire(self, tokens=1):
+        """Take tokens only if they are available right now"""
+        with self._locked_state() as state:
+            now = time.time()
+            self._refill(state, now)
+            if state['blocked_until'] > now or state['tokens'] < tokens:
+                return False
+            state['tokens'] -= tokens
+            return True
+
+    def acquire(self, tokens=1, timeout=None):
+        """Block until tokens are available, raising RateLimitExceeded past timeout"""
+        wait = self.reserve(tokens)
+        if wait <= 0:
+            return
+        if timeout is not None and wait > timeout:
+            self.refund(tokens)
+            raise RateLimitExceeded(f"{self.name} rate limit: would wait {wait:.1f}s")
+
+        logger.info(f"{self.name} rate budget exhausted, queued for {wait:.2f}s")
+        with self.track_waiting():
+            time.sleep(wait)
+
+    async def acquire_async(self, tokens=1, timeout=None):
+        """acquire() for coroutines: queues on the event loop instead of blocking a thread"""
+        wait = self.reserve(tokens)
+        if wait <= 0:
+            return
+        if timeout is not None and wait > timeout:
+            self.refund(tokens)
+            raise RateLimitExceeded(f"{self.name} rate limit: would wait {wait:.1f}s")
+
+        logger.info(f"{self.name} rate budget exhausted, queued for {wait:.2f}s")
+        with self.track_waiting():
+            await asyncio.sleep(wait)
+
+    @contextmanager
+    def track_waiting(self):
+        """Count the caller as queued for the duration of the block"""
+        with self._waiting_lock:
+            self._waiting += 1
+        try:
+            yield
+        finally:
+            with self._waiting_lock:
+                self._waiting -= 1
+
+    def backoff(self, delay):
+        """Pause every caller of this upstream, e.g. after it answered with a 429"""
+        with self._locked_state() as state:
+            state['blocked_until'] = max(state['blocked_until'], time.time() + delay)
+        logger.warning(f"{self.name} backing off for {delay:.2f}s")
+
+    @property
+    def waiting(self):
+        """Number of callers currently queued for a token in this process"""
+        return self._waiting
+
+    def available(self):
+        with self._locked_state() as state:
+            self._refill(state, time.time())
+            return state['tokens']
+
+
+class FileTokenBucket(TokenBucket):
+    """Token bucket whose state lives in a file so several worker processes share one budget"""
+
+    def __init__(self, name, rate_per_minute, capacity=None, directory=None):
+        if fcntl is None:
+            raise RuntimeError('FileTokenBucket requires fcntl (POSIX only)')
+        super().__init__(name, rate_per_minute, capacity)
+        directory = directory or os.getenv('RATE_LIMIT_DIR', '/tmp/tradebot-ratelimits')
+        os.makedirs(directory, exist_ok=True)
+        self.path = os.path.join(directory, f'{name}.json')
+        self.lock_path = self.path + '.lock'
+
+    @contextmanager
+    def _locked_state(self):
+        with self._lock, open(self.lock_path, 'a') as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                try:
+                    with open(self.path) as f:
+                        state = json.load(f)
+                except (FileNotFoundError, ValueError):
+                    state = dict(self._state)
+                yield state
+                tmp_path = f'{self.path}.{os.getpid()}.tmp'
+                with open(tmp_path, 'w') as f:
+                    json.dump(state, f)
+                os.replace(tmp_path, self.path)
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+def create_rate_limiter(name):
+    """Build the limiter for an upstream from RATE_LIMIT_* environment variables"""
+    default_rate, default_burst = DEFAULT_LIMITS.get(name, (60, 10))
+    prefix = f'RATE_LIMIT_{name.upper()}'
+    rate = float(os.getenv(f'{prefix}_PER_MINUTE', default_rate))
+    burst = float(os.getenv(f'{prefix}_BURST', default_burst))
+
+    if os.getenv('RATE_LIMIT_BACKEND', 'memory').lower() == 'file':
+        return FileTokenBucket(name, rate, burst)
+    return TokenBucket(name, rate, burst)
+
+
+_limiters = {}
+_limiters_lock = threading.Lock()
+
+
+def get_rate_limiter(name):
+    """Return the process-wide limiter for an upstream ('alpha_vantage', 'yahoo', 'anthropic')"""
+    with _limiters_lock:
+        if name not in _limiters:
+            _limiters[name] = create_rate_limiter(name)
+        return _limiters[name]
+
+
+def get_rate_limiters():
+    with _limiters_lock:
+        return dict(_limiters)
+
+
+def max_wait():
+    """Longest a request will queue for a token before giving up"""
+    return float(os.getenv('RATE_LIMIT_MAX_WAIT', 30))
+
+
+def is_rate_limit_error(error):
+    return '429' in str(error) or 'Too Many Requests' in str(error)
+
+
+def retry_on_rate_limit(limiter_name, retries=3, base_delay=1.0):
+    """Retry a call that hit an upstream 429, pacing attempts through the shared limiter.
+
+    Instead of sleeping the worker for a fixed delay, each 429 pushes a jittered
+    backoff into the upstream's limiter so every caller slows down together. The
+    wrapped call acquires its own tokens, so the retry waits on the limiter there
+    and spends one token per attempt.
+    """
+    def decorator(func):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            limiter = get_rate_limiter(limiter_name)
+            for attempt in range(retries):
+                try:
+                    return func(*args, **kwargs)
+                except Exception as e:
+                    if not is_rate_limit_error(e) or attempt == retries - 1:
+                        raise
+                    logger.warning(f"{limiter_name} rate limited, retry {attempt + 1} of {retries - 1}")
+                    limiter.backoff(jittered_backoff(attempt, base_delay))
+        return wrapper
+    return decorator
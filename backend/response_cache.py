@@ -0,0 +1,222 @@
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+logger = logging.getLogger(__name__)
+
+
+class MemoryCacheBackend:
+    """Size-bounded in-process LRU store"""
+
+    def __init__(self, max_entries=1000):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        """Return (expires_at, value) for key and mark it most recently used"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+            return entry
+
+    def set(self, key, expires_at, value):
+        with self._lock:
+            self._entries[key] = (expires_at, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class SqliteCacheBackend:
+    """Size-bounded LRU store persisted to a sqlite file so it survives restarts"""
+
+    def __init__(self, path, max_entries=10000):
+        self.path = path
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute(
+            'CREATE TABLE IF NOT EXISTS response_cache ('
+            'key TEXT PRIMARY KEY, expires_at REAL, accessed_at REAL, value TEXT)'
+        )
+        self._conn.execute(
+            'CREATE INDEX IF NOT EXISTS response_cache_accessed ON response_cache (accessed_at)'
+        )
+        self._conn.commit()
+
+    def get(self, key):
+        with self._lock:
+            row = self._conn.execute(
+                'SELECT expires_at, value FROM response_cache WHERE key = ?', (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            self._conn.execute(
+                'UPDATE response_cache SET accessed_at = ? WHERE key = ?', (time.time(), key)
+            )
+            self._conn.commit()
+        return row[0], json.loads(row[1])
+
+    def set(self, key, expires_at, value):
+        with self._lock:
+            self._conn.execute(
+                'INSERT OR REPLACE INTO response_cache (key, expires_at, accessed_at, value) '
+                'VALUES (?, ?, ?, ?)',
+                (key, expires_at, time.time(), json.dumps(value))
+            )
+            self._conn.execute(
+                'DELETE FROM response_cache WHERE key IN ('
+                'SELECT key FROM response_cache ORDER BY accessed_at DESC LIMIT -1 OFFSET ?)',
+                (self.max_entries,)
+            )
+            self._conn.commit()
+
+    def delete(self, key):
+        with self._lock:
+            self._conn.execute('DELETE FROM response_cache WHERE key = ?', (key,))
+            self._conn.commit()
+
+    def clear(self):
+        with self._lock:
+            self._conn.execute('DELETE FROM response_cache')
+            self._conn.commit()
+
+    def __len__(self):
+        with self._lock:
+            return self._conn.execute('SELECT COUNT(*) FROM response_cache').fetchone()[0]
+
+
+class ResponseCache:
+    """TTL cache for upstream API responses keyed on (function, symbol, params)"""
+
+    # Freshness per Alpha Vantage function, in seconds
+    DEFAULT_TTLS = {
+        'GLOBAL_QUOTE': 15,
+        # Daily bars are kept in price_store, which refreshes them incrementally
+        'TIME_SERIES_DAILY': 0,
+        'TIME_SERIES_INTRADAY': 60,
+        'OVERVIEW': 24 * 60 * 60,
+        'NEWS_SENTIMENT': 5 * 60,
+        'SYMBOL_SEARCH': 24 * 60 * 60
+    }
+
+    def __init__(self, backend=None, ttls=None, default_ttl=60):
+        self.backend = backend if backend is not None else MemoryCacheBackend()
+        self.ttls = {**self.DEFAULT_TTLS, **(ttls or {})}
+        self.default_ttl = default_ttl
+        self._lock = threading.Lock()
+        self._hits = {}
+        self._misses = {}
+
+    @staticmethod
+    def make_key(function, symbol, params=None):
+        return json.dumps([function, symbol, sorted((params or {}).items())], default=str)
+
+    def ttl_for(self, function):
+        return self.ttls.get(function, self.default_ttl)
+
+    def get(self, function, symbol, params=None, record_stats=True):
+        """Return the cached value, or None if missing or expired"""
+        key = self.make_key(function, symbol, params)
+        entry = self.backend.get(key)
+        if entry is not None and entry[0] <= time.time():
+            self.backend.delete(key)
+            entry = None
+
+        if not record_stats:
+            return entry[1] if entry is not None else None
+
+        with self._lock:
+            counter = self._hits if entry is not None else self._misses
+            counter[function] = counter.get(function, 0) + 1
+
+        return entry[1] if entry is not None else None
+
+    def set(self, function, symbol, params, value):
+        ttl = self.ttl_for(function)
+        if ttl <= 0:
+            return
+        key = self.make_key(function, symbol, params)
+        self.backend.set(key, time.time() + ttl, value)
+
+    def clear(self):
+        self.backend.clear()
+
+    def stats(self):
+        """Hit/miss counters overall and per function"""
+        with self._lock:
+            hits = dict(self._hits)
+            misses = dict(self._misses)
+
+        by_function = {}
+        for function in set(hits) | set(misses):
+            function_hits = hits.get(function, 0)
+            function_misses = misses.get(function, 0)
+            by_function[function] = {
+                'hits': function_hits,
+                'misses': function_misses,
+                'hit_ratio': function_hits / (function_hits + function_misses)
+            }
+
+        total_hits = sum(hits.values())
+        total_misses = sum(misses.values())
+        lookups = total_hits + total_misses
+        return {
+            'hits': total_hits,
+            'misses': total_misses,
+            'hit_ratio': total_hits / lookups if lookups else 0.0,
+            'entries': len(self.backend),
+            'by_function': by_function
+        }
+
+
+def create_response_cache_from_env():
+    """Build a ResponseCache configured from AV_CACHE_* environment variables"""
+    max_entries = int(os.getenv('AV_CACHE_MAX_ENTRIES', 1000))
+    backend_name = os.getenv('AV_CACHE_BACKEND', 'memory').lower()
+
+    if backend_name == 'sqlite':
+        path = os.getenv('AV_CACHE_PATH', 'av_cache.sqlite3')
+        backend = SqliteCacheBackend(path, max_entries=max_entries)
+        logger.info(f"Using sqlite response cache at {path}")
+    else:
+        backend = MemoryCacheBackend(max_entries=max_entries)
+
+    # e.g. AV_CACHE_TTL_GLOBAL_QUOTE=30 overrides the quote freshness
+    ttls = {}
+    for name, value in os.environ.items():
+        if name.startswith('AV_CACHE_TTL_'):
+            ttls[name[len('AV_CACHE_TTL_'):]] = float(value)
+
+    return ResponseCache(backend=backend, ttls=ttls)
+
+
+_shared_cache = None
+_shared_cache_lock = threading.Lock()
+
+
+def get_response_cache():
+    """Return the process-wide response cache shared by all service instances"""
+    global _shared_cache
+    with _shared_cache_lock:
+        if _shared_cache is None:
+            _shared_cache = create_response_cache_from_env()
+        return _shared_cache
@@ -0,0 +1,536 @@
+"""Stock screener over a columnar snapshot of quotes and company fundamentals.
+
+An opt-in background thread walks the universe and keeps each symbol's quote and
+OVERVIEW fields in a row table, spending Alpha Vantage tokens only while
+the bucket has spare capacity. Every so often the rows are rebuilt into an
+immutable snapshot of NumPy columns, which screens are answered from with
+vectorized masks and one argsort, so a query over thousands of symbols
+takes milliseconds and no upstream calls. The snapshot is saved to disk so a
+restart serves screens straight away.
+"""
+import logging
+import os
+import re
+import threading
+import time
+
+import numpy as np
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+from symbol_directory import DEFAULT_LISTING_PATH, read_listing_rows
+
+logger = logging.getLogger(__name__)
+
+TEXT_FIELDS = ('symbol', 'name', 'sector', 'industry')
+NUMERIC_FIELDS = (
+    'price', 'change_percent', 'volume', 'market_cap', 'pe_ratio', 'dividend_yield',
+    'fifty_two_week_high', 'fifty_two_week_low',
+    # Derived: fraction above the 52-week low and below the 52-week high
+    'from_52w_low', 'from_52w_high'
+)
+TIME_FIELDS = ('quote_at', 'overview_at')
+FIELDS = TEXT_FIELDS + NUMERIC_FIELDS + TIME_FIELDS
+
+# Text filters match a case-insensitive substring of these columns
+CATEGORY_FIELDS = ('sector', 'industry')
+
+DEFAULT_SORT = 'market_cap'
+MAX_LIMIT = 500
+
+# "Near" a 52-week extreme in natural language screens: within this fraction of it
+NEAR_52_WEEK = 0.1
+
+
+class ScreenError(ValueError):
+    """A screen with unknown fields or malformed values"""
+
+
+def _percent(value):
+    """'1.2345%' from GLOBAL_QUOTE as 1.2345"""
+    try:
+        return float(str(value).rstrip('%'))
+    except (TypeError, ValueError):
+        return np.nan
+
+
+def _number(value):
+    return float(value) if isinstance(value, (int, float)) else np.nan
+
+
+def quote_fields(quote):
+    return {
+        'price': _number(quote.get('current_price')),
+        'change_percent': _percent(quote.get('change_percent')),
+        'volume': _number(quote.get('volume'))
+    }
+
+
+def overview_fields(overview):
+    return {
+        'name': overview.get('company_name') or '',
+        'sector': overview.get('sector') or '',
+        'industry': overview.get('industry') or '',
+        'market_cap': _number(overview.get('market_cap')),
+        'pe_ratio': _number(overview.get('pe_ratio')),
+        'dividend_yield': _number(overview.get('dividend_yield')),
+        'fifty_two_week_high': _number(overview.get('fifty_two_week_high')),
+        'fifty_two_week_low': _number(overview.get('fifty_two_week_low'))
+    }
+
+
+def parse_filters(params):
+    """Validate screen filters: `sector`/`industry` substrings and `<field>_min`/`<field>_max` bounds.
+
+    Returns (text filters, [(field, lower, upper)]); raises ScreenError.
+    """
+    text = {}
+    bounds = {}
+    for key, value in params.items():
+        if value is None or value == '':
+            continue
+        if key in CATEGORY_FIELDS:
+            text[key] = [part.strip().lower() for part in str(value).split(',') if part.strip()]
+            continue
+        field, _, side = key.rpartition('_')
+        if field not in NUMERIC_FIELDS or side not in ('min', 'max'):
+            raise ScreenError(f"Unknown filter {key}")
+        try:
+            number = float(value)
+        except (TypeError, ValueError):
+            raise ScreenError(f"Filter {key} must be a number")
+        lower, upper = bounds.get(field, (None, None))
+        bounds[field] = (number, upper) if side == 'min' else (lower, number)
+    return text, [(field, lower, upper) for field, (lower, upper) in bounds.items()]
+
+
+class ScreenerSnapshot:
+    """Immutable column arrays for the screened universe; swapped whole on rebuild"""
+
+    def __init__(self, columns, built_at=None):
+        self.columns = columns
+        self.built_at = built_at if built_at is not None else time.time()
+        # Distinct lower-cased values and each row's index into them, so text
+        # filters test each sector or industry once instead of once per row
+        self.categories = {
+            field: np.unique(np.char.lower(columns[field]), return_inverse=True) for field in CATEGORY_FIELDS
+        }
+
+    @classmethod
+    def from_rows(cls, rows):
+        rows = sorted(rows.values(), key=lambda row: row['symbol'])
+        columns = {field: np.array([row.get(field, '') for row in rows], dtype=str) for field in TEXT_FIELDS}
+        for field in NUMERIC_FIELDS + TIME_FIELDS:
+            columns[field] = np.array([row.get(field, np.nan) for row in rows], dtype=np.float64)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            columns['from_52w_low'] = columns['price'] / columns['fifty_two_week_low'] - 1
+            columns['from_52w_high'] = 1 - columns['price'] / columns['fifty_two_week_high']
+        return cls(columns)
+
+    def __len__(self):
+        return len(self.columns['symbol'])
+
+    def rows(self):
+        """Row dicts keyed by symbol, the form the refresher updates"""
+        return {
+            symbol: {field: self.columns[field][index].item() for field in FIELDS}
+            for index, symbol in enumerate(self.columns['symbol'].tolist())
+        }
+
+    def screen(self, text_filters, bounds, sort=DEFAULT_SORT, descending=True, limit=50):
+        """(matching row count, the first `limit` matching rows in sort order)"""
+        columns = self.columns
+        mask = np.ones(len(self), dtype=bool)
+        for field, needles in text_filters.items():
+            values, codes = self.categories[field]
+            matching = [code for code, value in enumerate(values.tolist()) if any(n in value for n in needles)]
+            mask &= np.isin(codes, matching)
+        with np.errstate(invalid='ignore'):
+            # NaN fails every comparison, so rows missing a filtered field drop out
+            for field, lower, upper in bounds:
+                if lower is not None:
+                    mask &= columns[field] >= lower
+                if upper is not None:
+                    mask &= columns[field] <= upper
+
+        index = np.flatnonzero(mask)
+        keys = columns[sort][index]
+        # argsort puts NaN last either way round
+        order = np.argsort(-keys if descending else keys, kind='stable')[:limit]
+        return len(index), [self._row(i) for i in index[order]]
+
+    def _row(self, index):
+        row = {}
+        for field in FIELDS:
+            value = self.columns[field][index].item()
+            row[field] = None if isinstance(value, float) and np.isnan(value) else value
+        return row
+
+
+class Screener:
+    """Keeps the screener snapshot for a symbol universe fresh in the background.
+
+    Quotes are refreshed every `quote_interval` seconds and overviews every
+    `overview_interval`, stalest first, through the service's cache and rate
+    limiter. Refreshes only run while the bucket holds more than `reserve`
+    tokens and nobody is queued on it, so user requests come first, and stop
+    for the day after `daily_calls` lookups. The refresh is opt-in
+    (SCREENER_REFRESH=1) and only one process per snapshot path runs it;
+    the others just serve screens from the saved snapshot.
+    """
+
+    TICK_SECONDS = 1.0
+    # Rebuild (and save) the snapshot at most this often while rows change
+    REBUILD_SECONDS = 10.0
+    # Wait before retrying a symbol whose lookup failed
+    RETRY_SECONDS = 15 * 60
+    PARTS = ('quote', 'overview')
+
+    def __init__(self, path=None, universe=None, quote_interval=None, overview_interval=None, reserve=None,
+                 enabled=None, daily_calls=None):
+        self.path = path or os.getenv('SCREENER_SNAPSHOT_PATH', 'screener_snapshot.npz')
+        self.universe = universe if universe is not None else self._load_universe(
+            os.getenv('SCREENER_UNIVERSE_PATH', DEFAULT_LISTING_PATH))
+        self.quote_interval = quote_interval if quote_interval is not None else float(
+            os.getenv('SCREENER_QUOTE_INTERVAL', 15 * 60))
+        self.overview_interval = overview_interval if overview_interval is not None else float(
+            os.getenv('SCREENER_OVERVIEW_INTERVAL', 24 * 60 * 60))
+        self.reserve = reserve if reserve is not None else os.getenv('SCREENER_RESERVE_TOKENS')
+        self.enabled = enabled if enabled is not None else os.getenv('SCREENER_REFRESH', '0') == '1'
+        self.daily_calls = daily_calls if daily_calls is not None else int(os.getenv('SCREENER_DAILY_CALLS', 1000))
+        self._lock = threading.Lock()
+        self._rows = {}
+        self._due = {}
+        self._dirty = False
+        self._rebuilt_at = 0.0
+        self._thread = None
+        self._refresh_lock_file = None
+        self._day = None
+        self._calls_today = 0
+        self._counts = {'quote': 0, 'overview': 0, 'deferred': 0, 'errors': 0}
+        self.snapshot = ScreenerSnapshot.from_rows({})
+        self.load()
+
+    @staticmethod
+    def _load_universe(path):
+        """Stock symbols from a LISTING_STATUS style CSV"""
+        try:
+            with open(path, newline='') as f:
+                return [symbol for symbol, _, _, asset_type in read_listing_rows(f) if asset_type == 'Stock']
+        except OSError as e:
+            logger.error(f"Could not load screener universe {path}: {str(e)}")
+            return []
+
+    def load(self):
+        """Serve the snapshot saved by an earlier process until the refresher catches up"""
+        try:
+            with np.load(self.path) as data:
+                columns = {field: data[field] for field in FIELDS}
+                built_at = float(data['built_at'])
+        except (OSError, KeyError, ValueError):
+            return 0
+        self.snapshot = ScreenerSnapshot(columns, built_at)
+        with self._lock:
+            self._rows = self.snapshot.rows()
+        logger.info(f"Loaded screener snapshot of {len(self.snapshot)} symbols from {self.path}")
+        return len(self.snapshot)
+
+    def save(self, snapshot):
+        # Write-then-rename so a crash never leaves a truncated snapshot
+        temp_path = f"{self.path}.{os.getpid()}.tmp"
+        with open(temp_path, 'wb') as f:
+            np.savez(f, built_at=snapshot.built_at, **snapshot.columns)
+        os.replace(temp_path, self.path)
+
+    def update(self, symbol, quote=None, overview=None, now=None):
+        """Fold a parsed GLOBAL_QUOTE and/or OVERVIEW result into the symbol's row"""
+        if not quote and not overview:
+            return
+        now = now if now is not None else time.time()
+        with self._lock:
+            row = self._rows.setdefault(symbol, {'symbol': symbol})
+            if quote:
+                row.update(quote_fields(quote), quote_at=now)
+            if overview:
+                row.update(overview_fields(overview), overview_at=now)
+            self._dirty = True
+
+    def rebuild(self, now=None):
+        """Swap in a snapshot of the current rows and save it"""
+        with self._lock:
+            snapshot = ScreenerSnapshot.from_rows(self._rows)
+            self._dirty = False
+            self._rebuilt_at = now if now is not None else time.time()
+        self.snapshot = snapshot
+        try:
+            self.save(snapshot)
+        except OSError as e:
+            logger.error(f"Could not save screener snapshot to {self.path}: {str(e)}")
+        return snapshot
+
+    def screen(self, filters=None, sort=DEFAULT_SORT, order='desc', limit=50):
+        """Rows matching `filters` (see parse_filters), sorted by a numeric field"""
+        if sort not in NUMERIC_FIELDS:
+            raise ScreenError(f"Cannot sort by {sort}, expected one of {', '.join(NUMERIC_FIELDS)}")
+        if order not in ('asc', 'desc'):
+            raise ScreenError("order must be asc or desc")
+        text_filters, bounds = parse_filters(filters or {})
+        snapshot = self.snapshot
+        count, results = snapshot.screen(text_filters, bounds, sort, order == 'desc', max(0, min(limit, MAX_LIMIT)))
+        return {
+            'filters': {key: value for key, value in (filters or {}).items() if value not in (None, '')},
+            'sort': sort,
+            'order': order,
+            'count': count,
+            'total': len(snapshot),
+            'as_of': snapshot.built_at,
+            'results': results
+        }
+
+    def _claim_refresh(self):
+        """Take the snapshot's refresh lock so one process (of several workers) refreshes and saves it"""
+        if fcntl is None:
+            return True
+        lock_file = open(f"{self.path}.lock", 'a')
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            lock_file.close()
+            return False
+        # Held until the process exits
+        self._refresh_lock_file = lock_file
+        return True
+
+    def start_refresh(self, av_service):
+        with self._lock:
+            if not self.enabled or not self.universe or (self._thread is not None and self._thread.is_alive()):
+                return
+            if self._refresh_lock_file is None and not self._claim_refresh():
+                logger.info(f"Another process is refreshing {self.path}; serving the saved snapshot")
+                return
+            self._thread = threading.Thread(target=self._run, args=(av_service,), name='screener', daemon=True)
+            self._thread.start()
+        logger.info(f"Refreshing the screener snapshot for {len(self.universe)} symbols, "
+                    f"at most {self.daily_calls} lookups a day")
+
+    def _run(self, av_service):
+        while True:
+            try:
+                self.run_pending(av_service)
+            except Exception as e:
+                logger.error(f"Error in screener refresh: {str(e)}")
+            time.sleep(self.TICK_SECONDS)
+
+    def _interval(self, part):
+        return self.quote_interval if part == 'quote' else self.overview_interval
+
+    def _next_due(self, part, symbol):
+        due = self._due.get((part, symbol))
+        if due is None:
+            row = self._rows.get(symbol) or {}
+            refreshed_at = row.get(f'{part}_at')
+            due = refreshed_at + self._interval(part) if refreshed_at and not np.isnan(refreshed_at) else 0.0
+        return due
+
+    def run_pending(self, av_service, now=None):
+        """Refresh every due (part, symbol) the rate budget allows, then rebuild if due; returns how many ran"""
+        now = now if now is not None else time.time()
+        with self._lock:
+            pending = sorted(
+                (due, self.PARTS.index(part), part, symbol)
+                for symbol in self.universe
+                for part in self.PARTS
+                for due in (self._next_due(part, symbol),)
+                if due <= now
+            )
+
+        limiter = av_service.limiter
+        reserve = float(self.reserve) if self.reserve is not None else limiter.capacity / 2
+        day = time.strftime('%Y-%m-%d', time.gmtime(now))
+        if day != self._day:
+            self._day, self._calls_today = day, 0
+        refreshed = 0
+        for index, (_, _, part, symbol) in enumerate(pending):
+            if (self._calls_today >= self.daily_calls or limiter.waiting
+                    or limiter.available() < reserve + 1):
+                self._count('deferred', len(pending) - index)
+                break
+            # Counted whether or not the cache answers, so the budget is an upper bound on upstream calls
+            self._calls_today += 1
+            # Cache-first: a symbol a user just looked up costs no upstream call
+            if part == 'quote':
+                result = av_service.get_stock_quote(symbol)
+                self.update(symbol, quote=result, now=now)
+            else:
+                result = av_service.get_company_overview(symbol)
+                self.update(symbol, overview=result, now=now)
+            with self._lock:
+                self._due[(part, symbol)] = now + (self._interval(part) if result else self.RETRY_SECONDS)
+            self._count(part if result else 'errors')
+            refreshed += 1
+
+        if self._dirty and (now - self._rebuilt_at >= self.REBUILD_SECONDS or not pending):
+            self.rebuild(now)
+        return refreshed
+
+    def _count(self, name, amount=1):
+        with self._lock:
+            self._counts[name] += amount
+
+    def stats(self):
+        snapshot = self.snapshot
+        with self._lock:
+            counts = dict(self._counts)
+        return {
+            'universe': len(self.universe),
+            'symbols': len(snapshot),
+            'built_at': snapshot.built_at,
+            'refreshing': self._thread is not None and self._thread.is_alive(),
+            'calls_today': self._calls_today,
+            **counts
+        }
+
+
+# Natural language screens, e.g. "tech stocks with P/E under 20 near their 52-week low"
+
+# "Shares" is left out: "my Apple shares" is about a holding, not a universe
+SCREEN_NOUNS = re.compile(r'\b(stocks|companies|equities|screen|screener)\b', re.IGNORECASE)
+# A sector on its own is only a screen when the question asks for a list ("which bank stocks...")
+LIST_WORDS = re.compile(r'\b(find|show|list|screen|which|give\s+me)\b', re.IGNORECASE)
+
+# Words in a question, and the sector substrings they select. Alpha Vantage
+# has used both its own sector names (FINANCE, LIFE SCIENCES) and GICS-style
+# ones (FINANCIAL SERVICES, HEALTHCARE), so each word matches either
+SECTOR_KEYWORDS = (
+    (('technology',), ('tech', 'technology', 'software', 'semiconductors?', 'chip ?makers?', 'chips?')),
+    (('finance', 'financial'), ('financials?', 'finance', 'banks?', 'banking', 'insurers?', 'insurance')),
+    (('life sciences', 'healthcare'), ('health ?care', 'pharma', 'pharmaceuticals?', 'biotech', 'medical')),
+    (('energy',), ('energy', 'oil', 'gas')),
+    (('transportation', 'industrials'), ('transportation', 'airlines?', 'railroads?')),
+    (('manufacturing', 'industrials'), ('industrials?', 'manufacturing', 'manufacturers?', 'automakers?')),
+    (('trade & services', 'consumer'), ('retail', 'retailers?', 'consumer')),
+    (('real estate',), ('real estate', 'reits?', 'homebuilders?'))
+)
+
+METRIC_PATTERNS = {
+    'pe_ratio': r'p/?e(?:\s+ratios?)?|price[- ]to[- ]earnings(?:\s+ratios?)?',
+    'dividend_yield': r'dividend\s+yields?|dividends?|yields?',
+    'market_cap': r'market\s+cap(?:italization)?s?|market\s+values?',
+    'price': r'share\s+prices?|prices?|trading|priced',
+    'volume': r'volume'
+}
+BELOW = r'under|below|less\s+than|lower\s+than|at\s+most|no\s+more\s+than|<=?'
+ABOVE = r'over|above|more\s+than|greater\s+than|higher\s+than|at\s+least|>=?'
+# Not a count of shares ("trading above 400 shares")
+NUMBER = r'\$?\s*(\d+(?:\.\d+)?)\s*(%|percent|k|thousand|m|mn|million|b|bn|billion|t|tn|trillion)?\b(?!\s*shares)'
+MULTIPLIERS = {
+    'k': 1e3, 'thousand': 1e3, 'm': 1e6, 'mn': 1e6, 'million': 1e6,
+    'b': 1e9, 'bn': 1e9, 'billion': 1e9, 't': 1e12, 'tn': 1e12, 'trillion': 1e12
+}
+COMPARISON_PATTERN = re.compile(
+    rf'\b(?P<metric>{"|".join(f"(?:{p})" for p in METRIC_PATTERNS.values())})\s*'
+    rf'(?:ratio\s+|of\s+|is\s+|at\s+)?(?P<side>{BELOW}|{ABOVE})\s*{NUMBER}',
+    re.IGNORECASE
+)
+
+CAP_SIZES = {
+    'mega': (200e9, None),
+    'large': (10e9, None),
+    'mid': (2e9, 10e9),
+    'small': (300e6, 2e9),
+    'micro': (None, 300e6)
+}
+CAP_PATTERN = re.compile(r'\b(mega|large|mid|small|micro)[- ]?caps?\b', re.IGNORECASE)
+
+WEEK_52_PATTERN = re.compile(
+    r'\b(?:near|close\s+to|at|within\s+(\d+(?:\.\d+)?)\s*(?:%|percent)\s+of)\s+(?:its|their|the|a)?\s*'
+    r'(?:52|fifty[- ]two)[- ]week\s+(low|high)s?\b',
+    re.IGNORECASE
+)
+
+# (pattern, sort field, descending); the first match wins, market cap otherwise
+SORT_HINTS = (
+    (re.compile(r'\b(?:highest|best|top)\s+(?:dividend|yield)', re.IGNORECASE), 'dividend_yield', True),
+    (re.compile(r'\b(?:cheapest|lowest\s+p/?e)', re.IGNORECASE), 'pe_ratio', False),
+    (re.compile(r'\b(?:biggest|top)\s+(?:gainers|movers)', re.IGNORECASE), 'change_percent', True),
+    (re.compile(r'\b(?:biggest|top)\s+losers', re.IGNORECASE), 'change_percent', False),
+    (re.compile(r'\bmost\s+(?:active|traded)', re.IGNORECASE), 'volume', True)
+)
+
+
+def _metric_field(metric):
+    for field, pattern in METRIC_PATTERNS.items():
+        if re.fullmatch(pattern, metric, re.IGNORECASE):
+            return field
+    return None
+
+
+def parse_screen_query(query):
+    """Screen parameters ({'filters', 'sort', 'order'}) for a screening-style question, else None.
+
+    A question is a screen when it talks about stocks in the plural and sets
+    a numeric, size, 52-week or ranking condition, or asks to list a sector
+    ("which tech stocks..."). "How are bank stocks like JPM doing?" is not one.
+    """
+    if not SCREEN_NOUNS.search(query):
+        return None
+
+    filters = {}
+    sectors = [
+        sector for sectors, keywords in SECTOR_KEYWORDS
+        if re.search(rf'\b(?:{"|".join(keywords)})\b', query, re.IGNORECASE)
+        for sector in sectors
+    ]
+    if sectors:
+        filters['sector'] = ','.join(dict.fromkeys(sectors))
+
+    for match in COMPARISON_PATTERN.finditer(query):
+        field = _metric_field(match.group('metric'))
+        value = float(match.group(3))
+        unit = (match.group(4) or '').lower()
+        if unit in MULTIPLIERS:
+            value *= MULTIPLIERS[unit]
+        elif field == 'dividend_yield' and (unit in ('%', 'percent') or value >= 1):
+            # OVERVIEW dividend yields are fractions; people say "3%"
+            value /= 100
+        side = 'max' if re.fullmatch(BELOW, match.group('side'), re.IGNORECASE) else 'min'
+        filters[f'{field}_{side}'] = value
+
+    cap = CAP_PATTERN.search(query)
+    if cap:
+        lower, upper = CAP_SIZES[cap.group(1).lower()]
+        if lower is not None:
+            filters.setdefault('market_cap_min', lower)
+        if upper is not None:
+            filters.setdefault('market_cap_max', upper)
+
+    for within, extreme in WEEK_52_PATTERN.findall(query):
+        distance = float(within) / 100 if within else NEAR_52_WEEK
+        filters[f'from_52w_{extreme.lower()}_max'] = distance
+
+    sort, order, ranked = DEFAULT_SORT, 'desc', False
+    for pattern, field, descending in SORT_HINTS:
+        if pattern.search(query):
+            sort, order, ranked = field, 'desc' if descending else 'asc', True
+            break
+
+    conditions = set(filters) - {'sector'}
+    if not conditions and not ranked and not (sectors and LIST_WORDS.search(query)):
+        return None
+    return {'filters': filters, 'sort': sort, 'order': order}
+
+
+_shared_screener = None
+_shared_screener_lock = threading.Lock()
+
+
+def get_screener():
+    """Return the process-wide screener"""
+    global _shared_screener
+    with _shared_screener_lock:
+        if _shared_screener is None:
+            _shared_screener = Screener()
+        return _shared_screener
@@ -0,0 +1,22 @@
+"""Production server: the ASGI app (asgi.py) under uvicorn.
+
+Run from the backend directory:
+    python serve.py
+Configure with HOST, PORT, WEB_CONCURRENCY (worker processes) and LOG_LEVEL.
+"""
+import os
+
+import uvicorn
+from dotenv import load_dotenv
+
+load_dotenv()
+
+if __name__ == '__main__':
+    uvicorn.run(
+        'asgi:app',
+        host=os.getenv('HOST', '0.0.0.0'),
+        port=int(os.getenv('PORT', 5001)),
+        workers=int(os.getenv('WEB_CONCURRENCY', 1)),
+        log_level=os.getenv('LOG_LEVEL', 'info'),
+        proxy_headers=True
+    )
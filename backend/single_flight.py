@@ -0,0 +1,137 @@
+import asyncio
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
+
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+        self.waiters = 0
+
+
+class SingleFlight:
+    """Collapse concurrent calls for the same key into one upstream request.
+
+    The first caller for a key runs the function; callers arriving while it is
+    in flight block on the same call and receive its result (or exception).
+    """
+
+    def __init__(self, name):
+        self.name = name
+        self._lock = threading.Lock()
+        self._calls = {}
+        self.executed = 0
+        self.coalesced = 0
+
+    def do(self, key, func, *args, **kwargs):
+        with self._lock:
+            call = self._calls.get(key)
+            if call is not None:
+                call.waiters += 1
+                self.coalesced += 1
+                leader = False
+            else:
+                call = _Call()
+                self._calls[key] = call
+                self.executed += 1
+                leader = True
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = func(*args, **kwargs)
+            return call.result
+        except Exception as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            if call.waiters:
+                logger.debug(f"{self.name}: shared {key} with {call.waiters} waiting callers")
+            call.done.set()
+
+    def in_flight(self):
+        with self._lock:
+            return len(self._calls)
+
+    def stats(self):
+        return {
+            'executed': self.executed,
+            'coalesced': self.coalesced,
+            'in_flight': self.in_flight()
+        }
+
+
+class AsyncSingleFlight:
+    """SingleFlight for coroutines running on one event loop.
+
+    The shared call runs as its own task and every caller, the first one
+    included, awaits it through shield(), so a cancelled caller only stops
+    waiting and never cancels the call for the others.
+    """
+
+    def __init__(self, name):
+        self.name = name
+        self._calls = {}
+        self.executed = 0
+        self.coalesced = 0
+
+    async def do(self, key, func, *args, **kwargs):
+        task = self._calls.get(key)
+        if task is not None:
+            self.coalesced += 1
+        else:
+            task = asyncio.ensure_future(func(*args, **kwargs))
+            self._calls[key] = task
+            self.executed += 1
+            task.add_done_callback(lambda t: self._finish(key, t))
+        return await asyncio.shield(task)
+
+    def _finish(self, key, task):
+        if self._calls.get(key) is task:
+            del self._calls[key]
+        # Mark the exception as retrieved when every caller was cancelled
+        if not task.cancelled():
+            task.exception()
+
+    def in_flight(self):
+        return len(self._calls)
+
+    def stats(self):
+        return {
+            'executed': self.executed,
+            'coalesced': self.coalesced,
+            'in_flight': self.in_flight()
+        }
+
+
+_flights = {}
+_flights_lock = threading.Lock()
+
+
+def get_single_flight(name):
+    """Return the process-wide single-flight group for an upstream"""
+    with _flights_lock:
+        if name not in _flights:
+            _flights[name] = SingleFlight(name)
+        return _flights[name]
+
+
+_async_flights = {}
+
+
+def get_async_single_flight(name):
+    """Return the single-flight group for an upstream's async clients"""
+    with _flights_lock:
+        if name not in _async_flights:
+            _async_flights[name] = AsyncSingleFlight(name)
+        return _async_flights[name]
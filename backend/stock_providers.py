@@ -0,0 +1,282 @@
+"""Stock data from Alpha Vantage or Yahoo Finance behind one schema, with hedged failover.
+
+Both providers are normalized into the /api/av-stock response shape (with
+the price history left as arrays for the route to encode). StockDataFetcher
+asks the preferred healthy provider first; if it has not answered within its
+own recent p95 latency, the next provider is asked too and whichever answer
+arrives first wins. A provider that fails outright is failed over from
+immediately.
+"""
+import contextvars
+import logging
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+import numpy as np
+
+from metrics import get_metrics
+
+logger = logging.getLogger(__name__)
+
+
+class ProviderError(Exception):
+    """A provider had no usable data for the symbol"""
+
+
+def normalize_av_bundle(symbol, bundle):
+    """Shape an AlphaVantageService.get_stock_bundle result; None without a quote"""
+    quote_data = bundle['quote']
+    if not quote_data:
+        return None
+
+    overview_data = bundle['overview']
+    news_data = bundle['news']
+    return {
+        'symbol': quote_data['symbol'],
+        'current_price': quote_data['current_price'],
+        'company_name': overview_data['company_name'] if overview_data else f'{symbol} Company',
+        'market_cap': overview_data['market_cap'] if overview_data else None,
+        'pe_ratio': overview_data['pe_ratio'] if overview_data else None,
+        'dividend_yield': overview_data['dividend_yield'] if overview_data else None,
+        'volume': quote_data['volume'],
+        'day_high': quote_data['high'],
+        'day_low': quote_data['low'],
+        'fifty_two_week_high': overview_data['fifty_two_week_high'] if overview_data else None,
+        'fifty_two_week_low': overview_data['fifty_two_week_low'] if overview_data else None,
+        'sector': overview_data['sector'] if overview_data else 'N/A',
+        'industry': overview_data['industry'] if overview_data else 'N/A',
+        'summary': overview_data['summary'] if overview_data else 'No description available.',
+        'news': [
+            {
+                'title': item['title'],
+                'link': item['url'],
+                'publisher': item['source'],
+                'providerPublishTime': item['time_published'],
+                'summary': item['summary']
+            } for item in news_data
+        ],
+        'recommendations': [
+            {
+                'Firm': 'Alpha Vantage Sentiment Analysis',
+                'To_Grade': news_data[0]['sentiment_label'] if news_data else 'Neutral',
+                'Action': 'sentiment',
+                'Period': quote_data['latest_trading_day']
+            }
+        ] if news_data else [],
+        'price_history': bundle['time_series'],
+        'change': quote_data['change'],
+        'change_percent': quote_data['change_percent'],
+        'previous_close': quote_data['previous_close'],
+        'open': quote_data['open']
+    }
+
+
+def normalize_yf_data(stock_data):
+    """Fill the quote fields YFinanceService.get_stock_data lacks from its daily closes"""
+    if not stock_data.get('current_price'):
+        return None
+
+    prices = np.asarray(stock_data['price_history']['prices'], dtype=np.float64)
+    previous_close = float(prices[-2]) if len(prices) > 1 else None
+    change = stock_data['current_price'] - previous_close if previous_close else None
+    return {
+        **stock_data,
+        'change': change,
+        'change_percent': f'{change / previous_close * 100:.4f}%' if change is not None else None,
+        'previous_close': previous_close,
+        'open': None
+    }
+
+
+class AlphaVantageProvider:
+    name = 'alpha_vantage'
+
+    def __init__(self, av_service):
+        self.av_service = av_service
+
+    def fetch(self, symbol):
+        bundle = self.av_service.get_stock_bundle(symbol)
+        data = normalize_av_bundle(symbol, bundle)
+        if data is None:
+            raise ProviderError(f'No Alpha Vantage quote for {symbol}')
+        if bundle['errors']:
+            logger.warning(f"Partial Alpha Vantage data for {symbol}, missing: {', '.join(bundle['errors'])}")
+        return data
+
+
+class YFinanceProvider:
+    name = 'yfinance'
+
+    def __init__(self, yf_service):
+        self.yf_service = yf_service
+
+    def fetch(self, symbol):
+        data = normalize_yf_data(self.yf_service.get_stock_data(symbol))
+        if data is None:
+            raise ProviderError(f'No Yahoo Finance price for {symbol}')
+        return data
+
+
+class ProviderHealth:
+    """Recent latency and failures of one provider.
+
+    A provider is unhealthy after `max_failures` failures in a row and stays
+    so for `cooldown` seconds, after which it is tried again.
+    """
+
+    WINDOW = 200
+
+    def __init__(self, max_failures=3, cooldown=30.0):
+        self.max_failures = max_failures
+        self.cooldown = cooldown
+        self._lock = threading.Lock()
+        self._latencies = deque(maxlen=self.WINDOW)
+        self._consecutive_failures = 0
+        self._unhealthy_until = 0.0
+        self.successes = 0
+        self.failures = 0
+
+    def record_success(self, latency):
+        with self._lock:
+            self._latencies.append(latency)
+            self._consecutive_failures = 0
+            self._unhealthy_until = 0.0
+            self.successes += 1
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            self._consecutive_failures += 1
+            if self._consecutive_failures >= self.max_failures:
+                self._unhealthy_until = time.monotonic() + self.cooldown
+
+    @property
+    def healthy(self):
+        return time.monotonic() >= self._unhealthy_until
+
+    def percentile(self, q, min_samples=20):
+        """Latency percentile over the window, or None until there are min_samples"""
+        with self._lock:
+            latencies = list(self._latencies)
+        if len(latencies) < min_samples:
+            return None
+        return float(np.percentile(latencies, q))
+
+    def stats(self):
+        p50, p95 = self.percentile(50, min_samples=1), self.percentile(95, min_samples=1)
+        return {
+            'healthy': self.healthy,
+            'successes': self.successes,
+            'failures': self.failures,
+            'consecutive_failures': self._consecutive_failures,
+            'latency_p50': p50,
+            'latency_p95': p95
+        }
+
+
+class StockDataFetcher:
+    """Fetch normalized stock data from the first provider to answer.
+
+    Providers are tried in preference order, healthy ones first. The next one
+    is asked as well once the current one fails or runs past its p95 latency
+    (at least `min_hedge_delay`; `initial_hedge_delay` until it has enough
+    samples). Losing requests run to completion and still warm the caches.
+    """
+
+    def __init__(self, providers, min_hedge_delay=None, initial_hedge_delay=None, timeout=None):
+        self.providers = list(providers)
+        self.min_hedge_delay = min_hedge_delay if min_hedge_delay is not None else float(
+            os.getenv('PROVIDER_HEDGE_MIN_DELAY', 0.25))
+        self.initial_hedge_delay = initial_hedge_delay if initial_hedge_delay is not None else float(
+            os.getenv('PROVIDER_HEDGE_INITIAL_DELAY', 2.0))
+        self.timeout = timeout if timeout is not None else float(os.getenv('PROVIDER_TIMEOUT', 20))
+        self.health = {provider.name: ProviderHealth() for provider in self.providers}
+        self.executor = ThreadPoolExecutor(
+            max_workers=int(os.getenv('PROVIDER_MAX_WORKERS', 16)),
+            thread_name_prefix='stock-provider'
+        )
+        self._lock = threading.Lock()
+        self._hedges = 0
+
+    def ordered_providers(self):
+        """Preference order with unhealthy providers moved to the back"""
+        return sorted(self.providers, key=lambda provider: not self.health[provider.name].healthy)
+
+    def hedge_delay(self, provider):
+        p95 = self.health[provider.name].percentile(95)
+        return self.initial_hedge_delay if p95 is None else max(self.min_hedge_delay, p95)
+
+    def _call(self, provider, symbol):
+        started = time.perf_counter()
+        try:
+            data = provider.fetch(symbol)
+        except Exception:
+            self.health[provider.name].record_failure()
+            raise
+        self.health[provider.name].record_success(time.perf_counter() - started)
+        return data
+
+    def fetch(self, symbol):
+        """Normalized stock data with a 'provider' field naming which provider answered.
+
+        Raises the last provider's error if none of them has the symbol.
+        """
+        deadline = time.monotonic() + self.timeout
+        waiting = self.ordered_providers()
+        pending = {}
+        last_error = None
+        start_next = True
+
+        while waiting or pending:
+            if waiting and start_next:
+                provider = waiting.pop(0)
+                # Run in a copy of this context so upstream timings land on the current request
+                future = self.executor.submit(contextvars.copy_context().run, self._call, provider, symbol)
+                pending[future] = provider
+                hedge_at = time.monotonic() + self.hedge_delay(provider)
+                start_next = False
+
+            now = time.monotonic()
+            if now >= deadline:
+                break
+            timeout = min(deadline, hedge_at) - now if waiting else deadline - now
+            done, _ = wait(pending, timeout=max(0.0, timeout), return_when=FIRST_COMPLETED)
+
+            for future in done:
+                provider = pending.pop(future)
+                try:
+                    data = future.result()
+                except Exception as e:
+                    logger.warning(f"{provider.name} failed for {symbol}: {str(e)}")
+                    get_metrics().inc('provider_requests_total', provider=provider.name, outcome='failed')
+                    last_error = e
+                    # Fail over right away rather than waiting out the hedge delay
+                    start_next = True
+                    continue
+                get_metrics().inc('provider_requests_total', provider=provider.name, outcome='won')
+                for other in pending.values():
+                    get_metrics().inc('provider_requests_total', provider=other.name, outcome='lost')
+                return {**data, 'provider': provider.name}
+
+            if waiting and not start_next and time.monotonic() >= hedge_at:
+                logger.info(f"Hedging {symbol} to {waiting[0].name} after {self.hedge_delay(provider):.2f}s")
+                with self._lock:
+                    self._hedges += 1
+                get_metrics().inc('provider_hedges_total')
+                start_next = True
+
+        if last_error is not None and not pending:
+            raise last_error
+        raise TimeoutError(f'No provider answered for {symbol} within {self.timeout:g}s')
+
+    def stats(self):
+        with self._lock:
+            hedges = self._hedges
+        return {
+            'order': [provider.name for provider in self.ordered_providers()],
+            'hedges': hedges,
+            'providers': {name: health.stats() for name, health in self.health.items()}
+        }
@@ -0,0 +1,237 @@
+import logging
+import math
+import threading
+from collections import deque
+
+import numpy as np
+
+from indicators import DEFAULT_PARAMS, TRADING_DAYS
+from price_store import COLUMNS
+
+logger = logging.getLogger(__name__)
+
+NAN = float('nan')
+
+
+class _SeededEMA:
+    """EMA seeded with the simple average of its first `period` inputs"""
+
+    def __init__(self, alpha, period):
+        self.alpha = alpha
+        self.period = period
+        self.count = 0
+        self.total = 0.0
+        self.value = NAN
+
+    def update(self, x):
+        if self.count < self.period:
+            self.count += 1
+            self.total += x
+            if self.count == self.period:
+                self.value = self.total / self.period
+            return self.value
+        self.value = self.alpha * x + (1 - self.alpha) * self.value
+        return self.value
+
+    def copy(self):
+        clone = _SeededEMA(self.alpha, self.period)
+        clone.count, clone.total, clone.value = self.count, self.total, self.value
+        return clone
+
+
+class _RollingWindow:
+    """Fixed-size window with running mean and Welford variance"""
+
+    def __init__(self, period):
+        self.period = period
+        self.values = deque()
+        self.mean = 0.0
+        self.m2 = 0.0
+
+    def update(self, x):
+        if len(self.values) == self.period:
+            self._remove(self.values.popleft())
+        self.values.append(x)
+        count = len(self.values)
+        delta = x - self.mean
+        self.mean += delta / count
+        self.m2 += delta * (x - self.mean)
+
+    def _remove(self, y):
+        # Called after y has left the deque
+        count = len(self.values)
+        if count == 0:
+            self.mean, self.m2 = 0.0, 0.0
+            return
+        delta = y - self.mean
+        self.mean -= delta / count
+        self.m2 -= delta * (y - self.mean)
+
+    @property
+    def full(self):
+        return len(self.values) == self.period
+
+    def variance(self, ddof=0):
+        if not self.full:
+            return NAN
+        return max(self.m2, 0.0) / (self.period - ddof)
+
+    def copy(self):
+        clone = _RollingWindow(self.period)
+        clone.values = deque(self.values)
+        clone.mean, clone.m2 = self.mean, self.m2
+        return clone
+
+
+class _IndicatorState:
+    def __init__(self, params):
+        self.params = params
+        fast, slow, signal = params['macd']
+        self.sma = _RollingWindow(params['sma'])
+        self.ema = _SeededEMA(2.0 / (params['ema'] + 1), params['ema'])
+        self.gains = _SeededEMA(1.0 / params['rsi'], params['rsi'])
+        self.losses = _SeededEMA(1.0 / params['rsi'], params['rsi'])
+        self.macd_fast = _SeededEMA(2.0 / (fast + 1), fast)
+        self.macd_slow = _SeededEMA(2.0 / (slow + 1), slow)
+        self.macd_signal = _SeededEMA(2.0 / (signal + 1), signal)
+        self.bollinger = _RollingWindow(params['bollinger'][0])
+        self.atr = _SeededEMA(1.0 / params['atr'], params['atr'])
+        self.returns = _RollingWindow(params['volatility'])
+        self.previous_close = None
+        self.peak = NAN
+        self.values = {}
+
+    def copy(self):
+        clone = _IndicatorState.__new__(_IndicatorState)
+        clone.__dict__.update({
+            key: value.copy() if hasattr(value, 'copy') else value
+            for key, value in self.__dict__.items()
+        })
+        return clone
+
+    def update(self, high, low, close):
+        params = self.params
+        values = {}
+
+        self.sma.update(close)
+        values[f"sma_{params['sma']}"] = self.sma.mean if self.sma.full else NAN
+        values[f"ema_{params['ema']}"] = self.ema.update(close)
+
+        if self.previous_close is None:
+            rsi = NAN
+            true_range = high - low
+        else:
+            delta = close - self.previous_close
+            gain = self.gains.update(max(delta, 0.0))
+            loss = self.losses.update(max(-delta, 0.0))
+            if math.isnan(gain):
+                rsi = NAN
+            else:
+                rsi = 100.0 if loss == 0 else 100 - 100 / (1 + gain / loss)
+            true_range = max(high - low, abs(high - self.previous_close), abs(low - self.previous_close))
+            self.returns.update(math.log(close / self.previous_close))
+        values[f"rsi_{params['rsi']}"] = rsi
+
+        fast = self.macd_fast.update(close)
+        slow = self.macd_slow.update(close)
+        line = fast - slow
+        signal = self.macd_signal.update(line) if not math.isnan(line) else NAN
+        values['macd'] = {'macd': line, 'signal': signal, 'histogram': line - signal}
+
+        self.bollinger.update(close)
+        middle = self.bollinger.mean if self.bollinger.full else NAN
+        width = params['bollinger'][1] * math.sqrt(self.bollinger.variance()) if self.bollinger.full else NAN
+        values['bollinger'] = {'upper': middle + width, 'middle': middle, 'lower': middle - width}
+
+        values[f"atr_{params['atr']}"] = self.atr.update(true_range)
+        values[f"volatility_{params['volatility']}"] = (
+            math.sqrt(self.returns.variance(ddof=1) * TRADING_DAYS) if self.returns.full else NAN
+        )
+
+        self.peak = close if math.isnan(self.peak) else max(self.peak, close)
+        values['drawdown'] = close / self.peak - 1
+
+        self.previous_close = close
+        self.values = values
+        return values
+
+
+class StreamingIndicators:
+    """Constant-time indicator updates for one symbol.
+
+    Produces the same values as indicators.compute_indicators on the last bar.
+    Updating the most recent date again (e.g. an intraday quote revising
+    today's bar) replays only that bar from a snapshot of the prior state.
+    """
+
+    def __init__(self, params=None):
+        self.params = {**DEFAULT_PARAMS, **(params or {})}
+        self._state = _IndicatorState(self.params)
+        self._before_last = None
+        self.last_date = None
+        self.bars = 0
+
+    def update(self, date, high, low, close):
+        """Apply a daily bar; a bar for the latest date replaces it instead of appending"""
+        date = np.datetime64(date, 'D')
+        if self.last_date is not None and date < self.last_date:
+            raise ValueError(f"Bar for {date} is older than the latest bar {self.last_date}")
+
+        if date == self.last_date:
+            self._state = self._before_last.copy()
+        else:
+            self._before_last = self._state.copy()
+            self.last_date = date
+            self.bars += 1
+        return self._state.update(float(high), float(low), float(close))
+
+    def seed(self, dates, ohlcv):
+        """Replay stored history once so later updates start from the right state"""
+        high = ohlcv[:, COLUMNS.index('high')]
+        low = ohlcv[:, COLUMNS.index('low')]
+        close = ohlcv[:, COLUMNS.index('close')]
+        for date, bar_high, bar_low, bar_close in zip(dates, high, low, close):
+            self.update(date, bar_high, bar_low, bar_close)
+        return self
+
+    @property
+    def values(self):
+        return self._state.values
+
+
+class StreamingIndicatorRegistry:
+    """Per-symbol streaming indicator state, seeded from the price history store"""
+
+    def __init__(self, price_store, params=None):
+        self.price_store = price_store
+        self.params = params
+        self._states = {}
+        self._lock = threading.Lock()
+
+    def get(self, source, symbol, fetcher):
+        key = (source, symbol.upper())
+        with self._lock:
+            state = self._states.get(key)
+        if state is not None:
+            return state
+
+        dates, ohlcv = self.price_store.update(source, symbol, fetcher)
+        state = StreamingIndicators(self.params).seed(dates, np.asarray(ohlcv))
+        with self._lock:
+            return self._states.setdefault(key, state)
+
+    def on_bar(self, source, symbol, fetcher, date, high, low, close):
+        state = self.get(source, symbol, fetcher)
+        with self._lock:
+            try:
+                return state.update(date, high, low, close)
+            except ValueError as e:
+                logger.debug(f"Ignoring out-of-order bar for {symbol}: {str(e)}")
+                return state.values
+
+    def on_quote(self, source, symbol, fetcher, quote):
+        """Fold a get_stock_quote result into today's bar"""
+        if not quote or not quote.get('latest_trading_day'):
+            return None
+        return self.on_bar(source, symbol, fetcher, quote['latest_trading_day'],
+                           quote['high'], quote['low'], quote['current_price'])
@@ -0,0 +1,549 @@
+import csv
+import io
+import logging
+import os
+import re
+import threading
+import time
+from bisect import bisect_left
+from collections import Counter, defaultdict
+from difflib import SequenceMatcher
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_LISTING_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'symbols.csv')
+# Where background refreshes save the downloaded LISTING_STATUS file
+DEFAULT_LISTING_CACHE_PATH = 'listing_status.csv'
+
+# Words dropped from company names to get the name people actually type
+NAME_SUFFIXES = {
+    'inc', 'incorporated', 'corp', 'corporation', 'co', 'company', 'companies', 'ltd', 'limited',
+    'plc', 'sa', 'se', 'nv', 'ag', 's', 'group', 'holding', 'holdings', 'class', 'a', 'b', 'c',
+    'the', 'com'
+}
+
+# Generic words that can also go when what's left is still distinctive
+GENERIC_NAME_WORDS = {
+    'technologies', 'technology', 'systems', 'platforms', 'motor', 'motors', 'communications',
+    'international', 'wholesale', 'health', 'sciences', 'markets', 'global', 'automotive', 'networks', 'us'
+}
+
+# Colloquial names that suffix stripping can't derive
+COMMON_ALIASES = {
+    'google': 'GOOGL',
+    'facebook': 'META',
+    'disney': 'DIS',
+    'exxon': 'XOM',
+    'jpmorgan': 'JPM',
+    'jp morgan': 'JPM',
+    'chase': 'JPM',
+    'berkshire': 'BRK.B',
+    'coke': 'KO',
+    'pepsi': 'PEP',
+    'goldman': 'GS',
+    'lilly': 'LLY',
+    'schwab': 'SCHW',
+    'bofa': 'BAC',
+    'tsmc': 'TSM',
+    'mcdonalds': 'MCD',
+    'lowes': 'LOW',
+    'at t': 'T',
+    'att': 'T',
+    'novo': 'NVO',
+    'delta': 'DAL',
+    's p 500': 'SPY',
+    's p': 'SPY',
+    'sp500': 'SPY'
+}
+
+# Company names that are also everyday words; they only count when capitalized
+COMMON_WORD_NAMES = {'target', 'visa', 'oracle', 'snap', 'arm', 'delta', 'block', 'shell', 'gap', 'chase'}
+
+# All-caps words that are tickers but usually aren't meant as one
+AMBIGUOUS_TICKERS = {
+    'A', 'I', 'IT', 'ON', 'ALL', 'NOW', 'NET', 'LOW', 'CAT', 'ARM', 'BE', 'SO', 'GO', 'ARE', 'CAN',
+    'HAS', 'AI', 'PE', 'EV', 'DD', 'US', 'USA', 'CEO', 'CFO', 'ETF', 'IPO', 'EPS', 'GDP', 'SEC',
+    'FED', 'OR', 'AT', 'MS', 'F', 'C', 'V', 'T', 'MA', 'GE', 'PM', 'MO'
+}
+
+# All-caps finance jargon that is not a ticker
+NON_TICKER_WORDS = {
+    'ROI', 'YOY', 'QOQ', 'YTD', 'ATH', 'EOD', 'DCF', 'ESG', 'CAGR', 'NYSE', 'NASDAQ', 'SP', 'EBITDA',
+    'FCF', 'PEG', 'OTC', 'ADR', 'REIT', 'API', 'USD', 'EUR', 'GBP', 'JPY', 'CPI', 'FOMC', 'IMO',
+    'TLDR', 'FAQ', 'WHAT', 'HOW', 'WHY', 'IS', 'THE', 'AND', 'VS', 'OK', 'PLEASE'
+}
+
+# Words that never start or end a company name in a query
+STOPWORDS = {
+    'a', 'an', 'the', 'of', 'and', 'or', 'is', 'are', 'was', 'be', 'to', 'in', 'on', 'for', 'at', 'by',
+    'with', 'about', 'how', 'what', 'why', 'when', 'which', 'who', 'should', 'would', 'could', 'can',
+    'do', 'does', 'did', 'i', 'me', 'my', 'you', 'your', 'we', 'it', 'its', 'this', 'that', 'these',
+    'stock', 'stocks', 'share', 'shares', 'price', 'prices', 'buy', 'sell', 'hold', 'doing', 'today',
+    'now', 'vs', 'versus', 'compare', 'tell', 'think', 'good', 'bad', 'news', 'market', 'outlook'
+}
+
+CASHTAG_PATTERN = re.compile(r'\$([A-Za-z]{1,5}(?:\.[A-Za-z])?)\b')
+TICKER_PATTERN = re.compile(r'\b[A-Z]{1,5}(?:\.[A-Z])?\b')
+WORD_PATTERN = re.compile(r"[A-Za-z0-9&']+")
+
+
+def normalize_name(name):
+    """Lowercase words of a name with punctuation and possessives removed"""
+    name = re.sub(r"'s\b", '', name.lower()).replace('&', ' ').replace('.com', ' com')
+    return ' '.join(re.findall(r'[a-z0-9]+', name))
+
+
+def _strip_suffixes(normalized):
+    words = normalized.split()
+    while len(words) > 1 and words[-1] in NAME_SUFFIXES:
+        words.pop()
+    while len(words) > 1 and words[0] == 'the':
+        words.pop(0)
+    return ' '.join(words)
+
+
+def name_aliases(name):
+    """Names a listing is likely to be called by, e.g. 'Ford Motor Company' -> 'ford motor', 'ford'"""
+    normalized = normalize_name(name)
+    stripped = _strip_suffixes(normalized)
+    aliases = [normalized, stripped]
+    words = stripped.split()
+    while len(words) > 1 and words[-1] in GENERIC_NAME_WORDS | NAME_SUFFIXES:
+        words.pop()
+    if len(words) > 1 or len(words[0]) >= 4:
+        aliases.append(' '.join(words))
+    return list(dict.fromkeys(alias for alias in aliases if alias))
+
+
+def _trigrams(text):
+    padded = f'  {text} '
+    return Counter(padded[i:i + 3] for i in range(len(padded) - 2))
+
+
+class SymbolDirectory:
+    """In-memory index of known tickers and the names people call them by"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.names = {}
+        self._aliases = {}
+        self._trigram_index = defaultdict(set)
+
+    def __len__(self):
+        return len(self.names)
+
+    def __contains__(self, symbol):
+        return symbol.upper() in self.names
+
+    def add(self, symbol, name=None):
+        symbol = symbol.upper()
+        with self._lock:
+            self.names.setdefault(symbol, name or symbol)
+            if name:
+                for alias in name_aliases(name):
+                    self._add_alias(alias, symbol)
+
+    def add_alias(self, alias, symbol):
+        with self._lock:
+            self._add_alias(normalize_name(alias), symbol.upper())
+
+    def add_aliases(self, aliases):
+        """Add {alias: symbol} entries for symbols already in the directory"""
+        for alias, symbol in aliases.items():
+            if symbol in self:
+                self.add_alias(alias, symbol)
+
+    def _add_alias(self, alias, symbol):
+        # First listing wins, so share classes resolve to the primary line
+        if not alias or alias in self._aliases:
+            return
+        self._aliases[alias] = symbol
+        for trigram in _trigrams(alias):
+            self._trigram_index[trigram].add(alias)
+
+    def load_csv(self, path):
+        """Load a LISTING_STATUS style CSV (symbol,name,... columns); returns rows read"""
+        count = 0
+        with open(path, newline='') as f:
+            for row in csv.DictReader(f):
+                if row.get('symbol'):
+                    self.add(row['symbol'], row.get('name'))
+                    count += 1
+        return count
+
+    def lookup_alias(self, text):
+        return self._aliases.get(normalize_name(text))
+
+    def fuzzy_matches(self, text, limit=3):
+        """Best (score, alias, symbol) candidates for a possibly misspelled name"""
+        text = normalize_name(text)
+        query = _trigrams(text)
+        candidates = Counter()
+        for trigram in query:
+            for alias in self._trigram_index.get(trigram, ()):
+                candidates[alias] += 1
+
+        # Trigrams narrow the field cheaply; only the survivors get an edit-distance score.
+        # Typos rarely hit the first letter or change the word count, so those must agree.
+        threshold = max(2, len(query) // 3)
+        words = text.count(' ')
+        scored = [
+            (SequenceMatcher(None, text, alias).ratio(), alias, self._aliases[alias])
+            for alias, shared in candidates.items()
+            if shared >= threshold and alias[:1] == text[:1] and alias.count(' ') == words
+        ]
+        scored.sort(reverse=True)
+        return scored[:limit]
+
+
+class SymbolExtractor:
+    """Resolves ticker symbols mentioned in a query without calling the LLM.
+
+    extract() returns the symbols in the order they appear (possibly an
+    empty list) when it is confident, or None when the query is ambiguous
+    and the caller should fall back to the LLM.
+    """
+
+    FUZZY_ACCEPT = 0.8
+    FUZZY_CONSIDER = 0.7
+    MAX_NAME_WORDS = 4
+
+    def __init__(self, directory):
+        self.directory = directory
+        self._lock = threading.Lock()
+        self._counts = Counter()
+
+    def extract(self, query):
+        symbols, ambiguous = self._extract(query)
+        outcome = 'fallback' if ambiguous else ('local' if symbols else 'local_none')
+        with self._lock:
+            self._counts[outcome] += 1
+        return None if ambiguous else symbols
+
+    def _extract(self, query):
+        found = {}
+
+        # $AAPL is always meant as a ticker, known or not
+        for match in CASHTAG_PATTERN.finditer(query):
+            found.setdefault(match.group(1).upper(), match.start())
+        if found:
+            return self._ordered(found), False
+
+        # Something that looks like a symbol but didn't resolve makes the whole answer doubtful;
+        # weaker hints only matter when nothing resolved at all
+        doubtful = False
+        weak_hint = False
+        for match in TICKER_PATTERN.finditer(query):
+            token = match.group(0)
+            if token in AMBIGUOUS_TICKERS:
+                weak_hint |= len(token) > 1 and token in self.directory
+            elif token in self.directory:
+                found.setdefault(token, match.start())
+            elif len(token) > 1 and token not in NON_TICKER_WORDS:
+                doubtful = True
+
+        words = [(m.group(0), m.start()) for m in WORD_PATTERN.finditer(query)]
+        names, fuzzy_doubt = self._match_names(words)
+        for symbol, position in names.items():
+            found.setdefault(symbol, position)
+
+        if doubtful or fuzzy_doubt:
+            return [], True
+        if found:
+            return self._ordered(found), False
+        return [], weak_hint or self._has_proper_noun(query, words)
+
+    def _match_names(self, words):
+        found = {}
+        consumed = set()
+        doubtful = False
+
+        # Longest exact alias first, so "bank of america" beats "america"
+        for size in range(min(self.MAX_NAME_WORDS, len(words)), 0, -1):
+            for start in range(len(words) - size + 1):
+                span = range(start, start + size)
+                if consumed.intersection(span):
+                    continue
+                chunk = words[start:start + size]
+                if chunk[0][0].lower() in STOPWORDS or chunk[-1][0].lower() in STOPWORDS:
+                    continue
+                normalized = normalize_name(' '.join(word for word, _ in chunk))
+                symbol = self.directory.lookup_alias(normalized)
+                if symbol is None:
+                    continue
+                consumed.update(span)
+                if size == 1 and normalized in COMMON_WORD_NAMES and not chunk[0][0][:1].isupper():
+                    continue
+                found.setdefault(symbol, chunk[0][1])
+
+        # Misspelled names: single leftover words that look like a company
+        for index, (word, position) in enumerate(words):
+            if index in consumed or len(word) < 5 or word.lower() in STOPWORDS or word.isupper():
+                continue
+            matches = self.directory.fuzzy_matches(word, limit=2)
+            if not matches or matches[0][0] < self.FUZZY_CONSIDER:
+                continue
+            best_score, _, best_symbol = matches[0]
+            runner_up = matches[1][0] if len(matches) > 1 else 0.0
+            if best_score >= self.FUZZY_ACCEPT and best_score - runner_up >= 0.1:
+                found.setdefault(best_symbol, position)
+            else:
+                doubtful = True
+
+        return found, doubtful
+
+    @staticmethod
+    def _has_proper_noun(query, words):
+        """A capitalized word mid-sentence may be a company we don't know"""
+        for index, (word, position) in enumerate(words):
+            at_sentence_start = index == 0 or query[:position].rstrip()[-1:] in '.?!'
+            if (word[:1].isupper() and not word.isupper() and not at_sentence_start
+                    and word.lower() not in STOPWORDS):
+                return True
+        return False
+
+    @staticmethod
+    def _ordered(found):
+        return [symbol for symbol, _ in sorted(found.items(), key=lambda item: item[1])]
+
+    def stats(self):
+        """How often queries resolved locally versus fell back to the LLM"""
+        with self._lock:
+            counts = dict(self._counts)
+        local = counts.get('local', 0) + counts.get('local_none', 0)
+        fallback = counts.get('fallback', 0)
+        total = local + fallback
+        return {
+            'local': counts.get('local', 0),
+            'local_none': counts.get('local_none', 0),
+            'fallback': fallback,
+            'hit_ratio': local / total if total else 0.0
+        }
+
+
+def read_listing_rows(lines):
+    """Active (symbol, name, exchange, asset type) rows from LISTING_STATUS style CSV lines"""
+    rows = []
+    for row in csv.DictReader(lines):
+        symbol = (row.get('symbol') or '').strip().upper()
+        if not symbol or (row.get('status') or 'Active') != 'Active':
+            continue
+        rows.append((symbol, (row.get('name') or '').strip() or symbol, row.get('exchange') or '',
+                     row.get('assetType') or 'Stock'))
+    return rows
+
+
+class _SearchData:
+    """Immutable lookup tables for one listing; swapped whole on reload"""
+
+    def __init__(self, rows):
+        self.rows = rows
+        self.names = [_strip_suffixes(normalize_name(name)) for _, name, _, _ in rows]
+        self.symbols = sorted((symbol, index) for index, (symbol, _, _, _) in enumerate(rows))
+        self.symbol_keys = [symbol for symbol, _ in self.symbols]
+        self.words = sorted(
+            (word, index) for index, name in enumerate(self.names) for word in set(name.split())
+        )
+        self.word_keys = [word for word, _ in self.words]
+        self.trigrams = defaultdict(list)
+        self.trigram_counts = []
+        for index, name in enumerate(self.names):
+            trigrams = _trigrams(name)
+            self.trigram_counts.append(len(trigrams))
+            for trigram in trigrams:
+                self.trigrams[trigram].append(index)
+
+
+class SymbolSearchIndex:
+    """Type-ahead symbol search over a listing file, answered from memory.
+
+    Ticker prefixes rank first, then names starting with the query, then
+    names containing every query word as a word prefix, then names that are
+    merely similar (shared trigrams, for typos). Results have the same shape
+    as Alpha Vantage SYMBOL_SEARCH matches.
+    """
+
+    # Prefix scans stop after this many entries so one-letter queries stay cheap
+    MAX_PREFIX_SCAN = 300
+    MIN_FUZZY_SCORE = 0.35
+    ASSET_TYPES = {'Stock': 'Equity'}
+
+    def __init__(self, rows=()):
+        self._data = _SearchData(list(rows))
+        self._refresh_lock = threading.Lock()
+        self._thread = None
+        self.loaded_at = time.time()
+
+    def __len__(self):
+        return len(self._data.rows)
+
+    def load_csv(self, path):
+        """Replace the index with the listing at path; returns rows loaded"""
+        with open(path, newline='') as f:
+            return self.load_rows(read_listing_rows(f))
+
+    def load_rows(self, rows):
+        data = _SearchData(list(rows))
+        self._data = data
+        self.loaded_at = time.time()
+        return len(data.rows)
+
+    def search(self, query, limit=10):
+        """Best matches for a ticker or company name prefix, highest match_score first"""
+        data = self._data
+        query = query.strip()
+        normalized = normalize_name(query)
+        if not query or not data.rows:
+            return []
+
+        scores = {}
+
+        def offer(index, score):
+            if score > scores.get(index, 0.0):
+                scores[index] = score
+
+        ticker = query.upper()
+        for symbol, index in self._prefix_scan(data.symbols, data.symbol_keys, ticker):
+            offer(index, 1.0 if symbol == ticker else 0.9 - 0.02 * (len(symbol) - len(ticker)))
+
+        words = normalized.split()
+        if words:
+            for _, index in self._prefix_scan(data.words, data.word_keys, words[0]):
+                name = data.names[index]
+                if name.startswith(normalized):
+                    offer(index, 0.85 - 0.002 * (len(name) - len(normalized)))
+                elif len(words) == 1 or all(any(word.startswith(part) for word in name.split()) for part in words[1:]):
+                    offer(index, 0.7 - 0.002 * len(name))
+
+        if len(scores) < limit and len(normalized) >= 3:
+            for index, score in self._similar_names(data, normalized):
+                offer(index, score)
+
+        ranked = sorted(
+            scores.items(),
+            key=lambda item: (-item[1], data.rows[item[0]][3] != 'Stock', len(data.rows[item[0]][0]))
+        )
+        return [self._result(data.rows[index], score) for index, score in ranked[:limit]]
+
+    def _prefix_scan(self, entries, keys, prefix):
+        start = bisect_left(keys, prefix)
+        for position in range(start, min(start + self.MAX_PREFIX_SCAN, len(keys))):
+            if not keys[position].startswith(prefix):
+                break
+            yield entries[position]
+
+    def _similar_names(self, data, normalized):
+        query = _trigrams(normalized)
+        shared = Counter()
+        for trigram in query:
+            for index in data.trigrams.get(trigram, ()):
+                shared[index] += 1
+        for index, count in shared.items():
+            score = count / (len(query) + data.trigram_counts[index] - count)
+            if score >= self.MIN_FUZZY_SCORE:
+                yield index, 0.6 * score
+
+    def _result(self, row, score):
+        symbol, name, exchange, asset_type = row
+        return {
+            'symbol': symbol,
+            'name': name,
+            'type': self.ASSET_TYPES.get(asset_type, asset_type),
+            'exchange': exchange,
+            'region': 'United States',
+            'currency': 'USD',
+            'match_score': f"{score:.4f}"
+        }
+
+    def start_refresh(self, fetch_listing, path, interval):
+        """Re-download the listing every `interval` seconds in a background thread.
+
+        fetch_listing() returns LISTING_STATUS CSV text. The download is saved
+        to path, which is also where the next process starts from.
+        """
+        with self._refresh_lock:
+            if interval <= 0 or (self._thread is not None and self._thread.is_alive()):
+                return
+            self._thread = threading.Thread(
+                target=self._refresh_loop, args=(fetch_listing, path, interval),
+                name='symbol-listing-refresh', daemon=True
+            )
+            self._thread.start()
+
+    def _refresh_loop(self, fetch_listing, path, interval):
+        try:
+            age = time.time() - os.path.getmtime(path)
+        except OSError:
+            age = interval
+        delay = max(0.0, interval - age)
+        while True:
+            time.sleep(delay)
+            delay = interval
+            try:
+                self.refresh(fetch_listing, path)
+            except Exception as e:
+                logger.error(f"Error refreshing symbol listing: {str(e)}")
+
+    def refresh(self, fetch_listing, path):
+        """Download the listing once, save it to path and swap it in"""
+        text = fetch_listing()
+        rows = read_listing_rows(io.StringIO(text))
+        # A quota note or error page parses to nothing; keep serving the old listing
+        if len(rows) < len(self) // 2:
+            raise ValueError(f"listing download has only {len(rows)} rows")
+
+        temp_path = f"{path}.tmp"
+        with open(temp_path, 'w', newline='') as f:
+            f.write(text)
+        os.replace(temp_path, path)
+        logger.info(f"Refreshed symbol listing: {self.load_rows(rows)} symbols")
+        return len(rows)
+
+
+_shared_directory = None
+_shared_extractor = None
+_shared_search_index = None
+_shared_lock = threading.Lock()
+
+
+def get_symbol_directory():
+    """Return the process-wide symbol directory, loaded from SYMBOL_LISTING_PATH"""
+    global _shared_directory
+    with _shared_lock:
+        if _shared_directory is None:
+            directory = SymbolDirectory()
+            path = os.getenv('SYMBOL_LISTING_PATH', DEFAULT_LISTING_PATH)
+            try:
+                logger.info(f"Loaded {directory.load_csv(path)} symbols from {path}")
+            except OSError as e:
+                logger.error(f"Could not load symbol listing {path}: {str(e)}")
+            directory.add_aliases(COMMON_ALIASES)
+            _shared_directory = directory
+        return _shared_directory
+
+
+def get_symbol_extractor():
+    """Return the process-wide symbol extractor, so hit rates cover every service"""
+    global _shared_extractor
+    directory = get_symbol_directory()
+    with _shared_lock:
+        if _shared_extractor is None:
+            _shared_extractor = SymbolExtractor(directory)
+        return _shared_extractor
+
+
+def get_symbol_search_index():
+    """Return the process-wide search index, from the downloaded listing if there is one"""
+    global _shared_search_index
+    with _shared_lock:
+        if _shared_search_index is None:
+            index = SymbolSearchIndex()
+            for path in (os.getenv('SYMBOL_LISTING_CACHE_PATH', DEFAULT_LISTING_CACHE_PATH),
+                         os.getenv('SYMBOL_LISTING_PATH', DEFAULT_LISTING_PATH)):
+                try:
+                    logger.info(f"Loaded {index.load_csv(path)} searchable symbols from {path}")
+                    break
+                except OSError:
+                    continue
+            _shared_search_index = index
+        return _shared_search_index
@@ -0,0 +1,32 @@
+from answer_cache import AnswerCache, normalize_query
+
+
+def test_normalize_query():
+    assert normalize_query("What's Apple's P/E?") == 'what is apple p/e'
+
+
+def cache():
+    return AnswerCache(ttl=60, max_entries=10, similarity=0.6)
+
+
+def test_reworded_question_reuses_the_answer():
+    answers = cache()
+    answers.set('How is Apple doing today?', 'AAPL 190', 'Fine')
+    assert answers.get('how is apple doing today', 'AAPL 190') == 'Fine'
+    assert answers.get('How is Apple doing today overall?', 'AAPL 190') == 'Fine'
+    assert answers.stats()['near_hits'] == 1
+
+
+def test_changed_context_misses():
+    answers = cache()
+    answers.set('How is Apple doing today?', 'AAPL 190', 'Fine')
+    assert answers.get('How is Apple doing today?', 'AAPL 185') is None
+
+
+def test_polarity_and_numbers_must_match():
+    answers = cache()
+    answers.set('Is Apple a buy at 190 in 2024?', 'AAPL 190', 'Yes')
+    assert answers.get('Is Apple a sell at 190 in 2024?', 'AAPL 190') is None
+    assert answers.get('Is Apple a buy at 190 in 2025?', 'AAPL 190') is None
+    assert answers.get('Is Apple a buy at 200 in 2024?', 'AAPL 190') is None
+    assert answers.get('So is Apple a buy at 190 in 2024?', 'AAPL 190') == 'Yes'
@@ -0,0 +1,70 @@
+import numpy as np
+import pytest
+
+from backtest import BacktestError, _sweep, evaluate, parameter_grid, strategy_positions
+
+
+def random_closes(symbols=3, bars=300, seed=0):
+    rng = np.random.default_rng(seed)
+    return 100 * np.exp(np.cumsum(rng.normal(0, 0.02, (symbols, bars)), axis=1))
+
+
+def loop_ma_crossover(close, fast, slow):
+    """Reference MA crossover for one symbol, one bar at a time"""
+    equity, position, fast_sum, slow_sum = 1.0, 0.0, 0.0, 0.0
+    for bar in range(len(close)):
+        if bar:
+            equity *= 1 + position * (close[bar] / close[bar - 1] - 1)
+        fast_sum += close[bar] - (close[bar - fast] if bar >= fast else 0.0)
+        slow_sum += close[bar] - (close[bar - slow] if bar >= slow else 0.0)
+        position = 1.0 if bar >= slow - 1 and fast_sum / fast > slow_sum / slow else 0.0
+    return equity
+
+
+def test_parameter_grid_drops_invalid_combinations():
+    grid = parameter_grid('ma_crossover', {'fast': [10, 50], 'slow': [20, 50]})
+    assert grid == [{'fast': 10, 'slow': 20}, {'fast': 10, 'slow': 50}]
+
+
+@pytest.mark.parametrize('strategy, params', [
+    ('sma_cross', None),
+    ('momentum', {'window': 20}),
+    ('momentum', {'lookback': 'long'}),
+    ('ma_crossover', {'fast': 50, 'slow': 10}),
+])
+def test_parameter_grid_rejects_bad_requests(strategy, params):
+    with pytest.raises(BacktestError):
+        parameter_grid(strategy, params)
+
+
+def test_ma_crossover_matches_a_per_bar_loop():
+    closes = random_closes()
+    grid = parameter_grid('ma_crossover', {'fast': [5, 10], 'slow': [20, 50]})
+    results = _sweep(closes, 0, 'ma_crossover', grid, 0.0, False)
+    expected = [[loop_ma_crossover(close, **params) - 1 for close in closes] for params in grid]
+    np.testing.assert_allclose(results['total_return'], expected)
+
+
+def test_buy_and_hold_metrics():
+    closes = np.array([[100.0, 110.0, 99.0, 121.0]])
+    result = evaluate(np.ones((1, 4)), closes, equity=True)
+    np.testing.assert_allclose(result['equity'][0], [1.0, 1.1, 0.99, 1.21])
+    assert result['total_return'][0] == pytest.approx(0.21)
+    assert result['max_drawdown'][0] == pytest.approx(0.99 / 1.1 - 1)
+    assert result['trades'][0] == 1
+    assert result['exposure'][0] == 1
+
+
+def test_costs_are_charged_per_trade():
+    closes = np.full((1, 5), 100.0)
+    positions = np.array([[1.0, 0.0, 1.0, 1.0, 0.0]])
+    result = evaluate(positions, closes, cost=0.01)
+    assert result['trades'][0] == 4
+    assert result['total_return'][0] == pytest.approx(0.99 ** 4 - 1)
+
+
+def test_positions_only_short_when_allowed():
+    closes = random_closes(symbols=1, bars=200)
+    grid = parameter_grid('momentum', {'lookback': 20})
+    assert strategy_positions('momentum', closes, grid).min() == 0
+    assert strategy_positions('momentum', closes, grid, allow_short=True).min() == -1
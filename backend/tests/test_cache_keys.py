@@ -0,0 +1,28 @@
+from alpha_vantage_service import _cache_key_parts
+from response_cache import ResponseCache
+
+
+def test_symbol_case_and_api_key_do_not_split_entries():
+    lower = _cache_key_parts({'function': 'GLOBAL_QUOTE', 'symbol': 'aapl', 'apikey': 'one'})
+    upper = _cache_key_parts({'function': 'GLOBAL_QUOTE', 'symbol': 'AAPL', 'apikey': 'two'})
+    assert lower == upper == ('GLOBAL_QUOTE', 'AAPL', {})
+
+
+def test_tickers_and_keywords_are_case_folded():
+    for param in ('tickers', 'keywords'):
+        lower = _cache_key_parts({'function': 'NEWS_SENTIMENT', param: 'aapl', 'apikey': 'demo'})
+        upper = _cache_key_parts({'function': 'NEWS_SENTIMENT', param: 'AAPL', 'apikey': 'demo'})
+        assert lower == upper
+        assert lower[1] == 'AAPL'
+
+
+def test_other_params_stay_in_the_key():
+    daily = _cache_key_parts({'function': 'TIME_SERIES_DAILY', 'symbol': 'AAPL', 'outputsize': 'compact'})
+    full = _cache_key_parts({'function': 'TIME_SERIES_DAILY', 'symbol': 'AAPL', 'outputsize': 'full'})
+    assert daily != full
+
+
+def test_case_folded_params_hit_the_same_cache_entry():
+    cache = ResponseCache()
+    cache.set(*_cache_key_parts({'function': 'NEWS_SENTIMENT', 'tickers': 'msft'}), {'feed': []})
+    assert cache.get(*_cache_key_parts({'function': 'NEWS_SENTIMENT', 'tickers': 'MSFT'})) == {'feed': []}
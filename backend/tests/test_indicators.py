@@ -0,0 +1,37 @@
+import numpy as np
+import pytest
+
+from indicators import IndicatorService, sma
+from price_store import PriceHistoryStore
+
+
+@pytest.fixture
+def service(tmp_path):
+    store = PriceHistoryStore(str(tmp_path), refresh_interval=0)
+    dates = np.arange(np.datetime64('2024-01-01'), np.datetime64('2024-03-01'))
+    close = np.linspace(100.0, 159.0, len(dates))
+    store.save('av', 'AAPL', dates, np.column_stack([close, close + 1, close - 1, close, np.full(len(dates), 1e6)]))
+    return IndicatorService(store)
+
+
+def failing_fetcher(symbol, since):
+    raise RuntimeError('rate limited')
+
+
+def test_sma_matches_a_rolling_mean():
+    close = np.arange(1.0, 11.0)
+    values = sma(close, 3)
+    assert np.isnan(values[:2]).all()
+    np.testing.assert_allclose(values[2:], [np.mean(close[i - 2:i + 1]) for i in range(2, 10)])
+
+
+def test_stored_bars_answer_when_the_refresh_fails(service):
+    result = service.get_indicators('av', 'AAPL', failing_fetcher, names=['sma'], days=5)
+    assert result['dates'][-1] == '2024-02-29'
+    assert len(result['indicators']['sma_20']) == 5
+
+
+@pytest.mark.parametrize('days, expected', [(0, 1), (-3, 1), (1000, 60)])
+def test_days_is_clamped_to_the_stored_bars(service, days, expected):
+    result = service.get_indicators('av', 'AAPL', failing_fetcher, names=['drawdown'], days=days)
+    assert len(result['dates']) == len(result['indicators']['drawdown']) == expected
@@ -0,0 +1,68 @@
+from collections import Counter
+from datetime import datetime, timezone
+
+from prefetch import PrefetchScheduler
+from rate_limiter import TokenBucket
+from response_cache import ResponseCache
+
+# Wednesday 2024-01-03, 10:00 in New York
+MARKET_HOURS = datetime(2024, 1, 3, 15, 0, tzinfo=timezone.utc).timestamp()
+
+
+class StubStore:
+    refresh_interval = 3600
+
+    def __init__(self, calls):
+        self.calls = calls
+
+    def update(self, source, symbol, fetcher):
+        self.calls['history'] += 1
+
+
+class StubService:
+    def __init__(self):
+        self.limiter = TokenBucket('test', rate_per_minute=6000, capacity=1000)
+        self.cache = ResponseCache()
+        self.calls = Counter()
+        self.price_store = StubStore(self.calls)
+
+    def get_stock_quote(self, symbol, refresh=False):
+        self.calls['quote'] += 1
+
+    def get_company_overview(self, symbol, refresh=False):
+        self.calls['overview'] += 1
+
+    def get_news_sentiment(self, tickers=None, refresh=False):
+        self.calls['news'] += 1
+
+    def fetch_daily_bars(self, symbol, since=None):
+        pass
+
+
+def run_minutes(scheduler, minutes, start=MARKET_HOURS):
+    for second in range(minutes * 60):
+        scheduler.run_pending(now=start + second)
+
+
+def test_prefetch_is_opt_in():
+    assert not PrefetchScheduler(StubService(), watchlist=['AAPL'], enabled=False).enabled
+    assert PrefetchScheduler(StubService(), watchlist=['AAPL'], enabled=True).enabled
+
+
+def test_one_request_does_not_spend_the_quota_on_quotes():
+    service = StubService()
+    scheduler = PrefetchScheduler(service, watchlist=[], top_n=5, enabled=True, daily_calls=1000)
+    scheduler.record_request('AAPL')
+    run_minutes(scheduler, 10)
+    # Quotes at most every 300s, news at 0.8 of its 5 minute TTL
+    assert service.calls == Counter(quote=2, overview=1, news=3, history=1)
+
+
+def test_daily_call_budget():
+    service = StubService()
+    scheduler = PrefetchScheduler(service, watchlist=['AAPL', 'MSFT'], enabled=True, daily_calls=5)
+    run_minutes(scheduler, 30)
+    assert sum(service.calls.values()) == 5
+    assert scheduler.stats()['deferred'] > 0
+    run_minutes(scheduler, 1, start=MARKET_HOURS + 86400)
+    assert sum(service.calls.values()) > 5
@@ -0,0 +1,87 @@
+import numpy as np
+import pytest
+
+from alpha_vantage_service import AlphaVantageService
+from price_store import PriceHistoryStore, empty_bars
+from response_cache import ResponseCache
+
+RATE_LIMIT_NOTE = {'Note': 'Thank you for using Alpha Vantage! Our standard API call frequency is 5 calls per minute.'}
+PREMIUM_NOTE = {'Information': 'Thank you for using Alpha Vantage! The outputsize=full parameter value is a premium '
+                               'feature for the TIME_SERIES_DAILY endpoint.'}
+
+
+def bars(*days):
+    dates = np.array(days, dtype='datetime64[D]')
+    return dates, np.tile(np.arange(1.0, 6.0), (len(dates), 1))
+
+
+class Fetcher:
+    def __init__(self, *results):
+        self.results = list(results)
+        self.calls = []
+
+    def __call__(self, symbol, since):
+        self.calls.append(since)
+        result = self.results.pop(0)
+        if isinstance(result, Exception):
+            raise result
+        return result
+
+
+def test_update_merges_only_new_bars(tmp_path):
+    store = PriceHistoryStore(str(tmp_path), refresh_interval=0)
+    fetcher = Fetcher(bars('2024-01-02', '2024-01-03'), bars('2024-01-03', '2024-01-04'))
+    store.update('av', 'AAPL', fetcher)
+    dates, _ = store.update('av', 'aapl', fetcher)
+    assert fetcher.calls[1] == np.datetime64('2024-01-03')
+    assert list(dates.astype(str)) == ['2024-01-02', '2024-01-03', '2024-01-04']
+
+
+def test_no_new_bars_counts_as_a_check(tmp_path):
+    store = PriceHistoryStore(str(tmp_path), refresh_interval=3600)
+    fetcher = Fetcher(bars('2024-01-02'), empty_bars())
+    store.update('av', 'AAPL', fetcher)
+    store.update('av', 'AAPL', fetcher, force=True)
+    store.update('av', 'AAPL', fetcher)
+    assert len(fetcher.calls) == 2
+
+
+def test_failed_refresh_is_retried_next_time(tmp_path):
+    store = PriceHistoryStore(str(tmp_path), refresh_interval=3600)
+    fetcher = Fetcher(bars('2024-01-02'), RuntimeError('rate limited'), bars('2024-01-03'))
+    store.update('av', 'AAPL', fetcher)
+    store._write_checked_at('av', 'AAPL', 0.0)
+
+    dates, _ = store.get_bars('av', 'AAPL', fetcher)
+    assert len(dates) == 1
+    dates, _ = store.get_bars('av', 'AAPL', fetcher)
+    assert len(fetcher.calls) == 3
+    assert len(dates) == 2
+
+
+@pytest.fixture
+def service(tmp_path):
+    return AlphaVantageService(cache=ResponseCache(), price_store=PriceHistoryStore(str(tmp_path)))
+
+
+def test_rate_limited_history_raises_without_a_compact_retry(service, monkeypatch):
+    calls = []
+    monkeypatch.setattr(service, '_query', lambda params, expected_key: calls.append(dict(params)) or RATE_LIMIT_NOTE)
+    with pytest.raises(RuntimeError):
+        service.fetch_daily_bars('AAPL')
+    assert [params['outputsize'] for params in calls] == ['full']
+
+
+def test_premium_only_full_history_falls_back_to_compact(service, monkeypatch):
+    series = {'Time Series (Daily)': {'2024-01-02': {'1. open': '1', '2. high': '2', '3. low': '0.5',
+                                                     '4. close': '1.5', '5. volume': '100'}}}
+    calls = []
+
+    def query(params, expected_key):
+        calls.append(params['outputsize'])
+        return PREMIUM_NOTE if params['outputsize'] == 'full' else series
+
+    monkeypatch.setattr(service, '_query', query)
+    dates, ohlcv = service.fetch_daily_bars('AAPL')
+    assert calls == ['full', 'compact']
+    assert list(dates.astype(str)) == ['2024-01-02'] and ohlcv[0, 3] == 1.5
@@ -0,0 +1,73 @@
+import asyncio
+
+from quote_stream import AsyncQueueSubscriber, QueueSubscriber, QuoteStreamHub, quote_delta
+
+
+def event(symbol, **fields):
+    return {'type': 'quote', 'symbol': symbol, 'quote': fields}
+
+
+def drain(subscriber):
+    events = []
+    while True:
+        item = subscriber.get(timeout=0.01)
+        if item is None:
+            return events
+        events.append(item)
+
+
+def test_quote_delta():
+    assert quote_delta(None, {'price': 1}) == {'price': 1}
+    assert quote_delta({'price': 1, 'volume': 5}, {'price': 2, 'volume': 5}) == {'price': 2}
+
+
+def test_full_queue_merges_deltas_instead_of_dropping_them():
+    subscriber = QueueSubscriber(maxsize=1)
+    subscriber(event('AAPL', price=1, volume=10))
+    subscriber(event('AAPL', price=2))
+    subscriber(event('MSFT', price=300))
+    subscriber(event('AAPL', change=0.5))
+
+    # Every field reaches the client, newest values last
+    assert drain(subscriber) == [
+        event('AAPL', price=1, volume=10),
+        event('AAPL', price=2, change=0.5),
+        event('MSFT', price=300)
+    ]
+
+
+def test_async_subscriber_merges_deltas_too():
+    async def main():
+        subscriber = AsyncQueueSubscriber(maxsize=1)
+        for item in (event('AAPL', price=1), event('AAPL', price=2), event('AAPL', volume=7)):
+            subscriber(item)
+        await asyncio.sleep(0)
+        return [await subscriber.get(0.01) for _ in range(3)]
+
+    assert asyncio.run(main()) == [event('AAPL', price=1), event('AAPL', price=2, volume=7), None]
+
+
+def test_hub_polls_each_symbol_once_for_all_subscribers():
+    polls = []
+    prices = iter([100.0, 100.0, 101.0])
+
+    def fetch_quotes(symbols):
+        polls.append(list(symbols))
+        price = next(prices)
+        return {symbol: {'symbol': symbol, 'current_price': price, 'volume': 10} for symbol in symbols}
+
+    hub = QuoteStreamHub(fetch_quotes, interval=3600)
+    hub._ensure_running = lambda: None
+    first, second = QueueSubscriber(), QueueSubscriber()
+    hub.subscribe(['aapl'], first)
+    hub.subscribe(['AAPL'], second)
+
+    hub.poll_once()
+    hub.poll_once()
+    hub.poll_once()
+    assert polls == [['AAPL']] * 3
+    for subscriber in (first, second):
+        assert [item['quote'] for item in drain(subscriber)] == [
+            {'symbol': 'AAPL', 'current_price': 100.0, 'volume': 10},
+            {'current_price': 101.0}
+        ]
@@ -0,0 +1,73 @@
+import pytest
+
+import rate_limiter
+from rate_limiter import FileTokenBucket, RateLimitExceeded, TokenBucket, retry_on_rate_limit
+
+
+def test_bucket_starts_full_and_spends_down():
+    bucket = TokenBucket('test', rate_per_minute=60, capacity=3)
+    assert [bucket.try_acquire() for _ in range(4)] == [True, True, True, False]
+
+
+def test_reserve_queues_callers_in_arrival_order():
+    bucket = TokenBucket('test', rate_per_minute=60, capacity=1)
+    assert bucket.reserve() == 0
+    first, second = bucket.reserve(), bucket.reserve()
+    assert first == pytest.approx(1, abs=0.05)
+    assert second == pytest.approx(2, abs=0.05)
+
+
+def test_acquire_past_timeout_raises_and_refunds():
+    bucket = TokenBucket('test', rate_per_minute=6, capacity=1)
+    bucket.acquire()
+    with pytest.raises(RateLimitExceeded):
+        bucket.acquire(timeout=1)
+    # The refused caller gave its token back, so the queue didn't grow
+    assert bucket.available() > -0.1
+
+
+def test_backoff_blocks_every_caller():
+    bucket = TokenBucket('test', rate_per_minute=60, capacity=5)
+    bucket.backoff(30)
+    assert not bucket.try_acquire()
+    assert bucket.reserve() == pytest.approx(30, abs=0.5)
+
+
+def test_file_buckets_share_one_budget(tmp_path):
+    first = FileTokenBucket('shared', rate_per_minute=60, capacity=2, directory=str(tmp_path))
+    second = FileTokenBucket('shared', rate_per_minute=60, capacity=2, directory=str(tmp_path))
+    assert first.try_acquire() and second.try_acquire()
+    assert not first.try_acquire()
+
+
+def test_retry_on_rate_limit_spends_one_token_per_attempt(monkeypatch):
+    bucket = TokenBucket('test', rate_per_minute=60, capacity=10)
+    monkeypatch.setattr(rate_limiter, 'get_rate_limiter', lambda name: bucket)
+    monkeypatch.setattr(rate_limiter, 'jittered_backoff', lambda attempt, base_delay: 0.0)
+    calls = []
+
+    @retry_on_rate_limit('test', retries=3)
+    def fetch():
+        bucket.acquire()
+        calls.append(1)
+        if len(calls) < 3:
+            raise Exception('429 Client Error: Too Many Requests')
+        return 'ok'
+
+    assert fetch() == 'ok'
+    assert len(calls) == 3
+    assert bucket.available() == pytest.approx(7, abs=0.1)
+
+
+def test_retry_on_rate_limit_reraises_other_errors(monkeypatch):
+    monkeypatch.setattr(rate_limiter, 'get_rate_limiter', lambda name: TokenBucket('test', 60, 10))
+    calls = []
+
+    @retry_on_rate_limit('test')
+    def fetch():
+        calls.append(1)
+        raise ValueError('bad symbol')
+
+    with pytest.raises(ValueError):
+        fetch()
+    assert len(calls) == 1
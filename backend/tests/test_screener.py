@@ -0,0 +1,104 @@
+import pytest
+
+from screener import Screener, ScreenError, parse_screen_query
+
+
+@pytest.mark.parametrize('query', [
+    'How are bank stocks like JPM and BAC doing?',
+    'Compare NVDA and AMD, both chip stocks',
+    'Should I sell my Apple shares at a price over 200?',
+    'Is MSFT trading above 400 shares?',
+    'What is the P/E of Apple?',
+])
+def test_questions_about_named_stocks_are_not_screens(query):
+    assert parse_screen_query(query) is None
+
+
+def test_sector_ratio_and_52_week_conditions():
+    params = parse_screen_query('tech stocks with P/E under 20 near their 52-week low')
+    assert params == {
+        'filters': {'sector': 'technology', 'pe_ratio_max': 20.0, 'from_52w_low_max': 0.1},
+        'sort': 'market_cap',
+        'order': 'desc'
+    }
+
+
+def test_units_and_percentages():
+    params = parse_screen_query('companies with market cap over $2 billion and dividend yield above 3%')
+    assert params['filters'] == {'market_cap_min': 2e9, 'dividend_yield_min': 0.03}
+
+
+def test_cap_size_and_sort_hint():
+    params = parse_screen_query('highest dividend small-cap stocks')
+    assert params['filters'] == {'market_cap_min': 300e6, 'market_cap_max': 2e9}
+    assert (params['sort'], params['order']) == ('dividend_yield', 'desc')
+
+
+def test_a_sector_alone_needs_a_list_request():
+    assert parse_screen_query('bank stocks are volatile') is None
+    assert parse_screen_query('which bank stocks should I look at?')['filters'] == {'sector': 'finance,financial'}
+
+
+class StubLimiter:
+    capacity = 10
+    waiting = 0
+
+    def available(self):
+        return 10
+
+
+class StubService:
+    limiter = StubLimiter()
+
+    def __init__(self):
+        self.calls = 0
+
+    def get_stock_quote(self, symbol):
+        self.calls += 1
+        return {'current_price': 10.0 * (ord(symbol[0]) - 64), 'volume': 1000}
+
+    def get_company_overview(self, symbol):
+        self.calls += 1
+        return {'sector': 'TECHNOLOGY' if symbol < 'C' else 'ENERGY', 'pe_ratio': 15.0, 'market_cap': 1e9}
+
+
+@pytest.fixture
+def screener(tmp_path):
+    return Screener(path=str(tmp_path / 'snapshot.npz'), universe=['A', 'B', 'C', 'D'], reserve=0,
+                    enabled=True, daily_calls=100)
+
+
+def test_refresh_builds_a_screenable_snapshot(screener):
+    assert screener.run_pending(StubService(), now=1000) == 8
+    result = screener.screen({'sector': 'tech', 'price_min': 15}, sort='price')
+    assert [row['symbol'] for row in result['results']] == ['B']
+    assert result['total'] == 4
+
+
+def test_snapshot_is_reloaded_from_disk(screener, tmp_path):
+    screener.run_pending(StubService(), now=1000)
+    reloaded = Screener(path=screener.path, universe=[])
+    assert len(reloaded.snapshot) == 4
+
+
+def test_daily_call_budget(screener):
+    screener.daily_calls = 3
+    service = StubService()
+    screener.run_pending(service, now=1000)
+    assert service.calls == 3
+    # Nothing more the same day, a fresh budget the next
+    screener.run_pending(service, now=2000)
+    assert service.calls == 3
+    screener.run_pending(service, now=1000 + 86400)
+    assert service.calls == 6
+
+
+def test_refresh_is_opt_in(tmp_path):
+    screener = Screener(path=str(tmp_path / 'snapshot.npz'), universe=['A'], enabled=False)
+    screener.start_refresh(StubService())
+    assert not screener.stats()['refreshing']
+
+
+def test_rejects_unknown_sort(screener):
+    with pytest.raises(ScreenError):
+        screener.screen(sort='name')
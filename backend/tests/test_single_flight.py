@@ -0,0 +1,116 @@
+import asyncio
+import threading
+import time
+
+import pytest
+
+from single_flight import AsyncSingleFlight, SingleFlight
+
+
+def wait_until(condition, timeout=5):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, 'timed out'
+        time.sleep(0.001)
+
+
+def test_concurrent_calls_share_one_execution():
+    flight = SingleFlight('test')
+    release = threading.Event()
+    calls = []
+
+    def fetch():
+        calls.append(1)
+        release.wait(5)
+        return 'quote'
+
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(flight.do('AAPL', fetch))) for _ in range(5)]
+    for thread in threads:
+        thread.start()
+    wait_until(lambda: flight.stats()['coalesced'] == 4)
+    release.set()
+    for thread in threads:
+        thread.join()
+
+    assert results == ['quote'] * 5
+    assert len(calls) == 1
+    assert flight.stats() == {'executed': 1, 'coalesced': 4, 'in_flight': 0}
+
+
+def test_followers_receive_the_leaders_exception():
+    flight = SingleFlight('test')
+    release = threading.Event()
+
+    def fetch():
+        release.wait(5)
+        raise RuntimeError('upstream down')
+
+    errors = []
+
+    def call():
+        try:
+            flight.do('AAPL', fetch)
+        except RuntimeError as e:
+            errors.append(str(e))
+
+    threads = [threading.Thread(target=call) for _ in range(3)]
+    for thread in threads:
+        thread.start()
+    wait_until(lambda: flight.stats()['coalesced'] == 2)
+    release.set()
+    for thread in threads:
+        thread.join()
+    assert errors == ['upstream down'] * 3
+
+
+def test_async_calls_share_one_execution():
+    flight = AsyncSingleFlight('test')
+    calls = []
+
+    async def fetch():
+        calls.append(1)
+        await asyncio.sleep(0.01)
+        return 'quote'
+
+    async def main():
+        return await asyncio.gather(*(flight.do('AAPL', fetch) for _ in range(5)))
+
+    assert asyncio.run(main()) == ['quote'] * 5
+    assert len(calls) == 1
+    assert flight.in_flight() == 0
+
+
+def test_cancelled_leader_does_not_cancel_followers():
+    flight = AsyncSingleFlight('test')
+
+    async def fetch():
+        await asyncio.sleep(0.05)
+        return 'quote'
+
+    async def main():
+        leader = asyncio.create_task(flight.do('AAPL', fetch))
+        await asyncio.sleep(0)
+        follower = asyncio.create_task(flight.do('AAPL', fetch))
+        await asyncio.sleep(0.01)
+        leader.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await leader
+        return await follower
+
+    assert asyncio.run(main()) == 'quote'
+    assert flight.stats() == {'executed': 1, 'coalesced': 1, 'in_flight': 0}
+
+
+def test_async_followers_receive_the_exception():
+    flight = AsyncSingleFlight('test')
+
+    async def fetch():
+        await asyncio.sleep(0.01)
+        raise RuntimeError('upstream down')
+
+    async def main():
+        return await asyncio.gather(*(flight.do('AAPL', fetch) for _ in range(3)), return_exceptions=True)
+
+    results = asyncio.run(main())
+    assert [str(result) for result in results] == ['upstream down'] * 3
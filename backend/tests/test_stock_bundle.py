@@ -0,0 +1,95 @@
+import time
+from urllib.parse import parse_qs, urlparse
+
+import pytest
+
+import metrics
+from alpha_vantage_service import AlphaVantageService
+from benchmarks.stub_upstreams import AlphaVantageHandler, StubConfig, start_stub
+from price_store import PriceHistoryStore
+from rate_limiter import TokenBucket
+from response_cache import ResponseCache
+
+# Seconds the stub takes to answer each bundle part
+LATENCY = {'GLOBAL_QUOTE': 0.1, 'OVERVIEW': 0.2, 'TIME_SERIES_DAILY': 0.3, 'NEWS_SENTIMENT': 0.4}
+
+
+class SlowHandler(AlphaVantageHandler):
+    latency = LATENCY
+
+    def do_GET(self):
+        function = parse_qs(urlparse(self.path).query).get('function', [''])[0]
+        time.sleep(self.latency.get(function, 0))
+        super().do_GET()
+
+
+@pytest.fixture
+def stub():
+    server = start_stub(SlowHandler, StubConfig(latency=0))
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def service(stub, tmp_path, monkeypatch):
+    monkeypatch.setenv('ALPHA_VANTAGE_BASE_URL', f'http://127.0.0.1:{stub.server_port}/query')
+    monkeypatch.setenv('ALPHA_VANTAGE_MAX_WORKERS', '4')
+    service = AlphaVantageService(cache=ResponseCache(), price_store=PriceHistoryStore(str(tmp_path)))
+    service.limiter = TokenBucket('test', rate_per_minute=600, capacity=100)
+    yield service
+    service.executor.shutdown(wait=False)
+
+
+def test_bundle_takes_as_long_as_the_slowest_part(service):
+    started = time.monotonic()
+    bundle = service.get_stock_bundle('AAPL')
+    elapsed = time.monotonic() - started
+
+    assert bundle['errors'] == []
+    assert bundle['quote']['symbol'] == 'AAPL'
+    assert bundle['overview'] is not None
+    assert len(bundle['time_series']['prices']) == 252
+    assert bundle['news']
+    # The parts run together: about the 0.4s news call, well under the 1.0s sum
+    assert 0.4 <= elapsed < 0.8
+
+
+def test_timed_out_part_falls_back_to_its_empty_value(service):
+    started = time.monotonic()
+    bundle = service.get_stock_bundle('AAPL', timeouts={'news': 0.15})
+    elapsed = time.monotonic() - started
+
+    assert bundle['errors'] == ['news']
+    assert bundle['news'] == []
+    assert bundle['quote']['symbol'] == 'AAPL'
+    assert elapsed < 0.4
+
+
+def test_parts_stop_waiting_for_tokens_at_their_deadline(service):
+    # The next token is 10s away: inside max_wait(), far past each part's deadline
+    service.limiter = TokenBucket('test', rate_per_minute=6, capacity=1)
+    service.limiter.acquire()
+
+    started = time.monotonic()
+    bundle = service.get_stock_bundle('MSFT', timeouts={part: 0.2 for part in ('quote', 'overview', 'time_series', 'news')})
+    # Each method turns the refused token into its empty result
+    assert bundle['quote'] is None and bundle['overview'] is None and bundle['news'] == []
+    assert len(bundle['time_series']['prices']) == 0
+    assert time.monotonic() - started < 0.5
+    # No part is still queued on the limiter holding one of the four pool threads
+    assert service.limiter.waiting == 0
+    assert service.executor.submit(lambda: 'free').result(timeout=0.5) == 'free'
+
+
+def test_fan_outs_record_server_timing(service, monkeypatch):
+    monkeypatch.setattr(metrics, 'SERVER_TIMING_ENABLED', True)
+    token = metrics.start_request_timing()
+    try:
+        service.get_stock_quotes(['AAPL', 'MSFT'])
+        service.get_stock_summaries(['NVDA'])
+        header = metrics.server_timing_header(1.0)
+    finally:
+        metrics.end_request_timing(token)
+    assert 'GLOBAL_QUOTE' in header and 'desc="3 calls"' in header
+    assert 'OVERVIEW' in header and 'NEWS_SENTIMENT' in header
@@ -0,0 +1,171 @@
+import logging
+import numpy as np
+import pandas as pd
+import yfinance as yf
+from http_session import get_http_session
+from metrics import track_upstream
+from price_history import INTRADAY_INTERVALS, build_history
+from price_store import CLOSE, empty_bars, get_price_store
+from rate_limiter import get_rate_limiter, max_wait, retry_on_rate_limit
+from single_flight import get_single_flight
+
+logger = logging.getLogger(__name__)
+
+class YFinanceService:
+    # History requested for a symbol the price store has never seen
+    INITIAL_HISTORY_PERIOD = '10y'
+    
+    def __init__(self, session=None, price_store=None):
+        self.session = session if session is not None else get_http_session()
+        self.price_store = price_store if price_store is not None else get_price_store()
+        self.limiter = get_rate_limiter('yahoo')
+        self.flight = get_single_flight('yahoo')
+    
+    def _throttle(self):
+        """Wait for a Yahoo request token; returns immediately while under quota"""
+        self.limiter.acquire(timeout=max_wait())
+    
+    def get_stock_data(self, symbol):
+        """Get quote, fundamentals, news, recommendations and 1y history from Yahoo Finance"""
+        # Concurrent requests for the same symbol wait on one set of Yahoo calls
+        return self.flight.do(('stock_data', symbol.upper()), self._fetch_stock_data, symbol)
+    
+    @retry_on_rate_limit('yahoo')
+    def _fetch_stock_data(self, symbol):
+        # Reuse the pooled keep-alive session instead of a fresh handshake per request
+        ticker = yf.Ticker(symbol, session=self.session)
+        
+        self._throttle()
+        with track_upstream('yahoo', 'info'):
+            info = ticker.info
+        price_history = self.price_store.get_price_history('yf', symbol, self.fetch_daily_bars)
+        
+        try:
+            self._throttle()
+            with track_upstream('yahoo', 'news'):
+                news = ticker.news
+        except:
+            news = []
+            
+        try:
+            self._throttle()
+            with track_upstream('yahoo', 'recommendations'):
+                recommendations = ticker.recommendations
+        except:
+            recommendations = None
+        
+        current_price = price_history['prices'][-1] if len(price_history['prices']) else None
+        
+        return {
+            'symbol': symbol.upper(),
+            'current_price': float(current_price) if current_price else None,
+            'company_name': info.get('longName', symbol.upper()),
+            'market_cap': info.get('marketCap'),
+            'pe_ratio': info.get('trailingPE'),
+            'dividend_yield': info.get('dividendYield'),
+            'volume': info.get('volume'),
+            'day_high': info.get('dayHigh'),
+            'day_low': info.get('dayLow'),
+            'fifty_two_week_high': info.get('fiftyTwoWeekHigh'),
+            'fifty_two_week_low': info.get('fiftyTwoWeekLow'),
+            'sector': info.get('sector'),
+            'industry': info.get('industry'),
+            'summary': info.get('longBusinessSummary'),
+            'news': news[:5] if news else [],
+            'recommendations': recommendations.to_dict('records') if recommendations is not None and not recommendations.empty else [],
+            'price_history': price_history
+        }
+    
+    def get_price_history(self, symbol, range_='1y', interval='1d', points=None):
+        """Closes over range_ at interval, LTTB-downsampled to at most `points` bars"""
+        if interval in INTRADAY_INTERVALS:
+            dates, closes = self.flight.do(('intraday', symbol.upper(), range_, interval),
+                                           self.fetch_intraday_closes, symbol, range_, interval)
+        else:
+            dates, ohlcv = self.price_store.get_bars('yf', symbol, self.fetch_daily_bars)
+            closes = ohlcv[:, CLOSE]
+        return build_history(dates, closes, range_, interval, points)
+    
+    @retry_on_rate_limit('yahoo')
+    def fetch_intraday_closes(self, symbol, range_, interval):
+        """Intraday closes for a short range as (exchange-local timestamps, closes)"""
+        ticker = yf.Ticker(symbol, session=self.session)
+        self._throttle()
+        with track_upstream('yahoo', 'intraday'):
+            history = ticker.history(period=range_, interval=interval)
+        if history.empty:
+            return np.empty(0, dtype='datetime64[m]'), np.empty(0)
+        
+        timestamps = history.index.tz_localize(None).values.astype('datetime64[m]')
+        return timestamps, history['Close'].to_numpy(dtype=np.float64)
+    
+    def fetch_daily_bars(self, symbol, since=None):
+        """Fetch daily OHLCV bars on or after `since` as (dates, ohlcv) arrays"""
+        ticker = yf.Ticker(symbol, session=self.session)
+        self._throttle()
+        with track_upstream('yahoo', 'history'):
+            if since is None:
+                history = ticker.history(period=self.INITIAL_HISTORY_PERIOD)
+            else:
+                history = ticker.history(start=str(since))
+        
+        if history.empty:
+            return empty_bars()
+        
+        dates = history.index.tz_localize(None).values.astype('datetime64[D]')
+        ohlcv = history[['Open', 'High', 'Low', 'Close', 'Volume']].to_numpy(dtype=np.float64)
+        return dates, ohlcv
+    
+    def get_quotes(self, symbols):
+        """Get latest quotes for many symbols with bulk yfinance downloads.
+
+        Returns a dict of symbol -> quote in the same shape as
+        AlphaVantageService.get_stock_quote, or None for symbols with no data.
+        """
+        symbols = [symbol.upper() for symbol in symbols]
+        # download() issues one history request per ticker, so charge a token per
+        # symbol, in batches no larger than the bucket so each batch can be paid for
+        batch_size = max(1, int(self.limiter.capacity))
+        quotes = {}
+        for start in range(0, len(symbols), batch_size):
+            quotes.update(self._download_quotes(symbols[start:start + batch_size]))
+        return quotes
+    
+    @retry_on_rate_limit('yahoo')
+    def _download_quotes(self, symbols):
+        self.limiter.acquire(tokens=len(symbols), timeout=max_wait())
+        with track_upstream('yahoo', 'download'):
+            frame = yf.download(symbols, period='5d', interval='1d', group_by='ticker',
+                                threads=True, progress=False, session=self.session)
+        
+        quotes = {}
+        for symbol in symbols:
+            if isinstance(frame.columns, pd.MultiIndex):
+                history = frame[symbol] if symbol in frame.columns.get_level_values(0) else None
+            else:
+                history = frame
+            quotes[symbol] = self._quote_from_history(symbol, history)
+        return quotes
+    
+    def _quote_from_history(self, symbol, history):
+        if history is None:
+            return None
+        history = history.dropna(subset=['Close'])
+        if history.empty:
+            return None
+        
+        last = history.iloc[-1]
+        previous_close = float(history['Close'].iloc[-2]) if len(history) > 1 else float(last['Open'])
+        change = float(last['Close']) - previous_close
+        return {
+            'symbol': symbol,
+            'current_price': float(last['Close']),
+            'change': change,
+            'change_percent': f"{(change / previous_close * 100) if previous_close else 0:.4f}%",
+            'volume': int(last['Volume']),
+            'latest_trading_day': str(history.index[-1].date()),
+            'previous_close': previous_close,
+            'open': float(last['Open']),
+            'high': float(last['High']),
+            'low': float(last['Low'])
+        }
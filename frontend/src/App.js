@@ -1,7 +1,8 @@
-import React, { useState } from 'react';
+import React, { useState, useEffect } from 'react';
 import SearchBar from './components/SearchBar';
 import StockDisplay from './components/StockDisplay';
 import NLPQuery from './components/NLPQuery';
+import { decodePriceHistory } from './priceHistory';
 import './App.css';
 
 function App() {
@@ -9,24 +10,52 @@ function App() {
   const [loading, setLoading] = useState(false);
   const [error, setError] = useState(null);
 
+  const liveSymbol = stockData ? stockData.symbol : null;
+
+  // Keep the displayed quote fresh from the server's quote stream instead of re-fetching everything
+  useEffect(() => {
+    if (!liveSymbol) return undefined;
+
+    const source = new EventSource(`/api/stream/quotes?symbols=${encodeURIComponent(liveSymbol)}`);
+    source.addEventListener('quote', (event) => {
+      const { quote } = JSON.parse(event.data);
+      setStockData((current) => {
+        if (!current || current.symbol !== liveSymbol) return current;
+        const updated = { ...current };
+        if (quote.current_price !== undefined) updated.current_price = quote.current_price;
+        if (quote.change !== undefined) updated.change = quote.change;
+        if (quote.change_percent !== undefined) updated.change_percent = quote.change_percent;
+        if (quote.volume !== undefined) updated.volume = quote.volume;
+        if (quote.high !== undefined) updated.day_high = quote.high;
+        if (quote.low !== undefined) updated.day_low = quote.low;
+        if (quote.open !== undefined) updated.open = quote.open;
+        if (quote.previous_close !== undefined) updated.previous_close = quote.previous_close;
+        return updated;
+      });
+    });
+
+    return () => source.close();
+  }, [liveSymbol]);
+
   const handleStockSelect = async (symbol) => {
     setLoading(true);
     setError(null);
     
     try {
-      // Try Alpha Vantage first, fall back to test data if needed
-      let response = await fetch(`/api/av-stock/${symbol}`);
+      // The server answers from Alpha Vantage or Yahoo Finance, whichever responds first
+      // Delta-encoded history is a fraction of the size of plain JSON arrays
+      let response = await fetch(`/api/stock-data/${encodeURIComponent(symbol)}?history_format=delta`);
       
       if (!response.ok) {
-        // Fall back to test endpoint
-        response = await fetch(`/api/test/${symbol}`);
+        // Every provider failed; fall back to demo data
+        response = await fetch(`/api/test/${encodeURIComponent(symbol)}`);
         if (!response.ok) {
           throw new Error('Failed to fetch stock data');
         }
       }
       
       const data = await response.json();
-      setStockData(data);
+      setStockData({ ...data, price_history: decodePriceHistory(data.price_history) });
     } catch (err) {
       setError(err.message);
       setStockData(null);
@@ -15,7 +15,8 @@ function NLPQuery({ onStockSelect }) {
     setResponse(null);
 
     try {
-      const res = await fetch('/api/nlp-query', {
+      // Stream the answer: the stock data arrives first, then the text as it is generated
+      const res = await fetch('/api/nlp-query/stream', {
         method: 'POST',
         headers: {
           'Content-Type': 'application/json',
@@ -23,17 +24,47 @@ function NLPQuery({ onStockSelect }) {
         body: JSON.stringify({ query: query.trim() }),
       });
 
-      const data = await res.json();
-
       if (!res.ok) {
+        const data = await res.json();
         throw new Error(data.error || 'Failed to process query');
       }
 
-      setResponse(data);
-
-      // If the query resulted in stock data, also load it in the main display
-      if (data.stock_data && data.stock_data.symbol && onStockSelect) {
-        onStockSelect(data.stock_data.symbol);
+      const reader = res.body.getReader();
+      const decoder = new TextDecoder();
+      let buffer = '';
+
+      const handleEvent = (event) => {
+        if (event.type === 'context') {
+          setResponse({ query: event.query, stock_data: event.stock_data, response: '', success: true });
+
+          // If the query resulted in stock data, also load it in the main display
+          if (event.stock_data && event.stock_data.symbol && onStockSelect) {
+            onStockSelect(event.stock_data.symbol);
+          }
+        } else if (event.type === 'delta') {
+          setResponse((current) => current && { ...current, response: current.response + event.text });
+        } else if (event.type === 'error') {
+          setError(event.error);
+        }
+      };
+
+      while (true) {
+        const { done, value } = await reader.read();
+        if (done) break;
+        buffer += decoder.decode(value, { stream: true });
+
+        // Server-Sent Events are separated by a blank line
+        let boundary;
+        while ((boundary = buffer.indexOf('\n\n')) !== -1) {
+          const message = buffer.slice(0, boundary);
+          buffer = buffer.slice(boundary + 2);
+          const data = message
+            .split('\n')
+            .filter((line) => line.startsWith('data: '))
+            .map((line) => line.slice(6))
+            .join('\n');
+          if (data) handleEvent(JSON.parse(data));
+        }
       }
 
     } catch (err) {
@@ -110,8 +141,8 @@ function NLPQuery({ onStockSelect }) {
         </div>
       </div>
 
-      {/* Loading state */}
-      {loading && (
+      {/* Loading state, until the streamed answer starts */}
+      {loading && !response && (
         <div className="flex items-center justify-center py-8">
           <div className="animate-spin rounded-full h-6 w-6 border-b-2 border-blue-600 mr-3"></div>
           <span className="text-gray-600">Claude is analyzing your query...</span>
@@ -154,6 +185,11 @@ function NLPQuery({ onStockSelect }) {
                   <p className="text-xs text-blue-600">
                     ✓ Stock data for {response.stock_data.symbol} loaded in main display
                   </p>
+                  {response.stock_data.symbols && response.stock_data.symbols.length > 1 && (
+                    <p className="text-xs text-blue-600">
+                      Analysis also used data for {response.stock_data.symbols.slice(1).join(', ')}
+                    </p>
+                  )}
                 </div>
               )}
             </div>
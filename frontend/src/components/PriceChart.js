@@ -1,4 +1,4 @@
-import React from 'react';
+import React, { useEffect, useState } from 'react';
 import {
   Chart as ChartJS,
   CategoryScale,
@@ -10,6 +10,7 @@ import {
   Legend,
 } from 'chart.js';
 import { Line } from 'react-chartjs-2';
+import { decodePriceHistory } from '../priceHistory';
 
 ChartJS.register(
   CategoryScale,
@@ -21,7 +22,56 @@ ChartJS.register(
   Legend
 );
 
-const PriceChart = ({ priceHistory }) => {
+const RANGES = [
+  { value: '1d', label: '1D' },
+  { value: '5d', label: '5D' },
+  { value: '1mo', label: '1M' },
+  { value: '6mo', label: '6M' },
+  { value: '1y', label: '1Y' },
+  { value: '5y', label: '5Y' },
+  { value: 'max', label: 'Max' },
+];
+const DEFAULT_RANGE = '1y';
+
+// The server downsamples long ranges to about this many points, so rendering stays fast
+const CHART_POINTS = 500;
+
+const PriceChart = ({ symbol, priceHistory }) => {
+  const [range, setRange] = useState(DEFAULT_RANGE);
+  const [rangeHistory, setRangeHistory] = useState(null);
+  const [loadingRange, setLoadingRange] = useState(false);
+
+  // A new symbol starts again from the one-year history that came with the stock data
+  useEffect(() => {
+    setRange(DEFAULT_RANGE);
+    setRangeHistory(null);
+  }, [symbol]);
+
+  useEffect(() => {
+    if (range === DEFAULT_RANGE || !symbol) return undefined;
+
+    let cancelled = false;
+    setLoadingRange(true);
+    fetch(`/api/history/${encodeURIComponent(symbol)}?range=${range}&points=${CHART_POINTS}&history_format=delta`)
+      .then((response) => (response.ok ? response.json() : Promise.reject(new Error('Failed to load history'))))
+      .then((data) => {
+        if (!cancelled) setRangeHistory(decodePriceHistory(data.price_history));
+      })
+      .catch((error) => {
+        console.error('History error:', error);
+        if (!cancelled) setRangeHistory(null);
+      })
+      .finally(() => {
+        if (!cancelled) setLoadingRange(false);
+      });
+
+    return () => {
+      cancelled = true;
+    };
+  }, [symbol, range]);
+
+  const history = range !== DEFAULT_RANGE && rangeHistory ? rangeHistory : priceHistory;
+
   const options = {
     responsive: true,
     maintainAspectRatio: false,
@@ -84,11 +134,11 @@ const PriceChart = ({ priceHistory }) => {
   };
 
   const data = {
-    labels: priceHistory.dates,
+    labels: history.dates,
     datasets: [
       {
         label: 'Price',
-        data: priceHistory.prices,
+        data: history.prices,
         borderColor: 'rgb(59, 130, 246)',
         backgroundColor: 'rgba(59, 130, 246, 0.1)',
         fill: true,
@@ -97,8 +147,25 @@ const PriceChart = ({ priceHistory }) => {
   };
 
   return (
-    <div className="h-80 w-full">
-      <Line options={options} data={data} />
+    <div>
+      <div className="flex gap-2 mb-3">
+        {RANGES.map(({ value, label }) => (
+          <button
+            key={value}
+            type="button"
+            onClick={() => setRange(value)}
+            disabled={loadingRange}
+            className={`text-xs px-3 py-1 rounded-full transition-colors ${
+              range === value ? 'bg-blue-600 text-white' : 'bg-gray-100 text-gray-700 hover:bg-gray-200'
+            }`}
+          >
+            {label}
+          </button>
+        ))}
+      </div>
+      <div className="h-80 w-full">
+        <Line options={options} data={data} />
+      </div>
     </div>
   );
 };
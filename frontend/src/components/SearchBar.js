@@ -14,7 +14,7 @@ const SearchBar = ({ onStockSelect }) => {
         setSearchResults([]);
         setShowResults(false);
       }
-    }, 300);
+    }, 150);
 
     return () => clearTimeout(delayedSearch);
   }, [query]);
@@ -22,12 +22,12 @@ const SearchBar = ({ onStockSelect }) => {
   const searchStocks = async (searchQuery) => {
     setSearching(true);
     try {
-      // Try Alpha Vantage search first
-      let response = await fetch(`/api/av-search/${searchQuery}`);
+      // Answered from the server's local symbol listing, so searching per keystroke is cheap
+      let response = await fetch(`/api/av-search/${encodeURIComponent(searchQuery)}`);
       
       if (!response.ok) {
         // Fall back to original search if available
-        response = await fetch(`/api/search/${searchQuery}`);
+        response = await fetch(`/api/search/${encodeURIComponent(searchQuery)}`);
       }
       
       if (response.ok) {
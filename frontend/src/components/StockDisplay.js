@@ -95,8 +95,8 @@ const StockDisplay = ({ stockData }) => {
 
       {stockData.price_history && stockData.price_history.dates.length > 0 && (
         <div className="mb-8">
-          <h3 className="text-xl font-semibold text-gray-800 mb-4">Price Chart (1 Year)</h3>
-          <PriceChart priceHistory={stockData.price_history} />
+          <h3 className="text-xl font-semibold text-gray-800 mb-4">Price Chart</h3>
+          <PriceChart symbol={stockData.symbol} priceHistory={stockData.price_history} />
         </div>
       )}
 
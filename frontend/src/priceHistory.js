@@ -0,0 +1,22 @@
+const UNIT_MS = { D: 24 * 60 * 60 * 1000, m: 60 * 1000 };
+
+// Expand a history_format=delta price history back into { dates, prices } arrays
+export function decodePriceHistory(history) {
+  if (!history || history.format !== 'delta') return history;
+
+  const unit = history.unit || 'D';
+  const step = UNIT_MS[unit];
+  const dates = [];
+  const prices = [];
+  let time = history.start ? Date.parse(`${history.start}${unit === 'D' ? 'T00:00' : ''}:00Z`) : 0;
+  let scaled = 0;
+  history.date_deltas.forEach((delta, index) => {
+    time += delta * step;
+    scaled += history.prices[index];
+    // Daily: 2024-01-02, intraday: 2024-01-02 09:30 (exchange-local time)
+    const iso = new Date(time).toISOString();
+    dates.push(unit === 'D' ? iso.slice(0, 10) : `${iso.slice(0, 10)} ${iso.slice(11, 16)}`);
+    prices.push(scaled / history.scale);
+  });
+  return { dates, prices };
+}